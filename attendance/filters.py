@@ -506,24 +506,7 @@ class AttendanceFilters(FilterSet):
         }
         search_field = self.data.get("search_field")
         if not search_field:
-            parts = value.split()
-            first_name = parts[0]
-            last_name = " ".join(parts[1:]) if len(parts) > 1 else ""
-
-            # Filter the queryset by first name and last name
-            if first_name and last_name:
-                queryset = queryset.filter(
-                    employee_id__employee_first_name__icontains=first_name,
-                    employee_id__employee_last_name__icontains=last_name,
-                )
-            elif first_name:
-                queryset = queryset.filter(
-                    employee_id__employee_first_name__icontains=first_name
-                )
-            elif last_name:
-                queryset = queryset.filter(
-                    employee_id__employee_last_name__icontains=last_name
-                )
+            queryset = filter_by_name(queryset, name, value)
         else:
             filter = filter_method.get(search_field)
             queryset = queryset.filter(**{filter: value})
@@ -0,0 +1,60 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max, Min
+
+from attendance.methods.rollup import rebuild_daily_rollup
+from attendance.models import Attendance
+
+
+class Command(BaseCommand):
+    help = "Rebuild the daily attendance rollup read by the attendance dashboards"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start-date",
+            type=date.fromisoformat,
+            help="First date to rebuild (YYYY-MM-DD), defaults to the first attendance",
+        )
+        parser.add_argument(
+            "--end-date",
+            type=date.fromisoformat,
+            help="Last date to rebuild (YYYY-MM-DD), defaults to today",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=31,
+            help="Number of days rebuilt per batch",
+        )
+
+    def handle(self, *args, **kwargs):
+        start_date = kwargs["start_date"]
+        end_date = kwargs["end_date"] or date.today()
+        if start_date is None:
+            dates = Attendance.objects.entire().aggregate(
+                first=Min("attendance_date"), last=Max("attendance_date")
+            )
+            if dates["first"] is None:
+                self.stdout.write("No attendance to roll up")
+                return
+            start_date = dates["first"]
+        if end_date < start_date:
+            raise CommandError("--end-date is before --start-date")
+
+        rows = 0
+        batch_start = start_date
+        while batch_start <= end_date:
+            batch_end = min(batch_start + timedelta(days=kwargs["days"] - 1), end_date)
+            rows += rebuild_daily_rollup(
+                batch_start + timedelta(days=day)
+                for day in range((batch_end - batch_start).days + 1)
+            )
+            batch_start = batch_end + timedelta(days=1)
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt the attendance rollup from {start_date} to {end_date}: "
+                f"{rows} rows"
+            )
+        )
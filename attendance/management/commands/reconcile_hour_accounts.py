@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance.methods.hour_account import hour_account_months, reconcile_hour_accounts
+
+CHUNK_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the hour accounts from the attendances of their month and "
+        "repair the ones that drifted"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, help="Only reconcile this year")
+        parser.add_argument(
+            "--month", type=int, help="Only reconcile this month (1-12) of --year"
+        )
+        parser.add_argument(
+            "--employee",
+            type=int,
+            action="append",
+            dest="employees",
+            help="Only reconcile the accounts of this employee id, repeatable",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report the accounts to repair without saving them",
+        )
+
+    def handle(self, *args, **kwargs):
+        year = kwargs["year"]
+        month = kwargs["month"]
+        if month is not None and (year is None or not 1 <= month <= 12):
+            raise CommandError("--month needs --year and a value between 1 and 12")
+
+        months = sorted(hour_account_months(year, month, kwargs["employees"]))
+        totals = {"checked": 0, "created": 0, "repaired": 0}
+        for index in range(0, len(months), CHUNK_SIZE):
+            result = reconcile_hour_accounts(
+                months[index : index + CHUNK_SIZE], dry_run=kwargs["dry_run"]
+            )
+            for key, value in result.items():
+                totals[key] += value
+
+        action = "To repair" if kwargs["dry_run"] else "Repaired"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {totals['checked']} hour accounts. "
+                f"{action}: {totals['repaired']}, missing: {totals['created']}"
+            )
+        )
@@ -0,0 +1,257 @@
+"""
+bulk_ingest.py
+
+This module is used to save many attendances at once, such as the rows of an
+attendance import.
+
+Attendance.save() looks up the shift day, the holidays, the company leaves and
+the validation condition and recomputes the month hour account for every row.
+Here the lookups are loaded once for the whole batch, the derived fields are
+computed in memory, the rows are inserted with bulk_create and the hour account
+of each employee and month is reconciled once at the end.
+"""
+
+import logging
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from attendance.methods.hour_account import reconcile_hour_accounts
+from attendance.methods.rollup import schedule_daily_rollup
+from attendance.methods.utils import format_time, strtime_seconds
+from attendance.models import Attendance, AttendanceValidationCondition, WorkRecords
+from base.models import CompanyLeaves, EmployeeShiftDay, Holidays
+from horilla.horilla_middlewares import _thread_locals
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+WORK_RECORD_FIELDS = [
+    "at_work",
+    "min_hour",
+    "min_hour_second",
+    "at_work_second",
+    "work_record_type",
+    "message",
+    "is_attendance_record",
+    "attendance_id",
+    "shift_id",
+    "day_percentage",
+    "last_update",
+]
+
+
+class AttendanceCalendar:
+    """
+    Holidays and company leaves of a date range, loaded with one query each,
+    answering the same way as base.methods.is_holiday and is_company_leave
+    """
+
+    def __init__(self, start_date, end_date):
+        self.holidays = set()
+        self.recurring = set()
+        for holiday_start, holiday_end, recurring in Holidays.objects.filter(
+            Q(start_date__lte=end_date, end_date__gte=start_date) | Q(recurring=True)
+        ).values_list("start_date", "end_date", "recurring"):
+            if recurring:
+                self.recurring.add((holiday_start.month, holiday_start.day))
+            day = max(holiday_start, start_date)
+            while day <= min(holiday_end or holiday_start, end_date):
+                self.holidays.add(day)
+                day += timedelta(days=1)
+        self.company_leaves = {
+            (
+                None if based_on_week is None else int(based_on_week),
+                int(based_on_week_day),
+            )
+            for based_on_week, based_on_week_day in CompanyLeaves.objects.values_list(
+                "based_on_week", "based_on_week_day"
+            )
+        }
+
+    def is_holiday(self, day):
+        return day in self.holidays or (day.month, day.day) in self.recurring
+
+    def is_company_leave(self, day):
+        week = (day.day + day.replace(day=1).weekday() - 1) // 7
+        weekday = day.weekday()
+        return (None, weekday) in self.company_leaves or (
+            week,
+            weekday,
+        ) in self.company_leaves
+
+    def is_day_off(self, day):
+        return self.is_holiday(day) or self.is_company_leave(day)
+
+
+def prepare_attendances(attendances):
+    """
+    Fill the fields Attendance.save() derives, using lookups shared by all
+    the attendances
+    """
+    if not attendances:
+        return attendances
+    dates = [attendance.attendance_date for attendance in attendances]
+    calendar = AttendanceCalendar(min(dates), max(dates))
+    shift_days = {day.day: day for day in EmployeeShiftDay.objects.all()}
+    condition = AttendanceValidationCondition.objects.first()
+    request = getattr(_thread_locals, "request", None)
+    user = getattr(request, "user", None)
+    if user is not None and not user.is_authenticated:
+        user = None
+    cutoff_seconds = None
+    approve_seconds = None
+    if condition:
+        if condition.overtime_cutoff:
+            cutoff_seconds = strtime_seconds(condition.overtime_cutoff)
+        if condition.auto_approve_ot:
+            approve_seconds = strtime_seconds(
+                condition.minimum_overtime_to_approve or "00:00"
+            )
+
+    for attendance in attendances:
+        if user is not None:
+            attendance.created_by = attendance.created_by or user
+            attendance.modified_by = user
+        attendance.attendance_day = shift_days.get(
+            attendance.attendance_date.strftime("%A").lower()
+        )
+        if calendar.is_day_off(attendance.attendance_date):
+            attendance.minimum_hour = "00:00"
+            attendance.is_holiday = True
+        attendance.update_attendance_overtime()
+        if attendance.is_validate_request:
+            attendance.is_validate_request_approved = False
+            attendance.attendance_validated = False
+        if cutoff_seconds is not None and attendance.overtime_second > cutoff_seconds:
+            attendance.overtime_second = cutoff_seconds
+            attendance.attendance_overtime = format_time(cutoff_seconds)
+        if (
+            approve_seconds is not None
+            and attendance.overtime_second >= approve_seconds
+        ):
+            attendance.attendance_overtime_approve = True
+        attendance.approved_overtime_second = (
+            attendance.overtime_second if attendance.attendance_overtime_approve else 0
+        )
+    return attendances
+
+
+def sync_work_records(attendances):
+    """
+    Create or update the work records of new attendances the way the
+    attendance post_save signal does for a single one
+    """
+    if not attendances:
+        return
+    existing = {}
+    for work_record in WorkRecords.objects.filter(
+        employee_id__in={attendance.employee_id_id for attendance in attendances},
+        date__in={attendance.attendance_date for attendance in attendances},
+    ).order_by("id"):
+        existing.setdefault((work_record.employee_id_id, work_record.date), work_record)
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    for attendance in attendances:
+        min_hour_second = strtime_seconds(attendance.minimum_hour)
+        at_work_second = strtime_seconds(attendance.attendance_worked_hour)
+        if not attendance.attendance_validated:
+            status, message = "CONF", _("Validate the attendance")
+        elif at_work_second >= min_hour_second:
+            status, message = "FDP", _("Present")
+        elif at_work_second >= min_hour_second / 2:
+            status, message = "HDP", _("Incomplete minimum hour")
+        else:
+            status, message = "ABS", _("Incomplete half minimum hour")
+
+        key = (attendance.employee_id_id, attendance.attendance_date)
+        work_record = existing.get(key)
+        if work_record is None:
+            work_record = WorkRecords(
+                employee_id_id=attendance.employee_id_id,
+                date=attendance.attendance_date,
+            )
+            to_create.append(work_record)
+            existing[key] = work_record
+        elif work_record.pk is not None:
+            to_update.append(work_record)
+
+        work_record.at_work = attendance.attendance_worked_hour
+        work_record.min_hour = attendance.minimum_hour
+        work_record.min_hour_second = min_hour_second
+        work_record.at_work_second = at_work_second
+        work_record.is_attendance_record = True
+        work_record.attendance_id = attendance
+        work_record.shift_id = attendance.shift_id
+        work_record.last_update = now
+        if attendance.attendance_validated:
+            work_record.day_percentage = (
+                1.00 if at_work_second > min_hour_second / 2 else 0.50
+            )
+        if work_record.is_leave_record:
+            message = (
+                _("Half day leave")
+                if status == "HDP"
+                else _("An approved leave exists")
+            )
+        if not attendance.attendance_clock_out:
+            status, message = "FDP", _("Currently working")
+        work_record.work_record_type = status
+        work_record.message = str(message)
+
+    WorkRecords.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+    WorkRecords.objects.bulk_update(
+        to_update, WORK_RECORD_FIELDS, batch_size=BATCH_SIZE
+    )
+
+
+def bulk_ingest_attendances(attendances, batch_size=BATCH_SIZE):
+    """
+    Save new attendances without calling Attendance.save() for each of them.
+
+    The attendances are expected to be validated already. Their derived
+    fields are computed in memory, they are inserted with bulk_create along
+    with their work records, and the hour account of each employee and month
+    they fall in is reconciled once.
+
+    Returns:
+        dict: the number of created attendances, of saved hour accounts
+        and the seconds spent on each stage
+    """
+    timings = {}
+    started = time.monotonic()
+    prepare_attendances(attendances)
+    timings["prepare"] = time.monotonic() - started
+
+    months = {attendance.hour_account_key() for attendance in attendances}
+
+    with transaction.atomic():
+        started = time.monotonic()
+        Attendance.objects.bulk_create(attendances, batch_size=batch_size)
+        timings["insert"] = time.monotonic() - started
+
+        started = time.monotonic()
+        sync_work_records(attendances)
+        timings["work_records"] = time.monotonic() - started
+
+        started = time.monotonic()
+        accounts = reconcile_hour_accounts(months)
+        timings["overtime"] = time.monotonic() - started
+
+        schedule_daily_rollup(
+            {attendance.attendance_date for attendance in attendances}
+        )
+
+    result = {
+        "created": len(attendances),
+        "accounts": accounts["created"] + accounts["repaired"],
+        "timings": {stage: round(seconds, 3) for stage, seconds in timings.items()},
+    }
+    logger.info("Bulk attendance ingestion: %s", result)
+    return result
@@ -0,0 +1,187 @@
+"""
+hour_account.py
+
+This module is used to reconcile the hour accounts (AttendanceOverTime) with the
+attendances of their month.
+
+The hour accounts are maintained incrementally by Attendance.save() and
+delete(). Changes made without them, such as queryset updates or approving a
+leave over existing attendances, make the accounts drift; the reconciliation
+recomputes the accounts from the attendances and repairs the ones that differ.
+"""
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.apps import apps
+from django.db import transaction
+
+from attendance.methods.utils import MONTH_MAPPING, hour_account_seconds
+from attendance.models import Attendance, AttendanceOverTime
+from horilla.methods import get_horilla_model_class
+
+BATCH_SIZE = 1000
+MONTHS = list(MONTH_MAPPING)
+HOUR_ACCOUNT_FIELDS = [
+    "hour_account_second",
+    "hour_pending_second",
+    "overtime_second",
+    "not_validated_second",
+    "not_approved_ot_second",
+]
+
+
+def _month_end(year, month):
+    return date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+
+
+def hour_account_months(year=None, month=None, employee_ids=None):
+    """
+    Returns the (employee id, year, month) keys having attendances or an hour
+    account, optionally limited to a year, a month of it and some employees
+    """
+    attendances = Attendance.objects.entire().all()
+    accounts = AttendanceOverTime.objects.entire().all()
+    if year is not None:
+        attendances = attendances.filter(attendance_date__year=year)
+        accounts = accounts.filter(year=str(year))
+    if month is not None:
+        attendances = attendances.filter(attendance_date__month=month)
+        accounts = accounts.filter(month=MONTHS[month - 1])
+    if employee_ids is not None:
+        attendances = attendances.filter(employee_id__in=employee_ids)
+        accounts = accounts.filter(employee_id__in=employee_ids)
+
+    months = {
+        (employee_id, attendance_date.year, attendance_date.month)
+        for employee_id, attendance_date in attendances.values_list(
+            "employee_id", "attendance_date"
+        ).distinct()
+    }
+    for employee_id, account_year, account_month in accounts.values_list(
+        "employee_id", "year", "month"
+    ):
+        if account_month in MONTH_MAPPING and str(account_year).isdigit():
+            months.add((employee_id, int(account_year), MONTH_MAPPING[account_month]))
+    return months
+
+
+def reconcile_hour_accounts(months, dry_run=False):
+    """
+    Recompute the hour accounts of the given (employee id, year, month) keys
+    from their attendances, with one query per model, and save the accounts
+    that are missing or differ.
+
+    Returns:
+        dict: the number of checked, created and repaired accounts
+    """
+    months = set(months)
+    result = {"checked": len(months), "created": 0, "repaired": 0}
+    if not months:
+        return result
+    employee_ids = {employee_id for employee_id, _year, _month in months}
+    first = min(date(year, month, 1) for _employee, year, month in months)
+    last = max(_month_end(year, month) for _employee, year, month in months)
+
+    leaves = defaultdict(list)
+    if apps.is_installed("leave"):
+        LeaveRequest = get_horilla_model_class(app_label="leave", model="leaverequest")
+        for employee_id, start_date, end_date in (
+            LeaveRequest.objects.entire()
+            .filter(
+                employee_id__in=employee_ids,
+                status="approved",
+                start_date__lte=last,
+                end_date__gte=first,
+            )
+            .values_list("employee_id", "start_date", "end_date")
+        ):
+            leaves[employee_id].append((start_date, end_date))
+
+    totals = defaultdict(lambda: dict.fromkeys(HOUR_ACCOUNT_FIELDS, 0))
+    for (
+        employee_id,
+        attendance_date,
+        minimum_hour,
+        at_work_second,
+        overtime_second,
+        approved_overtime_second,
+        validated,
+        overtime_approved,
+    ) in (
+        Attendance.objects.entire()
+        .filter(employee_id__in=employee_ids, attendance_date__range=(first, last))
+        .values_list(
+            "employee_id",
+            "attendance_date",
+            "minimum_hour",
+            "at_work_second",
+            "overtime_second",
+            "approved_overtime_second",
+            "attendance_validated",
+            "attendance_overtime_approve",
+        )
+        .iterator()
+    ):
+        key = (employee_id, attendance_date.year, attendance_date.month)
+        if key not in months:
+            continue
+        on_leave = any(
+            start_date <= attendance_date <= end_date
+            for start_date, end_date in leaves[employee_id]
+        )
+        values = hour_account_seconds(
+            minimum_hour,
+            at_work_second,
+            overtime_second,
+            approved_overtime_second,
+            validated,
+            overtime_approved,
+            on_leave,
+        )
+        for field, value in values.items():
+            totals[key][field] += value
+
+    accounts = {}
+    for account in AttendanceOverTime.objects.entire().filter(
+        employee_id__in=employee_ids,
+        year__in={str(year) for _employee, year, _month in months},
+        month__in={MONTHS[month - 1] for _employee, _year, month in months},
+    ):
+        if account.month not in MONTH_MAPPING:
+            continue
+        key = (account.employee_id_id, int(account.year), MONTH_MAPPING[account.month])
+        accounts.setdefault(key, account)
+
+    to_create = []
+    to_update = []
+    for key in months:
+        employee_id, year, month = key
+        account = accounts.get(key)
+        if account is None:
+            account = AttendanceOverTime(
+                employee_id_id=employee_id, month=MONTHS[month - 1], year=str(year)
+            )
+            to_create.append(account)
+        elif any(
+            (getattr(account, field) or 0) != value
+            for field, value in totals[key].items()
+        ):
+            to_update.append(account)
+        else:
+            continue
+        account.set_seconds(totals[key])
+        account.month_sequence = month - 1
+
+    result["created"] = len(to_create)
+    result["repaired"] = len(to_update)
+    if not dry_run:
+        with transaction.atomic():
+            AttendanceOverTime.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+            AttendanceOverTime.objects.bulk_update(
+                to_update,
+                HOUR_ACCOUNT_FIELDS
+                + ["worked_hours", "pending_hours", "overtime", "month_sequence"],
+                batch_size=BATCH_SIZE,
+            )
+    return result
@@ -0,0 +1,216 @@
+"""
+rollup.py
+
+This module is used to maintain the daily attendance rollup read by the
+attendance dashboards.
+
+The rollup of a day is rebuilt from the attendances, late come/early out
+records and approved leaves of that day with one grouped query each. The
+signals schedule the days touched by a change, and they are rebuilt once the
+surrounding transaction commits. The rebuilds of a day are serialized, with an
+advisory lock on PostgreSQL, so the last one always saves the newest counts.
+"""
+
+import logging
+import threading
+from collections import defaultdict
+from datetime import timedelta
+from functools import partial
+
+from django.apps import apps
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import Count, F, Q, Sum
+
+from attendance.models import (
+    Attendance,
+    AttendanceDailyRollup,
+    AttendanceLateComeEarlyOut,
+)
+from horilla.methods import get_horilla_model_class
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ["present", "late_come", "early_out", "on_leave", "overtime_second"]
+# longest leave, in days, whose days are rebuilt from a leave signal
+MAX_LEAVE_DAYS = 366
+# tries of a rebuild failing on a concurrent one
+REBUILD_ATTEMPTS = 3
+# first key of the PostgreSQL advisory locks of the rebuilds, by date
+ROLLUP_LOCK_NAMESPACE = 7311
+
+_pending = threading.local()
+
+
+def _group(date, company_id, department_id, shift_id):
+    return (date, company_id, department_id, shift_id)
+
+
+def _lock_dates(dates):
+    """
+    Serialize the rebuilds of the dates until the transaction ends. On the
+    other databases the delete of the rollup rows takes the write locks.
+    """
+    connection = transaction.get_connection()
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        # sorted, so concurrent rebuilds of several dates can't deadlock
+        for date in sorted(dates):
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(%s, %s)",
+                [ROLLUP_LOCK_NAMESPACE, date.toordinal()],
+            )
+
+
+def _rollups(dates):
+    rows = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+
+    for row in (
+        Attendance.objects.entire()
+        .filter(attendance_date__in=dates)
+        .values(
+            "attendance_date",
+            company=F("employee_id__employee_work_info__company_id"),
+            department=F("employee_id__employee_work_info__department_id"),
+            shift=F("shift_id"),
+        )
+        .annotate(
+            present=Count("id"),
+            overtime_second=Sum(
+                "approved_overtime_second",
+                filter=Q(attendance_validated=True, attendance_overtime_approve=True),
+            ),
+        )
+        .order_by()
+    ):
+        key = _group(
+            row["attendance_date"], row["company"], row["department"], row["shift"]
+        )
+        rows[key]["present"] += row["present"]
+        rows[key]["overtime_second"] += row["overtime_second"] or 0
+
+    for row in (
+        AttendanceLateComeEarlyOut.objects.entire()
+        .filter(attendance_id__attendance_date__in=dates)
+        .values(
+            "type",
+            date=F("attendance_id__attendance_date"),
+            company=F("attendance_id__employee_id__employee_work_info__company_id"),
+            department=F(
+                "attendance_id__employee_id__employee_work_info__department_id"
+            ),
+            shift=F("attendance_id__shift_id"),
+        )
+        .annotate(count=Count("attendance_id", distinct=True))
+        .order_by()
+    ):
+        if row["type"] not in COUNTERS:
+            continue
+        key = _group(row["date"], row["company"], row["department"], row["shift"])
+        rows[key][row["type"]] += row["count"]
+
+    if apps.is_installed("leave"):
+        LeaveRequest = get_horilla_model_class(app_label="leave", model="leaverequest")
+        on_leave = defaultdict(set)
+        for leave in (
+            LeaveRequest.objects.entire()
+            .filter(
+                status="approved",
+                start_date__lte=max(dates),
+                end_date__gte=min(dates),
+            )
+            .values(
+                "employee_id",
+                "start_date",
+                "end_date",
+                company=F("employee_id__employee_work_info__company_id"),
+                department=F("employee_id__employee_work_info__department_id"),
+                shift=F("employee_id__employee_work_info__shift_id"),
+            )
+        ):
+            for date in dates:
+                if leave["start_date"] <= date <= leave["end_date"]:
+                    key = _group(
+                        date, leave["company"], leave["department"], leave["shift"]
+                    )
+                    on_leave[key].add(leave["employee_id"])
+        for key, employees in on_leave.items():
+            rows[key]["on_leave"] = len(employees)
+
+    return [
+        AttendanceDailyRollup(
+            date=date,
+            company_id_id=company_id,
+            department_id_id=department_id,
+            shift_id_id=shift_id,
+            on_time=max(0, counters["present"] - counters["late_come"]),
+            **counters,
+        )
+        for (date, company_id, department_id, shift_id), counters in rows.items()
+    ]
+
+
+def rebuild_daily_rollup(dates):
+    """
+    Rebuild the rollup rows of the given dates. The rebuilds of a date are
+    serialized, and each one reads the attendances once the previous one
+    committed.
+
+    Returns:
+        int: the number of rollup rows saved
+    """
+    dates = set(dates)
+    if not dates:
+        return 0
+    with transaction.atomic():
+        _lock_dates(dates)
+        AttendanceDailyRollup.objects.entire().filter(date__in=dates).delete()
+        rollups = _rollups(dates)
+        AttendanceDailyRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def _flush(dates):
+    for attempt in range(1, REBUILD_ATTEMPTS + 1):
+        try:
+            rebuild_daily_rollup(dates)
+            return
+        except (IntegrityError, OperationalError) as e:
+            # a concurrent rebuild of the dates, retried on its data
+            if attempt == REBUILD_ATTEMPTS:
+                logger.exception(e)
+        except Exception as e:
+            logger.exception(e)
+            return
+
+
+def schedule_daily_rollup(dates):
+    """
+    Rebuild the rollup of the dates once the current transaction commits,
+    together with the other dates scheduled in the same transaction
+    """
+    dates = {date for date in dates if date is not None}
+    if not dates:
+        return
+    connection = transaction.get_connection()
+    pending = getattr(_pending, "pending", None)
+    # the callback is dropped when its transaction or savepoint rolls back,
+    # or has already run, and a new one is registered for these dates
+    if pending is not None and any(
+        callback is pending[1] for _, callback, *_ in connection.run_on_commit
+    ):
+        pending[0].update(dates)
+        return
+    callback = partial(_flush, dates)
+    _pending.pending = (dates, callback)
+    transaction.on_commit(callback)
+
+
+def leave_dates(start_date, end_date):
+    """
+    Dates covered by a leave, limited to MAX_LEAVE_DAYS
+    """
+    if start_date is None or end_date is None:
+        return []
+    days = min((end_date - start_date).days, MAX_LEAVE_DAYS)
+    return [start_date + timedelta(days=day) for day in range(days + 1)]
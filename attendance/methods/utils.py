@@ -206,6 +206,39 @@ def overtime_calculation(attendance):
     return "00:00"
 
 
+def hour_account_seconds(
+    minimum_hour,
+    at_work_second,
+    overtime_second,
+    approved_overtime_second,
+    validated,
+    overtime_approved,
+    on_leave=False,
+):
+    """
+    This method is used to return the seconds an attendance adds to the hour
+    account (AttendanceOverTime) of its month, by account field
+    args:
+        minimum_hour : minimum hour of the attendance in H:M format
+        on_leave : the attendance date is covered by an approved leave
+    """
+    at_work_second = at_work_second or 0
+    required_second = 0
+    worked_second = 0
+    if validated and not on_leave:
+        required_second = strtime_seconds(minimum_hour)
+        worked_second = min(required_second, at_work_second)
+    return {
+        "hour_account_second": worked_second,
+        "hour_pending_second": required_second - worked_second,
+        "overtime_second": approved_overtime_second or 0,
+        "not_validated_second": 0 if validated else at_work_second,
+        "not_approved_ot_second": (
+            overtime_second or 0 if validated and not overtime_approved else 0
+        ),
+    }
+
+
 def is_reportingmanger(request, instance):
     """
     if the instance have employee id field then you can use this method to know the
@@ -12,8 +12,7 @@ from datetime import date, datetime, timedelta
 
 from django.apps import apps
 from django.core.exceptions import ValidationError
-from django.db import models
-from django.db.models import Q
+from django.db import models, transaction
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
@@ -22,6 +21,7 @@ from attendance.methods.utils import (
     attendance_date_validate,
     format_time,
     get_diff_dict,
+    hour_account_seconds,
     strtime_seconds,
     validate_hh_mm_ss_format,
     validate_time_format,
@@ -29,7 +29,7 @@ from attendance.methods.utils import (
 )
 from base.horilla_company_manager import HorillaCompanyManager
 from base.methods import is_company_leave, is_holiday
-from base.models import Company, EmployeeShift, EmployeeShiftDay, WorkType
+from base.models import Company, Department, EmployeeShift, EmployeeShiftDay, WorkType
 from employee.models import Employee
 from horilla.methods import get_horilla_model_class
 from horilla.models import HorillaModel
@@ -380,38 +380,22 @@ class Attendance(HorillaModel):
         # Handle overtime cutoff and auto-approval
         self.handle_overtime_conditions()
 
+        previous = None
         if self.pk is not None:
             # Get the previous values of the boolean field
-            prev_state = Attendance.objects.get(pk=self.pk)
-            prev_attendance_approved = prev_state.attendance_overtime_approve
-
-        # super().save(*args, **kwargs)  #commend this line, it take too much time to complete
-        employee_ot = self.employee_id.employee_overtime.filter(
-            month=self.attendance_date.strftime("%B").lower(),
-            year=self.attendance_date.year,
-        ).first()
-        if employee_ot:
-            # Update if exists
-            self.update_ot(employee_ot)
-        else:
-            # Create and update in one call
-            employee_ot = self.create_ot()
-            self.update_ot(employee_ot)
+            previous = Attendance.objects.entire().filter(pk=self.pk).first()
+            prev_attendance_approved = bool(
+                previous and previous.attendance_overtime_approve
+            )
+
         approved = self.attendance_overtime_approve
-        attendance_account = self.employee_id.employee_overtime.filter(
-            month=self.attendance_date.strftime("%B").lower(),
-            year=self.attendance_date.year,
-        ).first()
-        total_ot_seconds = attendance_account.overtime_second
         if approved and prev_attendance_approved is False:
             self.approved_overtime_second = self.overtime_second
-            total_ot_seconds = total_ot_seconds + self.approved_overtime_second
         elif not approved:
-            total_ot_seconds = total_ot_seconds - self.approved_overtime_second
             self.approved_overtime_second = 0
-        attendance_account.overtime = format_time(total_ot_seconds)
-        attendance_account.save()
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            AttendanceOverTime.apply_attendance_change(previous, self)
 
     def serialize(self):
         """
@@ -445,93 +429,53 @@ class Attendance(HorillaModel):
             AttendanceActivity.objects.filter(
                 attendance_date=self.attendance_date, employee_id=self.employee_id
             ).delete()
-            employee_ot = self.employee_id.employee_overtime.filter(
-                month=self.attendance_date.strftime("%B").lower(),
-                year=self.attendance_date.strftime("%Y"),
-            )
-        if employee_ot.exists():
-            self.update_ot(employee_ot.first())
+        previous = Attendance.objects.entire().filter(pk=self.pk).first()
         # Call the superclass delete() method to delete the object
-        super().delete(*args, **kwargs)
-
-        # Perform additional operations after deleting the object
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            # Perform additional operations after deleting the object
+            AttendanceOverTime.apply_attendance_change(previous, None)
+        return result
 
-    def create_ot(self):
+    def hour_account_key(self):
         """
-        Create a new Hour Account instance if it doesn't exist for a specific month and year.
-        Returns:
-            AttendanceOverTime: The created or fetched AttendanceOverTime instance.
+        Returns the (employee id, year, month) of the hour account of the
+        attendance
         """
-        # Create or fetch the AttendanceOverTime instance
-        employee_ot, created = AttendanceOverTime.objects.get_or_create(
-            employee_id=self.employee_id,
-            month=self.attendance_date.strftime("%B").lower(),
-            year=self.attendance_date.year,
+        return (
+            self.employee_id_id,
+            self.attendance_date.year,
+            self.attendance_date.month,
         )
 
-        # Update only if the fields are available
-        if self.attendance_overtime_approve:
-            employee_ot.overtime = self.attendance_overtime
-
-        if self.attendance_validated:
-            employee_ot.hour_account = self.attendance_worked_hour
-
-        employee_ot.save()
-        return employee_ot
-
-    def update_ot(self, employee_ot):
+    def is_on_leave(self):
         """
-        Update the hour account for the given employee.
-
-        Args:
-            employee_ot (obj): AttendanceOverTime instance
+        Check the attendance date is covered by an approved leave of the employee
         """
-        if apps.is_installed("leave"):
-            approved_leave_requests = self.employee_id.leaverequest_set.filter(
-                start_date__lte=self.attendance_date,
-                end_date__gte=self.attendance_date,
-                status="approved",
-            )
-        else:
-            approved_leave_requests = []
-
-        # Create exclude condition using Q objects
-        exclude_condition = Q()
-        if approved_leave_requests:
-            # Combine multiple conditions for the exclude clause
-            for leave in approved_leave_requests:
-                exclude_condition |= Q(
-                    attendance_date__range=(leave.start_date, leave.end_date)
-                )
-
-        # Filter month attendances in a single query
-        month_attendances = (
-            Attendance.objects.filter(
-                employee_id=self.employee_id,
-                attendance_date__month=self.attendance_date.month,
-                attendance_date__year=self.attendance_date.year,
-                attendance_validated=True,
-            )
-            .exclude(exclude_condition)
-            .values("minimum_hour", "at_work_second")
+        if not apps.is_installed("leave"):
+            return False
+        return self.employee_id.leaverequest_set.filter(
+            start_date__lte=self.attendance_date,
+            end_date__gte=self.attendance_date,
+            status="approved",
+        ).exists()
+
+    def hour_account_values(self, on_leave=None):
+        """
+        Returns the seconds the attendance adds to the hour account of its month
+        """
+        if on_leave is None:
+            on_leave = self.attendance_validated and self.is_on_leave()
+        return hour_account_seconds(
+            self.minimum_hour,
+            self.at_work_second,
+            self.overtime_second,
+            self.approved_overtime_second,
+            self.attendance_validated,
+            self.attendance_overtime_approve,
+            on_leave,
         )
 
-        # Calculate hour balance and hours pending in a single loop
-        hour_balance = 0
-        minimum_hour_second = 0
-        for attendance in month_attendances:
-            required_work_second = strtime_seconds(attendance["minimum_hour"])
-            at_work_second = min(required_work_second, attendance["at_work_second"])
-            hour_balance += at_work_second
-            minimum_hour_second += required_work_second
-
-        hours_pending = minimum_hour_second - hour_balance
-        employee_ot.worked_hours = format_time(hour_balance)
-        employee_ot.pending_hours = format_time(hours_pending)
-        employee_ot.save()
-
-        return employee_ot
-
     def clean(self, *args, **kwargs):
         super().clean(*args, **kwargs)
         now = datetime.now().time()
@@ -634,6 +578,16 @@ class AttendanceOverTime(HorillaModel):
         null=True,
         verbose_name=_("Overtime Seconds"),
     )
+    not_validated_second = models.IntegerField(
+        default=0,
+        null=True,
+        editable=False,
+    )
+    not_approved_ot_second = models.IntegerField(
+        default=0,
+        null=True,
+        editable=False,
+    )
     objects = HorillaCompanyManager(
         related_company_field="employee_id__employee_work_info__company_id"
     )
@@ -676,34 +630,80 @@ class AttendanceOverTime(HorillaModel):
         """
         This method will return not validated hours in a month
         """
-        hrs_to_vlaidate = sum(
-            list(
-                Attendance.objects.filter(
-                    attendance_date__month=MONTH_MAPPING[self.month],
-                    attendance_date__year=self.year,
-                    employee_id=self.employee_id,
-                    attendance_validated=False,
-                ).values_list("at_work_second", flat=True)
-            )
-        )
-        return format_time(hrs_to_vlaidate)
+        return format_time(self.not_validated_second or 0)
 
     def not_approved_ot_hrs(self):
         """
         This method will return the overtime hours to be approved
         """
-        hrs_to_approve = sum(
-            list(
-                Attendance.objects.filter(
-                    attendance_date__month=MONTH_MAPPING[self.month],
-                    attendance_date__year=self.year,
-                    employee_id=self.employee_id,
-                    attendance_validated=True,
-                    attendance_overtime_approve=False,
-                ).values_list("overtime_second", flat=True)
+        return format_time(self.not_approved_ot_second or 0)
+
+    def set_seconds(self, values):
+        """
+        Set the second fields of the hour account and the hour fields derived
+        from them
+        """
+        for field, value in values.items():
+            setattr(self, field, max(0, value))
+        self.worked_hours = format_time(self.hour_account_second)
+        self.pending_hours = format_time(self.hour_pending_second)
+        self.overtime = format_time(self.overtime_second)
+
+    @classmethod
+    def apply_attendance_change(cls, previous, current):
+        """
+        Update the hour accounts with the difference between the stored
+        attendance before the change and the attendance after it, instead
+        of recomputing the whole month.
+
+        Args:
+            previous (Attendance): the attendance before the change, None for
+                a new attendance
+            current (Attendance): the attendance after the change, None for a
+                deleted attendance
+        """
+        deltas = {}
+        current_key = None
+        on_leave = None
+        if current is not None:
+            current_key = current.hour_account_key()
+            on_leave = current.attendance_validated and current.is_on_leave()
+            deltas[current_key] = current.hour_account_values(on_leave)
+        if previous is not None:
+            key = previous.hour_account_key()
+            same_day = (
+                current is not None
+                and key == current_key
+                and previous.attendance_date == current.attendance_date
+                and current.attendance_validated
             )
-        )
-        return format_time(hrs_to_approve)
+            values = previous.hour_account_values(on_leave if same_day else None)
+            account_deltas = deltas.setdefault(key, dict.fromkeys(values, 0))
+            for field, value in values.items():
+                account_deltas[field] -= value
+
+        for (employee_id, year, month), account_deltas in deltas.items():
+            # the account of the current attendance is created if missing
+            if (employee_id, year, month) != current_key and not any(
+                account_deltas.values()
+            ):
+                continue
+            month_name = list(MONTH_MAPPING)[month - 1]
+            account = (
+                cls.objects.entire()
+                .select_for_update()
+                .filter(employee_id_id=employee_id, month=month_name, year=str(year))
+                .first()
+            )
+            if account is None:
+                account = cls(employee_id_id=employee_id, month=month_name, year=year)
+            account.set_seconds(
+                {
+                    field: (getattr(account, field) or 0) + delta
+                    for field, delta in account_deltas.items()
+                }
+            )
+            account.save()
 
     def get_month_index(self):
         """
@@ -997,3 +997,26 @@ class WorkRecords(models.Model):
         verbose_name = _("Work Record")
         verbose_name_plural = _("Work Records")
         # unique_together = ['date', 'employee_id']
+
+
+class AttendanceDailyRollup(models.Model):
+    """
+    Attendance counts of a day by company, department and shift, used by the
+    attendance dashboards instead of counting the attendances on every request
+    """
+
+    date = models.DateField()
+    company_id = models.ForeignKey(Company, on_delete=models.CASCADE, null=True)
+    department_id = models.ForeignKey(Department, on_delete=models.CASCADE, null=True)
+    shift_id = models.ForeignKey(EmployeeShift, on_delete=models.CASCADE, null=True)
+    present = models.PositiveIntegerField(default=0)
+    on_time = models.PositiveIntegerField(default=0)
+    late_come = models.PositiveIntegerField(default=0)
+    early_out = models.PositiveIntegerField(default=0)
+    on_leave = models.PositiveIntegerField(default=0)
+    overtime_second = models.PositiveIntegerField(default=0)
+    objects = HorillaCompanyManager()
+
+    class Meta:
+        unique_together = ("date", "company_id", "department_id", "shift_id")
+        indexes = [models.Index(fields=["date", "department_id"])]
@@ -1,7 +1,6 @@
 import datetime
-import sys
 
-from apscheduler.schedulers.background import BackgroundScheduler
+from horilla.horilla_scheduler import register_job
 
 today = datetime.datetime.today()
 
@@ -32,19 +31,47 @@ def create_work_record(date=today):
                 pass
 
 
-if not any(
-    cmd in sys.argv
-    for cmd in ["makemigrations", "migrate", "compilemessages", "flush", "shell"]
-):
+register_job(create_work_record, "interval", hours=3, misfire_grace_time=3600 * 3)
+register_job(
+    create_work_record,
+    "cron",
+    job_id="attendance.scheduler.create_work_record_daily",
+    hour=0,
+    minute=30,
+    misfire_grace_time=3600 * 9,
+)
+
+
+def reconcile_recent_hour_accounts():
     """
-    Initializes and starts background tasks using APScheduler when the server is running.
+    Repair the hour accounts of the current and the previous month
     """
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(
-        create_work_record, "interval", hours=3, misfire_grace_time=3600 * 3
+    from attendance.methods.hour_account import (
+        hour_account_months,
+        reconcile_hour_accounts,
     )
-    scheduler.add_job(
-        create_work_record, "cron", hour=0, minute=30, misfire_grace_time=3600 * 9
+
+    today = datetime.date.today()
+    previous = today.replace(day=1) - datetime.timedelta(days=1)
+    months = hour_account_months(today.year, today.month) | hour_account_months(
+        previous.year, previous.month
     )
+    result = reconcile_hour_accounts(months)
+    return result["created"] + result["repaired"]
+
+
+register_job(reconcile_recent_hour_accounts, "cron", hour=1, minute=0)
+
+
+def rebuild_recent_daily_rollup():
+    """
+    Rebuild the daily attendance rollup of yesterday and today, to catch the
+    employee department and company changes made since
+    """
+    from attendance.methods.rollup import rebuild_daily_rollup
+
+    today = datetime.date.today()
+    return rebuild_daily_rollup([today - datetime.timedelta(days=1), today])
+
 
-    scheduler.start()
+register_job(rebuild_recent_daily_rollup, "cron", hour=1, minute=30)
@@ -7,7 +7,7 @@ from datetime import datetime
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
-from base.context_processors import enable_late_come_early_out_tracking
+from base.context_processors import is_late_come_early_out_tracking_enabled
 from base.templatetags.basefilters import is_reportingmanager
 
 MENU = _("Attendance")
@@ -94,4 +94,4 @@ def tracking_accessibility(request, submenu, user_perms, *args, **kwargs):
     """
     Determine if late come/early out tracking is enabled.
     """
-    return enable_late_come_early_out_tracking(None).get("tracking")
+    return is_late_come_early_out_tracking_enabled()
@@ -3,15 +3,22 @@
 from datetime import datetime, timedelta
 
 from django.apps import apps
-from django.db.models.signals import post_migrate, post_save, pre_delete
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_delete
 from django.dispatch import receiver
 from django.utils.translation import gettext_lazy as _
 
+from attendance.methods.rollup import leave_dates, schedule_daily_rollup
 from attendance.methods.utils import strtime_seconds
-from attendance.models import Attendance, AttendanceGeneralSetting, WorkRecords
+from attendance.models import (
+    Attendance,
+    AttendanceGeneralSetting,
+    AttendanceLateComeEarlyOut,
+    WorkRecords,
+)
 from base.models import Company, PenaltyAccounts
 from employee.models import Employee
 from horilla.methods import get_horilla_model_class
+from horilla.signals import post_bulk_update
 
 if apps.is_installed("payroll"):
 
@@ -139,6 +146,46 @@ def attendance_pre_delete(sender, instance, **_kwargs):
     ).delete()
 
 
+@receiver(post_save, sender=Attendance)
+@receiver(post_delete, sender=Attendance)
+def attendance_rollup_update(sender, instance, **kwargs):
+    """
+    Rebuild the daily rollup of the attendance date
+    """
+    schedule_daily_rollup([instance.attendance_date])
+
+
+@receiver(post_bulk_update, sender=Attendance)
+def attendance_rollup_bulk_update(sender, queryset, **kwargs):
+    """
+    Rebuild the daily rollup of the dates of the updated attendances
+    """
+    schedule_daily_rollup(
+        queryset.values_list("attendance_date", flat=True).distinct().order_by()
+    )
+
+
+@receiver(post_save, sender=AttendanceLateComeEarlyOut)
+@receiver(post_delete, sender=AttendanceLateComeEarlyOut)
+def late_come_early_out_rollup_update(sender, instance, **kwargs):
+    """
+    Rebuild the daily rollup of the date of the late come/early out attendance
+    """
+    attendance = Attendance.objects.entire().filter(id=instance.attendance_id_id)
+    schedule_daily_rollup(attendance.values_list("attendance_date", flat=True))
+
+
+if apps.is_installed("leave"):
+
+    @receiver(post_save, sender="leave.LeaveRequest")
+    @receiver(post_delete, sender="leave.LeaveRequest")
+    def leave_request_rollup_update(sender, instance, **kwargs):
+        """
+        Rebuild the daily rollup of the days of the leave request
+        """
+        schedule_daily_rollup(leave_dates(instance.start_date, instance.end_date))
+
+
 @receiver(post_migrate)
 def add_missing_attendance_to_workrecord(sender, **kwargs):
     if sender.label not in ["attendance", "leave"]:
@@ -32,8 +32,8 @@ from attendance.models import (
 )
 from attendance.views.views import attendance_validate
 from base.context_processors import (
-    enable_late_come_early_out_tracking,
-    timerunner_enabled,
+    is_late_come_early_out_tracking_enabled,
+    is_timerunner_enabled,
 )
 from base.models import AttendanceAllowedIP, Company, EmployeeShiftDay
 from horilla.decorators import hx_request_required, login_required
@@ -63,7 +63,54 @@ def late_come_create(attendance):
     return late_come_obj
 
 
-def late_come(attendance, start_time, end_time, shift):
+class ClockInOutCache:
+    """
+    Shift days, shift schedules and late come/early out settings looked up by
+    the check-ins and check-outs. A biometric batch shares one instance between
+    its punches so they are loaded once per batch.
+    """
+
+    def __init__(self):
+        self.shift_days = None
+        self.schedules = {}
+        self.settings = None
+
+    def shift_day(self, day_date):
+        """
+        Returns the shift day of the date
+        """
+        if self.shift_days is None:
+            self.shift_days = {day.day: day for day in EmployeeShiftDay.objects.all()}
+        day = day_date.strftime("%A").lower()
+        if day not in self.shift_days:
+            self.shift_days[day] = EmployeeShiftDay.objects.get(day=day)
+        return self.shift_days[day]
+
+    def schedule(self, day, shift):
+        """
+        Returns the minimum hour, start time seconds and end time seconds of
+        the shift on the day
+        """
+        key = (day.id, getattr(shift, "id", None))
+        if key not in self.schedules:
+            self.schedules[key] = shift_schedule_today(day=day, shift=shift)
+        return self.schedules[key]
+
+    def late_come_early_out_settings(self):
+        """
+        Returns the late come/early out tracking flag and the default grace time
+        """
+        if self.settings is None:
+            self.settings = {
+                "tracking": is_late_come_early_out_tracking_enabled(),
+                "grace_time": GraceTime.objects.filter(
+                    is_default=True, is_active=True
+                ).first(),
+            }
+        return self.settings
+
+
+def late_come(attendance, start_time, end_time, shift, cache=None):
     """
     this method is used to mark the late check-in  attendance after the shift starts
     args:
@@ -72,7 +119,8 @@ def late_come(attendance, start_time, end_time, shift):
         end_time : attendance day shift end time
 
     """
-    if not enable_late_come_early_out_tracking(None).get("tracking"):
+    settings = (cache or ClockInOutCache()).late_come_early_out_settings()
+    if not settings["tracking"]:
         return
     request = getattr(_thread_locals, "request", None)
     now_sec = strtime_seconds(attendance.attendance_clock_in.strftime("%H:%M"))
@@ -88,11 +136,8 @@ def late_come(attendance, start_time, end_time, shift):
             # Setting allowance for the check in time
             now_sec -= shift.grace_time_id.allowed_time_in_secs
     # checking default grace time
-    elif GraceTime.objects.filter(is_default=True, is_active=True).exists():
-        grace_time = GraceTime.objects.filter(
-            is_default=True,
-            is_active=True,
-        ).first()
+    elif settings["grace_time"] is not None:
+        grace_time = settings["grace_time"]
         # Setting allowance for the check in time if grace allocate for clock in event
         if grace_time.allowed_clock_in:
             now_sec -= grace_time.allowed_time_in_secs
@@ -122,6 +167,7 @@ def clock_in_attendance_and_activity(
     start_time,
     end_time,
     in_datetime,
+    cache=None,
 ):
     """
     This method is used to create attendance activity or attendance when an employee clocks-in
@@ -178,7 +224,11 @@ def clock_in_attendance_and_activity(
 
         attendance = Attendance.find(attendance.id)
         late_come(
-            attendance=attendance, start_time=start_time, end_time=end_time, shift=shift
+            attendance=attendance,
+            start_time=start_time,
+            end_time=end_time,
+            shift=shift,
+            cache=cache,
         )
     else:
         attendance = attendance[0]
@@ -192,6 +242,56 @@ def clock_in_attendance_and_activity(
     return attendance
 
 
+def employee_clock_in(employee, work_info, date_today, now, in_datetime, cache=None):
+    """
+    This method is used to mark the check-in of an employee on the attendance
+    of the shift day
+    args:
+        employee    : employee instance
+        work_info   : employee work information
+        date_today  : check-in date
+        now         : check-in time in H:M format
+        in_datetime : check-in datetime
+        cache       : ClockInOutCache shared by the check-ins of a batch
+    """
+    cache = cache or ClockInOutCache()
+    shift = work_info.shift_id
+    attendance_date = date_today
+    day = cache.shift_day(date_today)
+    now_sec = strtime_seconds(now)
+    mid_day_sec = strtime_seconds("12:00")
+    minimum_hour, start_time_sec, end_time_sec = cache.schedule(day, shift)
+    if start_time_sec > end_time_sec:
+        # night shift
+        # ------------------
+        # Night shift in Horilla consider a 24 hours from noon to next day noon,
+        # the shift day taken today if the attendance clocked in after 12 O clock.
+
+        if mid_day_sec > now_sec:
+            # Here you need to create attendance for yesterday
+
+            date_yesterday = date_today - timedelta(days=1)
+            day_yesterday = cache.shift_day(date_yesterday)
+            minimum_hour, start_time_sec, end_time_sec = cache.schedule(
+                day_yesterday, shift
+            )
+            attendance_date = date_yesterday
+            day = day_yesterday
+    return clock_in_attendance_and_activity(
+        employee=employee,
+        date_today=date_today,
+        attendance_date=attendance_date,
+        day=day,
+        now=now,
+        shift=shift,
+        minimum_hour=minimum_hour,
+        start_time=start_time_sec,
+        end_time=end_time_sec,
+        in_datetime=in_datetime,
+        cache=cache,
+    )
+
+
 @login_required
 @hx_request_required
 def clock_in(request):
@@ -248,53 +348,22 @@ def clock_in(request):
         if request.__dict__.get("datetime"):
             datetime_now = request.datetime
         if employee and work_info is not None:
-            shift = work_info.shift_id
             date_today = date.today()
             if request.__dict__.get("date"):
                 date_today = request.date
-            attendance_date = date_today
-            day = date_today.strftime("%A").lower()
-            day = EmployeeShiftDay.objects.get(day=day)
             now = datetime.now().strftime("%H:%M")
             if request.__dict__.get("time"):
                 now = request.time.strftime("%H:%M")
-            now_sec = strtime_seconds(now)
-            mid_day_sec = strtime_seconds("12:00")
-            minimum_hour, start_time_sec, end_time_sec = shift_schedule_today(
-                day=day, shift=shift
-            )
-            if start_time_sec > end_time_sec:
-                # night shift
-                # ------------------
-                # Night shift in Horilla consider a 24 hours from noon to next day noon,
-                # the shift day taken today if the attendance clocked in after 12 O clock.
-
-                if mid_day_sec > now_sec:
-                    # Here you need to create attendance for yesterday
-
-                    date_yesterday = date_today - timedelta(days=1)
-                    day_yesterday = date_yesterday.strftime("%A").lower()
-                    day_yesterday = EmployeeShiftDay.objects.get(day=day_yesterday)
-                    minimum_hour, start_time_sec, end_time_sec = shift_schedule_today(
-                        day=day_yesterday, shift=shift
-                    )
-                    attendance_date = date_yesterday
-                    day = day_yesterday
-            attendance = clock_in_attendance_and_activity(
+            employee_clock_in(
                 employee=employee,
+                work_info=work_info,
                 date_today=date_today,
-                attendance_date=attendance_date,
-                day=day,
                 now=now,
-                shift=shift,
-                minimum_hour=minimum_hour,
-                start_time=start_time_sec,
-                end_time=end_time_sec,
                 in_datetime=datetime_now,
             )
             script = ""
             hidden_label = ""
-            time_runner_enabled = timerunner_enabled(request)["enabled_timerunner"]
+            time_runner_enabled = is_timerunner_enabled()
             mouse_in = ""
             mouse_out = ""
             if time_runner_enabled:
@@ -425,7 +494,7 @@ def early_out_create(attendance):
     return late_come_obj
 
 
-def early_out(attendance, start_time, end_time, shift):
+def early_out(attendance, start_time, end_time, shift, cache=None):
     """
     This method is used to mark the early check-out attendance before the shift ends
     args:
@@ -433,7 +502,8 @@ def early_out(attendance, start_time, end_time, shift):
         start_time : attendance day shift start time
         start_end : attendance day shift end time
     """
-    if not enable_late_come_early_out_tracking(None).get("tracking"):
+    settings = (cache or ClockInOutCache()).late_come_early_out_settings()
+    if not settings["tracking"]:
         return
 
     clock_out_time = attendance.attendance_clock_out
@@ -449,11 +519,8 @@ def early_out(attendance, start_time, end_time, shift):
             and shift.grace_time_id.allowed_clock_out == True
         ):
             now_sec += shift.grace_time_id.allowed_time_in_secs
-    elif GraceTime.objects.filter(is_default=True, is_active=True).exists():
-        grace_time = GraceTime.objects.filter(
-            is_default=True,
-            is_active=True,
-        ).first()
+    elif settings["grace_time"] is not None:
+        grace_time = settings["grace_time"]
         # Setting allowance for the check out time if grace allocate for clock out event
         if grace_time.allowed_clock_out:
             now_sec += grace_time.allowed_time_in_secs
@@ -473,6 +540,65 @@ def early_out(attendance, start_time, end_time, shift):
     return
 
 
+def employee_clock_out(employee, work_info, date_today, now, out_datetime, cache=None):
+    """
+    This method is used to mark the check-out of an employee and the early out
+    of the attendance
+    args:
+        employee     : employee instance
+        work_info    : employee work information
+        date_today   : check-out date
+        now          : check-out time in H:M format
+        out_datetime : check-out datetime
+        cache        : ClockInOutCache shared by the check-outs of a batch
+    """
+    cache = cache or ClockInOutCache()
+    shift = work_info.shift_id
+    attendance = (
+        Attendance.objects.filter(employee_id=employee)
+        .order_by("id", "attendance_date")
+        .last()
+    )
+    if attendance is not None and attendance.attendance_day is not None:
+        day = attendance.attendance_day
+    else:
+        day = cache.shift_day(date_today)
+    minimum_hour, start_time_sec, end_time_sec = cache.schedule(day, shift)
+    attendance = clock_out_attendance_and_activity(
+        employee=employee, date_today=date_today, now=now, out_datetime=out_datetime
+    )
+    if attendance:
+        early_out_instance = attendance.late_come_early_out.filter(type="early_out")
+        is_night_shift = attendance.is_night_shift()
+        next_date = attendance.attendance_date + timedelta(days=1)
+        if not early_out_instance.exists():
+            if is_night_shift:
+                now_sec = strtime_seconds(now)
+                mid_sec = strtime_seconds("12:00")
+
+                if (attendance.attendance_date == date_today) or (
+                    # check is next day mid
+                    mid_sec >= now_sec
+                    and date_today == next_date
+                ):
+                    early_out(
+                        attendance=attendance,
+                        start_time=start_time_sec,
+                        end_time=end_time_sec,
+                        shift=shift,
+                        cache=cache,
+                    )
+            elif attendance.attendance_date == date_today:
+                early_out(
+                    attendance=attendance,
+                    start_time=start_time_sec,
+                    end_time=end_time_sec,
+                    shift=shift,
+                    cache=cache,
+                )
+    return attendance
+
+
 @login_required
 @hx_request_required
 def clock_out(request):
@@ -499,59 +625,23 @@ def clock_out(request):
         if request.__dict__.get("datetime"):
             datetime_now = request.datetime
         employee, work_info = employee_exists(request)
-        shift = work_info.shift_id
         date_today = date.today()
         if request.__dict__.get("date"):
             date_today = request.date
-        day = date_today.strftime("%A").lower()
-        day = EmployeeShiftDay.objects.get(day=day)
-        attendance = (
-            Attendance.objects.filter(employee_id=employee)
-            .order_by("id", "attendance_date")
-            .last()
-        )
-        if attendance is not None:
-            day = attendance.attendance_day
         now = datetime.now().strftime("%H:%M")
         if request.__dict__.get("time"):
             now = request.time.strftime("%H:%M")
-        minimum_hour, start_time_sec, end_time_sec = shift_schedule_today(
-            day=day, shift=shift
+        employee_clock_out(
+            employee=employee,
+            work_info=work_info,
+            date_today=date_today,
+            now=now,
+            out_datetime=datetime_now,
         )
-        attendance = clock_out_attendance_and_activity(
-            employee=employee, date_today=date_today, now=now, out_datetime=datetime_now
-        )
-        if attendance:
-            early_out_instance = attendance.late_come_early_out.filter(type="early_out")
-            is_night_shift = attendance.is_night_shift()
-            next_date = attendance.attendance_date + timedelta(days=1)
-            if not early_out_instance.exists():
-                if is_night_shift:
-                    now_sec = strtime_seconds(now)
-                    mid_sec = strtime_seconds("12:00")
-
-                    if (attendance.attendance_date == date_today) or (
-                        # check is next day mid
-                        mid_sec >= now_sec
-                        and date_today == next_date
-                    ):
-                        early_out(
-                            attendance=attendance,
-                            start_time=start_time_sec,
-                            end_time=end_time_sec,
-                            shift=shift,
-                        )
-                elif attendance.attendance_date == date_today:
-                    early_out(
-                        attendance=attendance,
-                        start_time=start_time_sec,
-                        end_time=end_time_sec,
-                        shift=shift,
-                    )
 
         script = ""
         hidden_label = ""
-        time_runner_enabled = timerunner_enabled(request)["enabled_timerunner"]
+        time_runner_enabled = is_timerunner_enabled()
         mouse_in = ""
         mouse_out = ""
         if time_runner_enabled:
@@ -8,15 +8,12 @@ import json
 from datetime import date, datetime
 
 from django.apps import apps
+from django.db.models import Sum
 from django.http import JsonResponse
 from django.shortcuts import render
 from django.utils.translation import gettext_lazy as _
 
-from attendance.filters import (
-    AttendanceFilters,
-    AttendanceOverTimeFilter,
-    LateComeEarlyOutFilter,
-)
+from attendance.filters import AttendanceOverTimeFilter, LateComeEarlyOutFilter
 from attendance.methods.utils import (
     get_month_start_end_dates,
     get_week_start_end_dates,
@@ -25,6 +22,7 @@ from attendance.methods.utils import (
 )
 from attendance.models import (
     Attendance,
+    AttendanceDailyRollup,
     AttendanceLateComeEarlyOut,
     AttendanceValidationCondition,
 )
@@ -34,38 +32,43 @@ from base.models import Department
 from employee.models import Employee
 from horilla import settings
 from horilla.decorators import hx_request_required, login_required
-from horilla.methods import get_horilla_model_class
+
+ROLLUP_COUNTERS = ["present", "on_time", "late_come", "early_out", "on_leave"]
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+def rollup_totals(start_date, end_date=None, **filters):
+    """
+    This method is used to sum the daily attendance rollup counters between
+    the dates
+    """
+    end_date = end_date or start_date
+    totals = AttendanceDailyRollup.objects.filter(
+        date__range=(_as_date(start_date), _as_date(end_date)), **filters
+    ).aggregate(**{counter: Sum(counter) for counter in ROLLUP_COUNTERS})
+    return {counter: value or 0 for counter, value in totals.items()}
 
 
 def find_on_time(request, today, week_day, department=None):
     """
     This method is used to find count for on time attendances
     """
-
-    on_time = 0
-    attendances = Attendance.objects.filter(attendance_date=today)
+    filters = {}
     if department is not None:
-        attendances = attendances.filter(
-            employee_id__employee_work_info__department_id=department
-        )
-    late_come = AttendanceLateComeEarlyOut.objects.filter(
-        attendance_id__attendance_date=today, type="late_come"
-    )
-    on_time = len(attendances) - len(late_come)
-    return on_time
+        filters["department_id"] = department
+    return rollup_totals(today, **filters)["on_time"]
 
 
 def find_expected_attendances(week_day):
     """
     This method is used to find count of expected attendances for the week day
     """
-    employees = Employee.objects.filter(is_active=True)
+    expected_attendances = Employee.objects.filter(is_active=True).count()
     if apps.is_installed("leave"):
-        LeaveRequest = get_horilla_model_class(app_label="leave", model="leaverequest")
-        on_leave = LeaveRequest.objects.filter(status="Approved")
-    else:
-        on_leave = []
-    expected_attendances = len(employees) - len(on_leave)
+        expected_attendances -= rollup_totals(date.today())["on_leave"]
     return expected_attendances
 
 
@@ -78,9 +81,9 @@ def dashboard(request):
     today = datetime.today()
     week_day = today.strftime("%A").lower()
 
-    on_time = find_on_time(request, today=today, week_day=week_day)
-    late_come = find_late_come(start_date=today)
-    late_come_obj = len(late_come)
+    totals = rollup_totals(today)
+    on_time = totals["on_time"]
+    late_come_obj = totals["late_come"]
 
     marked_attendances = late_come_obj + on_time
 
@@ -214,20 +217,6 @@ def dashboard_validate_attendances(request):
     return render(request, "attendance/dashboard/to_validate_table.html", context)
 
 
-def total_attendance(start_date, department, end_date=None):
-    """
-    This method is used to find total attendance
-    """
-    attendance = AttendanceFilters(
-        {
-            "attendance_date__gte": start_date,
-            "attendance_date__lte": end_date,
-            "department": department,
-        }
-    ).qs
-    return attendance
-
-
 def find_late_come(start_date, department=None, end_date=None):
     """
     This method is used to find late comers
@@ -276,51 +265,31 @@ def find_early_out(start_date, end_date=None, department=None):
     return early_out_obj
 
 
-def generate_data_set(request, start_date, type, end_date, dept):
+def dashboard_date_range(start_date, type, end_date):
     """
-    This method is used to generate all the dashboard data
+    This method is used to find the start and end date of the dashboard period
     """
-    attendance = []
-    late_come_obj = []
-    early_out_obj = []
-    on_time = 0
     if type == "day":
-        start_date = start_date
         end_date = start_date
     if type == "weekly":
         start_date, end_date = get_week_start_end_dates(start_date)
     if type == "monthly":
         start_date, end_date = get_month_start_end_dates(start_date)
-    if type == "date_range":
-        start_date = start_date
-        end_date = end_date
-    # below method will find all the on-time attendance corresponding to the
-    # employee shift and shift schedule.
-    attendance = total_attendance(
-        start_date=start_date, department=dept, end_date=end_date
-    )
+    return start_date, end_date
 
-    # below method will find all the late-come attendance corresponding to the
-    # employee shift and schedule.
-    late_come_obj = find_late_come(
-        start_date=start_date, department=dept, end_date=end_date
-    )
 
-    # below method will find all the early-out attendance corresponding to the
-    # employee shift and shift schedule
-    early_out_obj = find_early_out(
-        department=dept, start_date=start_date, end_date=end_date
+def department_rollups(start_date, end_date, **totals):
+    """
+    This method is used to sum the daily attendance rollup by department
+    """
+    return (
+        AttendanceDailyRollup.objects.filter(
+            date__range=(start_date, end_date), department_id__isnull=False
+        )
+        .values("department_id", "department_id__department")
+        .annotate(**totals)
+        .order_by("department_id")
     )
-    on_time = len(attendance) - len(late_come_obj)
-
-    data = {}
-    if on_time or late_come_obj or early_out_obj:
-        data = {
-            "label": dept.department,
-            "data": [on_time, len(late_come_obj), len(early_out_obj)],
-        }
-
-    return data if data else None
 
 
 @login_required
@@ -350,12 +319,20 @@ def dashboard_attendance(request):
     if request.GET.get("end_date"):
         end_date = request.GET.get("end_date")
 
-    # get all departments for filtration
-    departments = Department.objects.all()
-    for dept in departments:
-        data_set.append(generate_data_set(request, start_date, type, end_date, dept))
+    start_date, end_date = dashboard_date_range(start_date, type, end_date)
+    for department in department_rollups(
+        start_date,
+        end_date,
+        on_time=Sum("on_time"),
+        late_come=Sum("late_come"),
+        early_out=Sum("early_out"),
+    ):
+        data = [department["on_time"], department["late_come"], department["early_out"]]
+        if any(data):
+            data_set.append(
+                {"label": department["department_id__department"], "data": data}
+            )
     message = _("No records available at the moment.")
-    data_set = list(filter(None, data_set))
     return JsonResponse({"dataSet": data_set, "labels": labels, "message": message})
 
 
@@ -384,58 +361,20 @@ def department_overtime_chart(request):
         request.GET.get("end_date") if request.GET.get("end_date") else start_date
     )
 
-    if chart_type == "day":
-        start_date = start_date
-        end_date = start_date
-    if chart_type == "weekly":
-        start_date, end_date = get_week_start_end_dates(start_date)
-    if chart_type == "monthly":
-        start_date, end_date = get_month_start_end_dates(start_date)
-    if chart_type == "date_range":
-        start_date = start_date
-        end_date = end_date
-
-    attendance = total_attendance(
-        start_date=start_date, department=None, end_date=end_date
-    )
-
-    condition = AttendanceValidationCondition.objects.first()
-    min_ot = strtime_seconds("00:00")
-    if condition is not None and condition.minimum_overtime_to_approve is not None:
-        min_ot = strtime_seconds(condition.minimum_overtime_to_approve)
-    attendances = attendance.filter(
-        overtime_second__gte=min_ot,
-        attendance_validated=True,
-        employee_id__is_active=True,
-        attendance_overtime_approve=True,
-    )
+    start_date, end_date = dashboard_date_range(start_date, chart_type, end_date)
     departments = []
     department_total = []
-
-    for attendance in attendances:
-        if (
-            attendance.employee_id
-            and attendance.employee_id.employee_work_info
-            and attendance.employee_id.employee_work_info.department_id
-        ):
-            departments.append(
-                attendance.employee_id.employee_work_info.department_id.department
-            )
-    departments = list(set(departments))
-
-    for depart in departments:
-        department_total.append({"department": depart, "ot_hours": 0})
-
-    for attendance in attendances:
-        if attendance.employee_id.employee_work_info.department_id:
-            department = (
-                attendance.employee_id.employee_work_info.department_id.department
+    for department in department_rollups(
+        start_date, end_date, overtime_second=Sum("overtime_second")
+    ):
+        if department["overtime_second"]:
+            departments.append(department["department_id__department"])
+            department_total.append(
+                {
+                    "department": department["department_id__department"],
+                    "ot_hours": department["overtime_second"] / 3600,
+                }
             )
-            ot = attendance.approved_overtime_second
-            ot_hrs = ot / 3600
-            for depart in department_total:
-                if depart["department"] == department:
-                    depart["ot_hours"] += ot_hrs
 
     dataset = [
         {
@@ -5,14 +5,19 @@ This module contains a function for processing attendance data
 from Excel files and saving it to a database.
 """
 
+import logging
+import time
 from datetime import datetime
 
 import pandas as pd
 
+from attendance.methods.bulk_ingest import bulk_ingest_attendances
 from attendance.models import Attendance
 from base.models import EmployeeShift, WorkType
 from employee.models import Employee
 
+logger = logging.getLogger(__name__)
+
 
 def format_time(time_obj):
     return time_obj.strftime("%H:%M") if time_obj else None
@@ -29,6 +34,7 @@ def process_attendance_data(attendance_dicts):
     Returns:
         list: A list of dictionaries representing errors encountered during processing.
     """
+    started = time.monotonic()
     error_list = []
     attendance_list = []
     today = datetime.today().date()
@@ -205,6 +211,13 @@ def process_attendance_data(attendance_dicts):
         except Exception as exception:
             attendance_data["Other Errors"] = f"{str(exception)}"
             error_list.append(attendance_data)
+    validate_seconds = time.monotonic() - started
     if attendance_list:
-        Attendance.objects.bulk_create(attendance_list)
+        result = bulk_ingest_attendances(attendance_list)
+        logger.info(
+            "Attendance import: %s rows validated in %.3fs, %s",
+            len(attendance_dicts),
+            validate_seconds,
+            result["timings"],
+        )
     return error_list
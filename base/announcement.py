@@ -124,6 +124,7 @@ def create_announcement(request):
                 verb_fr="Votre département a été mentionné dans un post.",
                 redirect="/",
                 icon="chatbox-ellipses",
+                deferred=True,
             )
 
             notify.send(
@@ -136,6 +137,7 @@ def create_announcement(request):
                 verb_fr="Votre poste de travail a été mentionné dans un post.",
                 redirect="/",
                 icon="chatbox-ellipses",
+                deferred=True,
             )
             form = AnnouncementForm()
     return render(request, "announcement/announcement_form.html", {"form": form})
@@ -218,6 +220,7 @@ def update_announcement(request, anoun_id):
                 verb_fr="Votre département a été mentionné dans un post.",
                 redirect="/",
                 icon="chatbox-ellipses",
+                deferred=True,
             )
 
             notify.send(
@@ -230,6 +233,7 @@ def update_announcement(request, anoun_id):
                 verb_fr="Votre poste de travail a été mentionné dans un post.",
                 redirect="/",
                 icon="chatbox-ellipses",
+                deferred=True,
             )
     return render(
         request,
@@ -15,8 +15,10 @@ class BaseConfig(AppConfig):
 
     def ready(self) -> None:
         from base import signals
+        from horilla.horilla_scheduler import start_job_runner
 
         super().ready()
+        start_job_runner()
         try:
             from base.models import EmployeeShiftDay
 
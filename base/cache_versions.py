@@ -0,0 +1,77 @@
+"""
+cache_versions.py
+
+This module is used to share the versions of the data the processes keep in
+memory, such as the settings rows and the company calendars.
+
+The versions are stored in the CacheVersion table, so a change saved by one
+process reaches the other workers, the scheduler and the biometric poller
+whatever the cache backend is. A request reads a version once; outside of a
+request it is read again at most every VERSION_CHECK_SECONDS.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from base.models import CacheVersion
+from horilla.horilla_middlewares import _thread_locals
+
+# seconds a version read outside of a request is trusted
+VERSION_CHECK_SECONDS = getattr(settings, "HORILLA_CACHE_VERSION_CHECK_SECONDS", 5)
+
+_read = {}
+_lock = threading.Lock()
+
+
+def _load(key):
+    return (
+        CacheVersion.objects.filter(key=key).values_list("version", flat=True).first()
+        or 0
+    )
+
+
+def current_version(key):
+    """
+    The version of the data, read once per request
+    """
+    request = getattr(_thread_locals, "request", None)
+    if request is not None:
+        versions = request.__dict__.setdefault("cache_versions", {})
+        if key not in versions:
+            versions[key] = _load(key)
+        return versions[key]
+    now = time.monotonic()
+    with _lock:
+        read = _read.get(key)
+    if read is not None and now - read[1] < VERSION_CHECK_SECONDS:
+        return read[0]
+    version = _load(key)
+    with _lock:
+        _read[key] = (version, now)
+    return version
+
+
+def bump_version(key, on_bump=None):
+    """
+    Bump the version of the data once the current transaction commits, so
+    the other processes don't read the old rows under the new version.
+    on_bump is called with the new version in this process.
+    """
+
+    def _bump():
+        CacheVersion.objects.get_or_create(key=key)
+        CacheVersion.objects.filter(key=key).update(version=F("version") + 1)
+        version = _load(key)
+        with _lock:
+            _read.pop(key, None)
+        request = getattr(_thread_locals, "request", None)
+        if request is not None:
+            request.__dict__.setdefault("cache_versions", {})[key] = version
+        if on_bump is not None:
+            on_bump(version)
+
+    transaction.on_commit(_bump)
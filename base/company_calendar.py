@@ -0,0 +1,161 @@
+"""
+company_calendar.py
+
+This module materializes the holidays and company leaves of a year into day
+masks, so the working day computations used by attendance and payroll become
+array slices instead of repeated database scans.
+
+The masks are cached per company scope and year under the company calendar
+version of the CacheVersion table, which the Holidays/CompanyLeaves signals
+bump, so an edit saved by one process reaches the others.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.cache import cache
+
+from base.cache_versions import bump_version, current_version
+from base.horilla_company_manager import selected_company_id
+from base.models import CompanyLeaves, Holidays
+
+CACHE_PREFIX = "horilla_company_calendar"
+VERSION_KEY = "company_calendar"
+CACHE_TIMEOUT = 60 * 60
+
+
+def invalidate_calendar():
+    """
+    Drop every cached year calendar, in every process
+    """
+    bump_version(VERSION_KEY)
+
+
+def _day_of_year(value):
+    return value.timetuple().tm_yday - 1
+
+
+def _year_length(year):
+    return (date(year + 1, 1, 1) - date(year, 1, 1)).days
+
+
+def _week_of_month(days, first_weekday):
+    """
+    Index of the row of `calendar.monthcalendar` holding each day, for a week
+    starting on first_weekday (0 is Monday, 6 is Sunday)
+    """
+    month_starts = days.astype("datetime64[M]").astype("datetime64[D]")
+    # 1970-01-01 is a Thursday
+    start_weekdays = (month_starts.astype(np.int64) + 3) % 7
+    offsets = (start_weekdays - first_weekday) % 7
+    day_of_month = (days - month_starts).astype(np.int64)
+    return (day_of_month + offsets) // 7
+
+
+class YearCalendar:
+    """
+    Holiday and company leave masks of a year, indexed by day of the year
+    """
+
+    def __init__(self, year, holidays, company_leaves):
+        self.year = year
+        self.holidays = holidays
+        self.company_leaves = company_leaves
+
+    @classmethod
+    def build(cls, year):
+        start = date(year, 1, 1)
+        end = date(year, 12, 31)
+        length = _year_length(year)
+        days = np.arange(
+            np.datetime64(start), np.datetime64(end) + np.timedelta64(1, "D")
+        )
+        weekdays = (days.astype(np.int64) + 3) % 7
+        sunday_weeks = _week_of_month(days, 6)
+
+        holidays = np.zeros(length, dtype=bool)
+        for holiday_start, holiday_end in Holidays.objects.filter(
+            start_date__lte=end, end_date__gte=start
+        ).values_list("start_date", "end_date"):
+            first = _day_of_year(max(holiday_start, start))
+            last = _day_of_year(min(holiday_end, end))
+            holidays[first : last + 1] = True
+
+        company_leaves = np.zeros(length, dtype=bool)
+        for based_on_week, based_on_week_day in CompanyLeaves.objects.values_list(
+            "based_on_week", "based_on_week_day"
+        ):
+            mask = weekdays == int(based_on_week_day)
+            if based_on_week is not None:
+                # specific week leaves count weeks from Sunday
+                mask &= sunday_weeks == int(based_on_week)
+            company_leaves |= mask
+        return cls(year, holidays, company_leaves)
+
+
+def _scope():
+    company_id = selected_company_id.get()
+    return "all" if company_id is None else company_id
+
+
+def year_calendar(year):
+    """
+    Return the cached calendar of the year for the selected company
+    """
+    key = f"{CACHE_PREFIX}_{current_version(VERSION_KEY)}_{_scope()}_{year}"
+    calendar = cache.get(key)
+    if calendar is None:
+        calendar = YearCalendar.build(year)
+        cache.set(key, calendar, CACHE_TIMEOUT)
+    return calendar
+
+
+def _mask(start_date, end_date, attribute):
+    """
+    Concatenate the mask of the given attribute for the inclusive date range
+    """
+    parts = []
+    for year in range(start_date.year, end_date.year + 1):
+        calendar = year_calendar(year)
+        first = _day_of_year(start_date) if year == start_date.year else 0
+        last = (
+            _day_of_year(end_date) if year == end_date.year else _year_length(year) - 1
+        )
+        parts.append(getattr(calendar, attribute)[first : last + 1])
+    if not parts:
+        return np.zeros(0, dtype=bool)
+    return np.concatenate(parts)
+
+
+def _dates(start_date, mask):
+    return [start_date + timedelta(days=int(index)) for index in np.flatnonzero(mask)]
+
+
+def holiday_dates(start_date, end_date):
+    """
+    Holiday dates between the start and end date
+    """
+    return _dates(start_date, _mask(start_date, end_date, "holidays"))
+
+
+def company_leave_dates(year):
+    """
+    Company leave dates of the year
+    """
+    return _dates(date(year, 1, 1), year_calendar(year).company_leaves)
+
+
+def working_days(start_date, end_date):
+    """
+    Working days, and the company leave and holiday dates, between the start and
+    end date
+    """
+    leaves = _mask(start_date, end_date, "holidays") | _mask(
+        start_date, end_date, "company_leaves"
+    )
+    working = ~leaves
+    return {
+        "total_working_days": int(np.count_nonzero(working)),
+        "working_days_on": _dates(start_date, working),
+        "company_leave_dates": _dates(start_date, leaves),
+    }
@@ -10,19 +10,15 @@ from django.apps import apps
 from django.contrib import messages
 from django.http import HttpResponse
 from django.urls import path, reverse
+from django.utils.functional import SimpleLazyObject
 from django.utils.translation import gettext_lazy as _
 
-from base.models import Company, TrackLateComeEarlyOut
+from base.models import Company
+from base.settings_registry import get_setting, get_setting_rows
 from base.urls import urlpatterns
-from employee.models import (
-    Employee,
-    EmployeeGeneralSetting,
-    EmployeeWorkInformation,
-    ProfileEditFeature,
-)
+from employee.models import Employee, EmployeeWorkInformation
 from horilla import horilla_apps
 from horilla.decorators import hx_request_required, login_required, permission_required
-from horilla.methods import get_horilla_model_class
 
 
 class AllCompany:
@@ -50,31 +46,39 @@ def get_last_section(path):
 
 def get_companies(request):
     """
-    This method will return the history additional field form
+    This method will return the companies to select from, and whether one of
+    them is selected
     """
-    companies = list(
-        [company.id, company.company, company.icon.url, False]
-        for company in Company.objects.all()
-    )
-    companies = [
-        [
-            "all",
-            "All Company",
-            "https://ui-avatars.com/api/?name=All+Company&background=random",
-            False,
-        ],
-    ] + companies
-    selected_company = request.session.get("selected_company")
-    company_selected = False
-    if selected_company and selected_company == "all":
-        companies[0][3] = True
-        company_selected = True
-    else:
-        for company in companies:
-            if str(company[0]) == selected_company:
-                company[3] = True
-                company_selected = True
-    return {"all_companies": companies, "company_selected": company_selected}
+
+    def companies():
+        companies = list(
+            [company.id, company.company, company.icon.url, False]
+            for company in get_setting_rows("base.company")
+        )
+        companies = [
+            [
+                "all",
+                "All Company",
+                "https://ui-avatars.com/api/?name=All+Company&background=random",
+                False,
+            ],
+        ] + companies
+        selected_company = request.session.get("selected_company")
+        if selected_company and selected_company == "all":
+            companies[0][3] = True
+        else:
+            for company in companies:
+                if str(company[0]) == selected_company:
+                    company[3] = True
+        return companies
+
+    all_companies = SimpleLazyObject(companies)
+    return {
+        "all_companies": all_companies,
+        "company_selected": SimpleLazyObject(
+            lambda: any(company[3] for company in all_companies)
+        ),
+    }
 
 
 @login_required
@@ -158,124 +162,139 @@ urlpatterns.append(
 )
 
 
+def white_label_company(request):
+    """
+    The company whose name and icon are shown instead of Horilla: the company
+    of the user, or the headquarters
+    """
+    if not getattr(horilla_apps, "WHITE_LABELLING", False):
+        return None
+    hq = next(
+        (
+            company
+            for company in reversed(get_setting_rows("base.company"))
+            if company.hq
+        ),
+        None,
+    )
+    try:
+        company = request.user.employee_get.get_company()
+    except:
+        company = None
+    return company if company else hq
+
+
+def white_label_company_name(request):
+    company = white_label_company(request)
+    return company.company if company else "Horilla"
+
+
 def white_labelling_company(request):
-    white_labelling = getattr(horilla_apps, "WHITE_LABELLING", False)
-    if white_labelling:
-        hq = Company.objects.filter(hq=True).last()
-        try:
-            company = (
-                request.user.employee_get.get_company()
-                if request.user.employee_get.get_company()
-                else hq
-            )
-        except:
-            company = hq
-
-        return {
-            "white_label_company_name": company.company if company else "Horilla",
-            "white_label_company": company,
-        }
-    else:
-        return {
-            "white_label_company_name": "Horilla",
-            "white_label_company": None,
-        }
+    return {
+        "white_label_company_name": SimpleLazyObject(
+            lambda: white_label_company_name(request)
+        ),
+        "white_label_company": SimpleLazyObject(lambda: white_label_company(request)),
+    }
 
 
-def resignation_request_enabled(request):
+def is_resignation_request_enabled():
     """
     Check weather resignation_request enabled of not in offboarding
     """
-    enabled_resignation_request = False
-    first = None
-    if apps.is_installed("offboarding"):
-        OffboardingGeneralSetting = get_horilla_model_class(
-            app_label="offboarding", model="offboardinggeneralsetting"
-        )
-        first = OffboardingGeneralSetting.objects.first()
-    if first:
-        enabled_resignation_request = first.resignation_request
-    return {"enabled_resignation_request": enabled_resignation_request}
+    if not apps.is_installed("offboarding"):
+        return False
+    first = get_setting("offboarding.offboardinggeneralsetting")
+    return first.resignation_request if first else False
 
 
-def timerunner_enabled(request):
+def resignation_request_enabled(request):
+    return {
+        "enabled_resignation_request": SimpleLazyObject(is_resignation_request_enabled)
+    }
+
+
+def is_timerunner_enabled():
     """
-    Check weather resignation_request enabled of not in offboarding
+    Check weather the time runner is enabled or not in attendance
     """
-    first = None
-    enabled_timerunner = True
-    if apps.is_installed("attendance"):
-        AttendanceGeneralSetting = get_horilla_model_class(
-            app_label="attendance", model="attendancegeneralsetting"
-        )
-        first = AttendanceGeneralSetting.objects.first()
-    if first:
-        enabled_timerunner = first.time_runner
-    return {"enabled_timerunner": enabled_timerunner}
+    if not apps.is_installed("attendance"):
+        return True
+    first = get_setting("attendance.attendancegeneralsetting")
+    return first.time_runner if first else True
 
 
-def intial_notice_period(request):
+def timerunner_enabled(request):
+    return {"enabled_timerunner": SimpleLazyObject(is_timerunner_enabled)}
+
+
+def get_initial_notice_period():
     """
-    Check weather resignation_request enabled of not in offboarding
+    The default notice period in days, from the payroll general settings
     """
-    initial = 30
-    first = None
-    if apps.is_installed("payroll"):
-        PayrollGeneralSetting = get_horilla_model_class(
-            app_label="payroll", model="payrollgeneralsetting"
-        )
-        first = PayrollGeneralSetting.objects.first()
-    if first:
-        initial = first.notice_period
-    return {"get_initial_notice_period": initial}
+    if not apps.is_installed("payroll"):
+        return 30
+    first = get_setting("payroll.payrollgeneralsetting")
+    return first.notice_period if first else 30
 
 
-def check_candidate_self_tracking(request):
+def intial_notice_period(request):
+    return {"get_initial_notice_period": SimpleLazyObject(get_initial_notice_period)}
+
+
+def is_candidate_self_tracking_enabled():
     """
     This method is used to get the candidate self tracking is enabled or not
     """
+    if not apps.is_installed("recruitment"):
+        return False
+    first = get_setting("recruitment.recruitmentgeneralsetting")
+    return first.candidate_self_tracking if first else False
+
 
-    candidate_self_tracking = False
-    if apps.is_installed("recruitment"):
-        RecruitmentGeneralSetting = get_horilla_model_class(
-            app_label="recruitment", model="recruitmentgeneralsetting"
+def check_candidate_self_tracking(request):
+    return {
+        "check_candidate_self_tracking": SimpleLazyObject(
+            is_candidate_self_tracking_enabled
         )
-        first = RecruitmentGeneralSetting.objects.first()
-    else:
-        first = None
-    if first:
-        candidate_self_tracking = first.candidate_self_tracking
-    return {"check_candidate_self_tracking": candidate_self_tracking}
+    }
 
 
-def check_candidate_self_tracking_rating(request):
+def is_candidate_rating_enabled():
     """
     This method is used to check enabled/disabled of rating option
     """
-    rating_option = False
-    if apps.is_installed("recruitment"):
-        RecruitmentGeneralSetting = get_horilla_model_class(
-            app_label="recruitment", model="recruitmentgeneralsetting"
+    if not apps.is_installed("recruitment"):
+        return False
+    first = get_setting("recruitment.recruitmentgeneralsetting")
+    return first.show_overall_rating if first else False
+
+
+def check_candidate_self_tracking_rating(request):
+    return {
+        "check_candidate_self_tracking_rating": SimpleLazyObject(
+            is_candidate_rating_enabled
         )
-        first = RecruitmentGeneralSetting.objects.first()
-    else:
-        first = None
-    if first:
-        rating_option = first.show_overall_rating
-    return {"check_candidate_self_tracking_rating": rating_option}
+    }
 
 
-def get_initial_prefix(request):
+def get_badge_id_prefix():
     """
-    This method is used to get the initial prefix
+    This method is used to get the initial prefix of the badge ids
     """
-    settings = EmployeeGeneralSetting.objects.first()
-    instance_id = None
-    prefix = "PEP"
-    if settings:
-        instance_id = settings.id
-        prefix = settings.badge_id_prefix
-    return {"get_initial_prefix": prefix, "prefix_instance_id": instance_id}
+    settings = get_setting("employee.employeegeneralsetting")
+    return settings.badge_id_prefix if settings else "PEP"
+
+
+def get_initial_prefix(request):
+    def instance_id():
+        settings = get_setting("employee.employeegeneralsetting")
+        return settings.id if settings else None
+
+    return {
+        "get_initial_prefix": SimpleLazyObject(get_badge_id_prefix),
+        "prefix_instance_id": SimpleLazyObject(instance_id),
+    }
 
 
 def biometric_app_exists(request):
@@ -285,16 +304,20 @@ def biometric_app_exists(request):
     return {"biometric_app_exists": biometric_app_exists}
 
 
+def is_late_come_early_out_tracking_enabled():
+    tracking = get_setting("base.tracklatecomeearlyout")
+    return tracking.is_enable if tracking else True
+
+
 def enable_late_come_early_out_tracking(request):
-    tracking = TrackLateComeEarlyOut.objects.first()
-    enable = tracking.is_enable if tracking else True
+    enable = SimpleLazyObject(is_late_come_early_out_tracking_enabled)
     return {"tracking": enable, "late_come_early_out_tracking": enable}
 
 
 def enable_profile_edit(request):
     from accessibility.accessibility import ACCESSBILITY_FEATURE
 
-    profile_edit = ProfileEditFeature.objects.filter().first()
+    profile_edit = get_setting("employee.profileeditfeature")
     enable = True if profile_edit and profile_edit.is_enabled else False
     if enable:
         if not any(item[0] == "profile_edit" for item in ACCESSBILITY_FEATURE):
@@ -3,9 +3,14 @@ horilla_company_manager.py
 """
 
 import logging
+from contextvars import ContextVar
 from typing import Coroutine, Sequence
 
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
 from django.db import models
+from django.db.models import Q
+from django.db.models.constants import LOOKUP_SEP
 from django.db.models.query import QuerySet
 
 from horilla.horilla_middlewares import _thread_locals
@@ -29,6 +34,139 @@ def update(self, *args, **kwargs):
 
 setattr(QuerySet, "update", update)
 
+_MULTIVALUED_JOINS = {}
+
+# Company selected for the current request, None when all companies are shown
+selected_company_id = ContextVar("selected_company_id", default=None)
+
+# Models whose records always belong to a single company
+COMPANY_MODELS = {
+    "base": ["shiftrequest", "worktyperequest"],
+    "employee": [
+        "employee",
+        "disciplinaryaction",
+        "employeebankdetails",
+        "employeeworkinformation",
+    ],
+    "horilla_documents": ["documentrequest"],
+    "recruitment": ["recruitment", "candidate"],
+    "leave": [
+        "leaverequest",
+        "restrictleave",
+        "availableleave",
+        "leaveallocationrequest",
+        "compensatoryleaverequest",
+    ],
+    "asset": ["assetassignment", "assetrequest"],
+    "attendance": [
+        "attendance",
+        "attendanceactivity",
+        "attendanceovertime",
+        "workrecords",
+        "attendancedailyrollup",
+    ],
+    "payroll": [
+        "contract",
+        "loanaccount",
+        "payslip",
+        "reimbursement",
+    ],
+    "helpdesk": ["ticket"],
+    "offboarding": ["offboarding"],
+    "pms": ["employeeobjective"],
+}
+
+# model -> (company lookup, include records without a company)
+COMPANY_FILTERS = {}
+
+
+def _lookup_paths(q_object):
+    """
+    Yield the field lookup paths referenced by a Q object
+    """
+    for child in q_object.children:
+        if isinstance(child, Q):
+            yield from _lookup_paths(child)
+        else:
+            yield child[0]
+
+
+def _path_is_multivalued(model, path):
+    """
+    Check whether following the lookup path from the model crosses a
+    many-to-many or reverse foreign key relation
+    """
+    opts = model._meta
+    for name in path.split(LOOKUP_SEP):
+        try:
+            field = opts.get_field(name)
+        except FieldDoesNotExist:
+            # remaining parts are lookups/transforms such as `isnull`
+            break
+        if not field.is_relation:
+            break
+        if field.many_to_many or field.one_to_many:
+            return True
+        opts = field.related_model._meta
+    return False
+
+
+def has_multivalued_join(model, q_object):
+    """
+    Check whether filtering the model with the Q object can produce duplicate
+    rows. The result only depends on the join shape, so it is cached per model
+    and set of lookup paths.
+    """
+    paths = frozenset(_lookup_paths(q_object))
+    key = (model, paths)
+    if key not in _MULTIVALUED_JOINS:
+        _MULTIVALUED_JOINS[key] = any(
+            _path_is_multivalued(model, path) for path in paths
+        )
+    return _MULTIVALUED_JOINS[key]
+
+
+def resolve_company_filters(app_labels):
+    """
+    Resolve the company filter template of every model in the given apps.
+    Called once when the middlewares are loaded, after all the apps are ready.
+    """
+    company_models = set()
+    for app_label, model_names in COMPANY_MODELS.items():
+        if apps.is_installed(app_label):
+            company_models.update(
+                apps.get_model(app_label, model_name) for model_name in model_names
+            )
+
+    COMPANY_FILTERS.clear()
+    for model in apps.get_models():
+        if model._meta.app_label not in app_labels:
+            continue
+        manager = getattr(model, "objects", None)
+        related_company_field = getattr(manager, "related_company_field", None)
+        if getattr(model, "company_id", None):
+            lookup = "company_id"
+        elif isinstance(manager, HorillaCompanyManager) and related_company_field:
+            lookup = related_company_field
+        else:
+            continue
+        COMPANY_FILTERS[model] = (lookup, model not in company_models)
+
+
+def get_company_filter(model, company_id):
+    """
+    Build the company filter of the model for the given company, or None when
+    the model is not company scoped.
+    """
+    template = COMPANY_FILTERS.get(model)
+    if template is None:
+        return None
+    lookup, include_null = template
+    company_filter = Q(**{lookup: company_id})
+    if include_null:
+        company_filter |= Q(**{f"{lookup}__isnull": True})
+    return company_filter
+
 
 class HorillaCompanyManager(models.Manager):
     """
@@ -49,24 +187,13 @@ class HorillaCompanyManager(models.Manager):
         """
 
         queryset = super().get_queryset()
-        request = getattr(_thread_locals, "request", None)
-        selected_company = None
-        if request is not None:
-            selected_company = request.session.get("selected_company")
-        try:
-            queryset = (
-                queryset.filter(self.model.company_filter)
-                if selected_company != "all" and selected_company
-                else queryset
-            )
-        except Exception as e:
-            logger.error(e)
-        try:
-            has_duplicates = queryset.count() != queryset.distinct().count()
-            if has_duplicates:
-                queryset = queryset.distinct()
-        except:
-            pass
+        company_id = selected_company_id.get()
+        if company_id is not None:
+            company_filter = get_company_filter(self.model, company_id)
+            if company_filter is not None:
+                queryset = queryset.filter(company_filter)
+                if has_multivalued_join(self.model, company_filter):
+                    queryset = queryset.distinct()
         return queryset
 
     def all(self):
@@ -76,25 +203,24 @@ class HorillaCompanyManager(models.Manager):
         queryset = []
         try:
             queryset = self.get_queryset()
-            if queryset.exists():
-                try:
-                    model_name = queryset.model._meta.model_name
-                    if model_name == "employee":
-                        request = getattr(_thread_locals, "request", None)
-                        if not getattr(request, "is_filtering", None):
-                            queryset = queryset.filter(is_active=True)
-                    else:
-                        for field in queryset.model._meta.fields:
-                            if isinstance(field, models.ForeignKey):
-                                if field.name in self.check_fields:
-                                    related_model_is_active_filter = {
-                                        f"{field.name}__is_active": True
-                                    }
-                                    queryset = queryset.filter(
-                                        **related_model_is_active_filter
-                                    )
-                except:
-                    pass
+            try:
+                model_name = queryset.model._meta.model_name
+                if model_name == "employee":
+                    request = getattr(_thread_locals, "request", None)
+                    if not getattr(request, "is_filtering", None):
+                        queryset = queryset.filter(is_active=True)
+                else:
+                    for field in queryset.model._meta.fields:
+                        if isinstance(field, models.ForeignKey):
+                            if field.name in self.check_fields:
+                                related_model_is_active_filter = {
+                                    f"{field.name}__is_active": True
+                                }
+                                queryset = queryset.filter(
+                                    **related_model_is_active_filter
+                                )
+            except:
+                pass
         except:
             pass
         return queryset
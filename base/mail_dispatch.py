@@ -0,0 +1,294 @@
+"""
+mail_dispatch.py
+
+This module holds the shared outbound mail queue.
+
+Mail is no longer sent from a new thread per email. The messages are queued
+and sent by a fixed number of mail workers. Each worker keeps its SMTP
+connections open between batches, one per mail configuration, and closes
+them once idle. A message that fails to send is retried with an exponential
+backoff. The work that builds the messages, such as rendering templates or
+evaluating mail automations, runs on a separate fixed pool of task workers.
+"""
+
+import contextvars
+import logging
+import time
+from collections import defaultdict
+from itertools import count
+from queue import Empty, PriorityQueue, Queue
+from threading import Lock, Thread
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+MAIL_WORKERS = getattr(settings, "MAIL_DISPATCH_WORKERS", 2)
+TASK_WORKERS = getattr(settings, "MAIL_DISPATCH_TASK_WORKERS", 4)
+BATCH_SIZE = getattr(settings, "MAIL_DISPATCH_BATCH_SIZE", 50)
+MAX_RETRIES = getattr(settings, "MAIL_DISPATCH_MAX_RETRIES", 3)
+# seconds before the first retry, doubled on every further retry
+RETRY_BACKOFF = getattr(settings, "MAIL_DISPATCH_RETRY_BACKOFF", 2)
+# seconds an unused SMTP connection is kept open
+IDLE_TIMEOUT = getattr(settings, "MAIL_DISPATCH_IDLE_TIMEOUT", 30)
+# queue depth from which a warning is logged
+QUEUE_WARNING_DEPTH = getattr(settings, "MAIL_DISPATCH_QUEUE_WARNING_DEPTH", 1000)
+
+CONNECTION_ATTRIBUTES = ["host", "port", "username", "password", "use_tls", "use_ssl"]
+
+
+def connection_key(connection):
+    """
+    Mail backends sharing the class and the server settings share the pooled
+    connection
+    """
+    return (type(connection),) + tuple(
+        getattr(connection, attribute, None) for attribute in CONNECTION_ATTRIBUTES
+    )
+
+
+class MailDispatcher:
+    """
+    Queue of outbound mail served by a fixed number of worker threads
+    """
+
+    def __init__(self):
+        self.mail_queue = Queue()
+        self.task_queue = Queue()
+        # (ready time, sequence, item) of the messages waiting for a retry
+        self.retry_queue = PriorityQueue()
+        self.sequence = count()
+        self.lock = Lock()
+        self.threads = []
+        self.counters = defaultdict(int)
+
+    def start(self):
+        with self.lock:
+            if self.threads:
+                return
+            for index in range(MAIL_WORKERS):
+                self.threads.append(
+                    Thread(
+                        target=self.run_mail_worker,
+                        name=f"mail-dispatch-{index}",
+                        daemon=True,
+                    )
+                )
+            for index in range(TASK_WORKERS):
+                self.threads.append(
+                    Thread(
+                        target=self.run_task_worker,
+                        name=f"mail-task-{index}",
+                        daemon=True,
+                    )
+                )
+            self.threads.append(
+                Thread(target=self.run_retry_worker, name="mail-retry", daemon=True)
+            )
+            for thread in self.threads:
+                thread.start()
+
+    def count(self, counter, value=1):
+        with self.lock:
+            self.counters[counter] += value
+
+    def warn_depth(self, queue, name):
+        depth = queue.qsize()
+        if depth and depth % QUEUE_WARNING_DEPTH == 0:
+            logger.warning("%s messages waiting in the %s queue", depth, name)
+
+    def send(self, message, on_sent=None, on_failed=None):
+        """
+        Queue a message. The connection is resolved now so the mail
+        configuration of the current request is used.
+        """
+        if message.connection is None:
+            message.connection = get_connection()
+        self.start()
+        self.mail_queue.put((message, (on_sent, on_failed), 0))
+        self.count("queued")
+        self.warn_depth(self.mail_queue, "mail")
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Run func on a task worker, in a copy of the current context
+        """
+        self.start()
+        self.task_queue.put((contextvars.copy_context(), func, args, kwargs))
+        self.warn_depth(self.task_queue, "mail task")
+
+    def run_task_worker(self):
+        while True:
+            context, func, args, kwargs = self.task_queue.get()
+            try:
+                context.run(func, *args, **kwargs)
+            except Exception as e:
+                logger.exception(e)
+            finally:
+                close_old_connections()
+                self.task_queue.task_done()
+
+    def run_mail_worker(self):
+        # connection key -> (open backend, last used)
+        pool = {}
+        while True:
+            try:
+                batch = [self.mail_queue.get(timeout=IDLE_TIMEOUT)]
+            except Empty:
+                self.close_idle(pool, force=True)
+                continue
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self.mail_queue.get_nowait())
+                except Empty:
+                    break
+
+            groups = defaultdict(list)
+            for item in batch:
+                groups[connection_key(item[0].connection)].append(item)
+            try:
+                for key, items in groups.items():
+                    self.deliver(pool, key, items)
+            finally:
+                self.close_idle(pool)
+                close_old_connections()
+                for _item in batch:
+                    self.mail_queue.task_done()
+
+    def deliver(self, pool, key, items):
+        """
+        Send the messages over the pooled connection of the key, and queue the
+        failed ones for a retry
+        """
+        backend = None
+        if key in pool:
+            backend = pool[key][0]
+        else:
+            backend = items[0][0].connection
+            backend.fail_silently = False
+        failed = []
+        try:
+            backend.open()
+            pool[key] = (backend, time.monotonic())
+        except Exception as e:
+            logger.error(e)
+            failed = items
+        else:
+            for index, item in enumerate(items):
+                message, (on_sent, _on_failed), _attempt = item
+                # the connection is already open, send_messages keeps it open
+                # and reports the outcome of this message alone
+                try:
+                    sent = backend.send_messages([message])
+                except Exception as e:
+                    logger.error(e)
+                    sent = 0
+                if not sent:
+                    failed.append(item)
+                    # the connection may be broken, the rest is sent on a new one
+                    for rest in items[index + 1 :]:
+                        self.mail_queue.put(rest)
+                    break
+                self.count("sent")
+                if on_sent is not None:
+                    try:
+                        on_sent(message)
+                    except Exception as e:
+                        logger.error(e)
+            pool[key] = (backend, time.monotonic())
+        if failed:
+            self.close(pool, key)
+            self.retry(failed)
+
+    def retry(self, items):
+        for message, callbacks, attempt in items:
+            if attempt >= MAX_RETRIES:
+                self.count("failed")
+                logger.error("Mail to %s not sent: %s", message.to, message.subject)
+                on_failed = callbacks[1]
+                if on_failed is not None:
+                    try:
+                        on_failed(message)
+                    except Exception as e:
+                        logger.error(e)
+                continue
+            self.count("retried")
+            ready = time.monotonic() + RETRY_BACKOFF * 2**attempt
+            self.retry_queue.put(
+                (ready, next(self.sequence), (message, callbacks, attempt + 1))
+            )
+
+    def run_retry_worker(self):
+        while True:
+            ready, _sequence, item = self.retry_queue.get()
+            time.sleep(max(0, ready - time.monotonic()))
+            self.mail_queue.put(item)
+
+    def close(self, pool, key):
+        backend, _last_used = pool.pop(key, (None, None))
+        if backend is not None:
+            try:
+                backend.close()
+            except Exception as e:
+                logger.error(e)
+
+    def close_idle(self, pool, force=False):
+        now = time.monotonic()
+        for key, (_backend, last_used) in list(pool.items()):
+            if force or now - last_used > IDLE_TIMEOUT:
+                self.close(pool, key)
+
+    def metrics(self):
+        with self.lock:
+            counters = dict(self.counters)
+        return {
+            "mail_queue_depth": self.mail_queue.qsize(),
+            "task_queue_depth": self.task_queue.qsize(),
+            "retry_queue_depth": self.retry_queue.qsize(),
+            "workers": len(self.threads),
+            "queued": counters.get("queued", 0),
+            "sent": counters.get("sent", 0),
+            "retried": counters.get("retried", 0),
+            "failed": counters.get("failed", 0),
+        }
+
+
+dispatcher = MailDispatcher()
+
+
+def queue_mail(message, on_sent=None, on_failed=None):
+    """
+    Queue an EmailMessage on the shared mail workers. on_sent is called with
+    the message once it is sent, on_failed once its retries are exhausted.
+    """
+    dispatcher.send(message, on_sent=on_sent, on_failed=on_failed)
+
+
+def submit_mail_task(func, *args, **kwargs):
+    """
+    Run a function building and queueing mail on the shared task workers
+    """
+    dispatcher.submit(func, *args, **kwargs)
+
+
+def mail_dispatch_metrics():
+    """
+    Queue depths and the sent, retried and failed message counts of this
+    process
+    """
+    return dispatcher.metrics()
+
+
+class MailTask:
+    """
+    Base class of the mail senders that used to run in their own thread.
+    start() queues run() on the shared task workers.
+    """
+
+    def start(self):
+        submit_mail_task(self.run)
+
+    def run(self):
+        raise NotImplementedError
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from horilla.horilla_scheduler import job_metrics
+
+
+class Command(BaseCommand):
+    help = "Show the last run duration and row count of the scheduled jobs"
+
+    def handle(self, *args, **kwargs):
+        for job in job_metrics():
+            duration = f"{job['duration']:.2f}s" if job["duration"] is not None else "-"
+            rows = job["rows"] if job["rows"] is not None else "-"
+            self.stdout.write(
+                f"{job['id']}: last run {job['last_run'] or '-'}, "
+                f"duration {duration}, rows {rows}, status {job['status'] or '-'}, "
+                f"next run {job['next_run_time'] or '-'}"
+            )
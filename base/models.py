@@ -1799,4 +1799,17 @@ class NotificationSound(models.Model):
     sound_enabled = models.BooleanField(default=False)
 
 
+class CacheVersion(models.Model):
+    """
+    Version of the data a process keeps in memory, bumped when the data
+    changes so every process drops its copy
+    """
+
+    key = models.CharField(max_length=100, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.key} | {self.version}"
+
+
 User.add_to_class("is_new_employee", models.BooleanField(default=False))
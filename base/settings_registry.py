@@ -0,0 +1,112 @@
+"""
+settings_registry.py
+
+This module keeps the settings rows read on every page, such as the general
+settings of the apps and the companies, in process, so the context processors
+and the views reading them don't query the database on every render.
+
+The rows are cached by model and selected company, as the default manager of
+the model returns them for the company. Saving, deleting or bulk updating a
+registered model bumps the settings version of the CacheVersion table through
+the model signals, and every process drops its rows once it reads the new
+version, once per request, or every few seconds outside of a request.
+"""
+
+import threading
+
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+
+from base.cache_versions import bump_version, current_version
+from base.horilla_company_manager import selected_company_id
+from horilla.signals import post_bulk_update
+
+VERSION_KEY = "settings_registry"
+
+# Models whose rows are cached, by app
+SETTINGS_MODELS = {
+    "base": ["company", "tracklatecomeearlyout", "biometricattendance"],
+    "employee": ["employeegeneralsetting", "profileeditfeature"],
+    "attendance": ["attendancegeneralsetting"],
+    "payroll": ["payrollsettings", "payrollgeneralsetting"],
+    "offboarding": ["offboardinggeneralsetting"],
+    "recruitment": ["recruitmentgeneralsetting"],
+}
+
+_rows = {}
+_state = {"version": None, "generation": 0}
+_lock = threading.Lock()
+
+
+def _clear(version):
+    with _lock:
+        _rows.clear()
+        _state["version"] = version
+        _state["generation"] += 1
+
+
+def _sync():
+    """
+    Drop the rows of the process when a setting was changed by another one
+    """
+    version = current_version(VERSION_KEY)
+    # a request started before the last bump reads the older version
+    if _state["version"] is None or version > _state["version"]:
+        _clear(version)
+
+
+def _cached(key, fetch):
+    _sync()
+    key = (*key, selected_company_id.get())
+    if key in _rows:
+        return _rows[key]
+    generation = _state["generation"]
+    value = fetch()
+    with _lock:
+        # not kept when the settings changed while it was read
+        if generation == _state["generation"]:
+            _rows[key] = value
+    return value
+
+
+def get_setting(label):
+    """
+    The first row of a settings model for the selected company, read from
+    the database once. The row is shared, and must not be changed.
+
+    Args:
+        label: The model as app_label.model_name
+    """
+    return _cached((label, "first"), apps.get_model(label).objects.first)
+
+
+def get_setting_rows(label):
+    """
+    All the rows of a settings model for the selected company, read from the
+    database once
+    """
+    return _cached((label, "all"), lambda: list(apps.get_model(label).objects.all()))
+
+
+def invalidate_settings(*args, **kwargs):
+    """
+    Drop the cached rows in every process
+    """
+    bump_version(VERSION_KEY, on_bump=_clear)
+
+
+def connect_settings_signals():
+    """
+    Drop the cached rows whenever a row of a registered model changes
+    """
+    for app_label, model_names in SETTINGS_MODELS.items():
+        if not apps.is_installed(app_label):
+            continue
+        for model_name in model_names:
+            model = apps.get_model(app_label, model_name)
+            for signal in [post_save, post_delete, post_bulk_update]:
+                signal.connect(
+                    invalidate_settings,
+                    sender=model,
+                    dispatch_uid=f"settings_registry_{app_label}_{model_name}",
+                )
@@ -2,11 +2,15 @@ from datetime import datetime
 
 from django.apps import apps
 from django.db.models import Max, Q
-from django.db.models.signals import m2m_changed, post_migrate, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save
 from django.dispatch import receiver
 
-from base.models import Announcement, PenaltyAccounts
+from base.company_calendar import invalidate_calendar
+from base.models import Announcement, CompanyLeaves, Holidays, PenaltyAccounts
+from base.settings_registry import connect_settings_signals
 from horilla.methods import get_horilla_model_class
+from horilla.search import SEARCH_INDEXES, create_search_indexes
+from horilla.signals import post_bulk_update
 
 
 @receiver(post_save, sender=PenaltyAccounts)
@@ -82,6 +86,16 @@ def clean_work_records(sender, **kwargs):
         )
 
 
+@receiver(post_migrate)
+def search_indexes(sender, **kwargs):
+    """
+    Create the trigram indexes of the search bars on PostgreSQL
+    """
+    if sender.label not in SEARCH_INDEXES:
+        return
+    create_search_indexes(sender.label, using=kwargs.get("using", "default"))
+
+
 @receiver(m2m_changed, sender=Announcement.employees.through)
 def filtered_employees(sender, instance, action, **kwargs):
     """
@@ -100,3 +114,19 @@ def filtered_employees(sender, instance, action, **kwargs):
     )
 
     instance.filtered_employees.set(employees)
+
+
+@receiver(post_save, sender=Holidays)
+@receiver(post_delete, sender=Holidays)
+@receiver(post_bulk_update, sender=Holidays)
+@receiver(post_save, sender=CompanyLeaves)
+@receiver(post_delete, sender=CompanyLeaves)
+@receiver(post_bulk_update, sender=CompanyLeaves)
+def company_calendar_invalidation(sender, **kwargs):
+    """
+    Drop the cached company calendars when holidays or company leaves change
+    """
+    invalidate_calendar()
+
+
+connect_settings_signals()
@@ -17,6 +17,7 @@ from django.template.defaultfilters import register
 from django.utils.translation import gettext as _
 
 from base.models import Company, EmployeeShiftSchedule
+from base.settings_registry import get_setting
 from employee.methods.duration_methods import strtime_seconds
 from horilla.horilla_middlewares import _thread_locals
 from horilla.methods import get_horilla_model_class
@@ -282,15 +283,13 @@ def on_off(value):
 
 @register.filter(name="currency_symbol_position")
 def currency_symbol_position(amount):
+    symbol = None
     if apps.is_installed("payroll"):
-        PayrollSettings = get_horilla_model_class(
-            app_label="payroll", model="payrollsettings"
-        )
-    symbol = PayrollSettings.objects.first()
+        symbol = get_setting("payroll.payrollsettings")
 
     currency = symbol.currency_symbol if symbol else "$"
 
-    if symbol.position == "postfix":
+    if symbol and symbol.position == "postfix":
         currency_symbol = f"{amount} {currency}"
     else:
         currency_symbol = f"{currency} {amount}"
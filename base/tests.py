@@ -1,3 +1,72 @@
+from django.db.models import Q
 from django.test import TestCase
 
-# Create your tests here.
+from base.horilla_company_manager import (
+    get_company_filter,
+    has_multivalued_join,
+    resolve_company_filters,
+    selected_company_id,
+)
+from base.models import Company, Department
+from employee.models import Employee, EmployeeWorkInformation
+from horilla.horilla_settings import APPS
+
+
+class HorillaCompanyManagerTest(TestCase):
+    """
+    Test cases for the company scoped manager
+    """
+
+    def setUp(self):
+        self.company = Company.objects.create(
+            company="Horilla",
+            address="Address",
+            country="India",
+            state="Kerala",
+            city="Kochi",
+            zip="682001",
+        )
+        for index in range(3):
+            employee = Employee.objects.create(
+                employee_first_name=f"Employee {index}",
+                email=f"employee{index}@horilla.com",
+                phone="9999999999",
+            )
+            work_info, _created = EmployeeWorkInformation.objects.get_or_create(
+                employee_id=employee
+            )
+            work_info.company_id = self.company
+            work_info.save()
+        resolve_company_filters(APPS)
+        self.token = selected_company_id.set(self.company.id)
+
+    def tearDown(self):
+        selected_company_id.reset(self.token)
+
+    def test_all_runs_a_single_query(self):
+        with self.assertNumQueries(1):
+            employees = list(Employee.objects.all())
+        self.assertEqual(len(employees), 3)
+
+    def test_company_filter_is_request_scoped(self):
+        self.assertEqual(
+            get_company_filter(Employee, self.company.id),
+            Q(employee_work_info__company_id=self.company.id),
+        )
+        token = selected_company_id.set(None)
+        try:
+            self.assertEqual(Employee.objects.count(), 3)
+            self.assertFalse(hasattr(Employee, "company_filter"))
+        finally:
+            selected_company_id.reset(token)
+
+    def test_multivalued_join_detection(self):
+        self.assertFalse(
+            has_multivalued_join(Employee, Q(employee_work_info__company_id=1))
+        )
+        self.assertTrue(has_multivalued_join(Department, Q(company_id=1)))
+        self.assertTrue(
+            has_multivalued_join(
+                Department, Q(company_id=1) | Q(company_id__isnull=True)
+            )
+        )
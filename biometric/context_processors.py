@@ -5,31 +5,43 @@ This file contains utility functions related to biometric attendance,
 including a function to check if the biometric system is installed.
 
 Functions:
-    biometric_is_installed(request): Checks if the biometric system is installed.
+    is_biometric_installed(): Checks if the biometric system is installed.
+    biometric_is_installed(request): Context processor of the installation status.
 """
 
+from django.utils.functional import SimpleLazyObject
+
 from base.models import BiometricAttendance
+from base.settings_registry import get_setting
 
 
-def biometric_is_installed(_request):
+def is_biometric_installed():
     """
     Check if the biometric system is installed.
 
-    This function checks if the biometric system is installed by querying the
-    BiometricAttendance model. If no BiometricAttendance object exists, it
+    This function checks if the biometric system is installed from the
+    BiometricAttendance row. If no BiometricAttendance object exists, it
     creates one with 'is_installed' set to False.
 
+    Returns:
+        bool: The installation status of the biometric system.
+    """
+    instance = get_setting("base.biometricattendance")
+    if not instance:
+        instance = BiometricAttendance.objects.create(is_installed=False)
+    return instance.is_installed
+
+
+def biometric_is_installed(_request):
+    """
+    Check if the biometric system is installed.
+
     Args:
         request: The HTTP request object.
 
     Returns:
         dict: A dictionary containing a single key-value pair indicating whether
         the biometric system is installed. The key is 'is_installed', and the value
-        is a boolean indicating the installation status.
+        is evaluated when the template reads it.
     """
-    instance = BiometricAttendance.objects.first()
-    if not instance:
-        BiometricAttendance.objects.create(is_installed=False)
-        instance = BiometricAttendance.objects.first()
-    is_installed = instance.is_installed
-    return {"is_installed": is_installed}
+    return {"is_installed": SimpleLazyObject(is_biometric_installed)}
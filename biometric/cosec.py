@@ -95,7 +95,7 @@ class COSECBiometric:
         2. Use the provided methods to perform specific actions on the biometric device.
     """
 
-    def __init__(self, machine_ip, port, username, password, timeout=60):
+    def __init__(self, machine_ip, port, username, password, timeout=60, session=None):
         """
         Initialize the COSECBiometric object with the specified parameters.
 
@@ -105,12 +105,15 @@ class COSECBiometric:
             username (str): The username for accessing the biometric device.
             password (str): The password for accessing the biometric device.
             timeout (int, optional): The timeout for HTTP requests (default is 60 seconds).
+            session (requests.Session, optional): The session sending the requests,
+                to reuse its pooled connections (default is a new connection per request).
         """
         self.__ip = machine_ip
         self.__port = port
         self.__timeout = timeout
         self.__username = username
         self.__password = password
+        self.__session = session or requests
         self.__header = {"Authorization": self.__generate_auth_header()}
         self.__base_url = f"http://{self.__ip}/device.cgi"
         self.__user_fields = []
@@ -136,7 +139,7 @@ class COSECBiometric:
         such as timeouts, access errors, unsupported content types, and valid responses.
         """
         try:
-            response = requests.get(
+            response = self.__session.get(
                 url + "&format=xml", headers=self.__header, timeout=self.__timeout
             )
             return self.__parse_response(response)
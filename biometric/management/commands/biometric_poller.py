@@ -0,0 +1,44 @@
+import asyncio
+import signal
+
+from django.core.management.base import BaseCommand
+
+from biometric.poller import POLLER_SETTINGS, BiometricPoller
+
+
+class Command(BaseCommand):
+    help = (
+        "Poll all the live COSEC and ZKTeco biometric devices from one event "
+        "loop. Set BIOMETRIC_POLLER = {'enabled': True} so the web workers "
+        "leave the live devices to this command."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=POLLER_SETTINGS["workers"],
+            help="Number of device calls and database writes run at the same time",
+        )
+
+    def handle(self, *args, **kwargs):
+        if not POLLER_SETTINGS["enabled"]:
+            self.stderr.write(
+                self.style.WARNING(
+                    "BIOMETRIC_POLLER is not enabled, the web workers also "
+                    "capture the live devices."
+                )
+            )
+        poller = BiometricPoller(workers=kwargs["workers"])
+        asyncio.run(self.run(poller))
+        self.stdout.write(self.style.SUCCESS("Biometric poller stopped."))
+
+    async def run(self, poller):
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, poller.stop)
+            except NotImplementedError:
+                # signal handlers are not supported by the Windows event loop
+                pass
+        await poller.run()
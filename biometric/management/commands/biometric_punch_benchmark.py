@@ -0,0 +1,159 @@
+import random
+import time
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from attendance.methods.utils import Request
+from attendance.models import Attendance
+from attendance.views.clock_in_out import clock_in, clock_out
+from biometric.models import BiometricDevices, BiometricEmployees
+from biometric.punches import ZK_CHECK_IN_CODES, apply_punches, zk_punch
+
+# the fields of a zk.attendance.Attendance the punches are read from
+DeviceAttendance = namedtuple("DeviceAttendance", ["user_id", "timestamp", "punch"])
+
+
+class FakeDevice:
+    """
+    Replays the punches a ZKTeco device would report for the users registered
+    on it, reproducible from the seed
+    """
+
+    def __init__(self, user_ids, seed=0):
+        self.user_ids = user_ids
+        self.random = random.Random(seed)
+
+    def get_attendance(self, days, punches_per_day):
+        attendances = []
+        today = date.today()
+        for day in range(days, 0, -1):
+            day_date = today - timedelta(days=day)
+            for user_id in self.user_ids:
+                moment = datetime.combine(day_date, datetime.min.time()) + timedelta(
+                    hours=8, minutes=self.random.randint(0, 90)
+                )
+                for punch in range(punches_per_day):
+                    attendances.append(
+                        DeviceAttendance(user_id, moment, 0 if punch % 2 == 0 else 1)
+                    )
+                    moment += timedelta(minutes=self.random.randint(30, 240))
+        attendances.sort(key=lambda attendance: attendance.timestamp)
+        return attendances
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay the punches of a fake ZKTeco device through the per punch and "
+        "the batch processing and compare them by query count and duration. "
+        "Nothing is saved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--device",
+            help="Id of the device whose registered users punch, defaults to the "
+            "first ZKTeco device",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=7,
+            help="Number of past days to replay",
+        )
+        parser.add_argument(
+            "--punches-per-day",
+            type=int,
+            default=4,
+            help="Number of punches of each user per day",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **kwargs):
+        devices = BiometricDevices.objects.filter(machine_type="zk")
+        if kwargs["device"]:
+            devices = devices.filter(id=kwargs["device"])
+        device = devices.first()
+        if device is None:
+            raise CommandError("No ZKTeco device found")
+        user_ids = list(
+            BiometricEmployees.objects.filter(device_id=device)
+            .order_by("user_id")
+            .values_list("user_id", flat=True)
+        )
+        if not user_ids:
+            raise CommandError(f"No users are registered on {device}")
+
+        fake_device = FakeDevice(user_ids, kwargs["seed"])
+        attendances = fake_device.get_attendance(
+            kwargs["days"], kwargs["punches_per_day"]
+        )
+        self.stdout.write(
+            f"{len(attendances)} punches of {len(user_ids)} users on {device}"
+        )
+
+        per_punch = self.replay(lambda: _apply_per_punch(attendances))
+        batch = self.replay(
+            lambda: apply_punches(
+                device, [zk_punch(attendance) for attendance in attendances]
+            )
+        )
+        for label, (queries, duration, _rows) in (
+            ("per punch", per_punch),
+            ("batch", batch),
+        ):
+            self.stdout.write(f"{label}: {queries} queries, {duration:.3f}s")
+
+        if per_punch[2] != batch[2]:
+            raise CommandError("The resulting attendances differ")
+        self.stdout.write(self.style.SUCCESS("Resulting attendances are identical."))
+
+    def replay(self, apply):
+        """
+        Apply the punches in a transaction that is rolled back, returning the
+        query count, the duration and the resulting attendances
+        """
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                apply()
+                duration = time.perf_counter() - started
+            rows = sorted(
+                Attendance.objects.entire().values_list(
+                    "employee_id",
+                    "attendance_date",
+                    "attendance_clock_in",
+                    "attendance_clock_out",
+                    "attendance_worked_hour",
+                ),
+                key=str,
+            )
+            transaction.set_rollback(True)
+        return len(queries), duration, rows
+
+
+def _apply_per_punch(attendances):
+    """
+    The processing of the punches before the batch processing, one at a time
+    """
+    for attendance in attendances:
+        bio_id = BiometricEmployees.objects.filter(user_id=attendance.user_id).first()
+        if not bio_id:
+            continue
+        punch = zk_punch(attendance)
+        request_data = Request(
+            user=bio_id.employee_id.employee_user_id,
+            date=punch.datetime.date(),
+            time=punch.datetime.time(),
+            datetime=punch.datetime,
+        )
+        try:
+            if attendance.punch in ZK_CHECK_IN_CODES:
+                clock_in(request_data)
+            else:
+                clock_out(request_data)
+        except Exception:
+            continue
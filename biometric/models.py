@@ -78,6 +78,8 @@ class BiometricDevices(HorillaModel):
     )
     last_fetch_date = models.DateField(null=True, blank=True)
     last_fetch_time = models.TimeField(null=True, blank=True)
+    last_fetch_timestamp = models.DateTimeField(null=True, blank=True)
+    last_fetch_record_count = models.IntegerField(default=0)
     company_id = models.ForeignKey(
         Company, null=True, editable=False, on_delete=models.PROTECT
     )
@@ -0,0 +1,308 @@
+"""
+poller.py
+
+This module is used to poll the live biometric devices from one asyncio event
+loop, instead of keeping a thread and a connection per live device in every
+worker process.
+
+Each live device gets a task that polls it at an adaptive interval: it polls
+again right away while the device returns full pages, goes back to the
+shortest interval after new punches and slows down while the device is idle.
+A device that fails is retried with an exponential backoff. The blocking
+device calls and database work run on a small shared executor, and the COSEC
+requests go through one pooled HTTP session. The COSEC cursors are kept in
+memory and saved in batches; after a crash the punches since the last save
+are fetched again.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from django.db import close_old_connections
+from requests.adapters import HTTPAdapter
+from zk import ZK
+
+from .cosec import COSECBiometric
+from .models import BiometricDevices, COSECAttendanceArguments
+from .punches import apply_punches, cosec_punch, device_employees, zk_punch
+from .zk_log import zk_new_attendances
+
+logger = logging.getLogger(__name__)
+
+# with enabled, the live devices are polled by the biometric_poller command
+# instead of a thread per device in the web workers
+POLLER_SETTINGS = {
+    "enabled": False,
+    "workers": 8,
+    "min_interval": 2,
+    "max_interval": 30,
+    "max_backoff": 300,
+    "refresh_interval": 30,
+    "flush_interval": 10,
+}
+POLLER_SETTINGS.update(getattr(settings, "BIOMETRIC_POLLER", {}))
+POLLED_MACHINE_TYPES = ["cosec", "zk"]
+COSEC_PAGE_SIZE = 100
+
+
+class DevicePollError(Exception):
+    """
+    The device did not answer with attendance events
+    """
+
+
+class DeviceState:
+    """
+    The polling state of a device: its client, employees, cursor and interval
+    """
+
+    def __init__(self, device):
+        self.device = device
+        self.client = None
+        self.employees = None
+        self.cursor = None
+        self.interval = POLLER_SETTINGS["min_interval"]
+        self.failures = 0
+
+    def next_delay(self, fetched, full_page):
+        """
+        The seconds to wait before the next poll, adapted to the punches the
+        last poll fetched
+        """
+        self.failures = 0
+        if full_page:
+            return 0
+        if fetched:
+            self.interval = POLLER_SETTINGS["min_interval"]
+        else:
+            self.interval = min(self.interval * 1.5, POLLER_SETTINGS["max_interval"])
+        return self.interval
+
+    def backoff_delay(self):
+        """
+        The seconds to wait before retrying a failed device
+        """
+        self.failures += 1
+        delay = min(
+            POLLER_SETTINGS["min_interval"] * 2**self.failures,
+            POLLER_SETTINGS["max_backoff"],
+        )
+        return delay * random.uniform(0.5, 1.0)
+
+    def apply(self, punches, lookup):
+        """
+        Apply the punches, reloading the device employees when one is unknown
+        """
+        if self.employees is None or any(
+            punch.user_id not in self.employees for punch in punches
+        ):
+            self.employees = device_employees(self.device, lookup)
+        return apply_punches(
+            self.device, punches, lookup=lookup, employees=self.employees
+        )
+
+
+class BiometricPoller:
+    """
+    Polls all the live COSEC and ZKTeco devices from one event loop
+    """
+
+    def __init__(self, workers=None):
+        workers = workers or POLLER_SETTINGS["workers"]
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="biometric-poller"
+        )
+        self.session = requests.Session()
+        self.session.mount(
+            "http://", HTTPAdapter(pool_connections=100, pool_maxsize=workers)
+        )
+        self.tasks = {}
+        self.states = {}
+        self.pending_cursors = {}
+        self.cursors_lock = threading.Lock()
+        self.stop_event = None
+
+    async def run_sync(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, func, *args
+        )
+
+    async def run(self):
+        self.stop_event = asyncio.Event()
+        flusher = asyncio.create_task(self.flush_cursors_periodically())
+        try:
+            while not self.stop_event.is_set():
+                await self.refresh_devices()
+                await self.wait(POLLER_SETTINGS["refresh_interval"])
+        finally:
+            for task in self.tasks.values():
+                task.cancel()
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+            flusher.cancel()
+            await self.run_sync(self.flush_cursors)
+            self.session.close()
+            self.executor.shutdown(wait=True)
+
+    def stop(self):
+        if self.stop_event is not None:
+            self.stop_event.set()
+
+    async def wait(self, seconds):
+        """
+        Sleep for the given seconds, returning early when the poller stops
+        """
+        try:
+            await asyncio.wait_for(self.stop_event.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def live_devices(self):
+        close_old_connections()
+        return {
+            device.id: device
+            for device in BiometricDevices.objects.filter(
+                is_live=True, machine_type__in=POLLED_MACHINE_TYPES
+            )
+        }
+
+    async def refresh_devices(self):
+        """
+        Start polling the devices put in live mode and stop polling the ones
+        taken out of it
+        """
+        devices = await self.run_sync(self.live_devices)
+        for device_id in set(self.tasks) - set(devices):
+            self.tasks.pop(device_id).cancel()
+            self.states.pop(device_id, None)
+            logger.info("Stopped polling biometric device %s", device_id)
+        for device_id, device in devices.items():
+            if device_id not in self.tasks:
+                self.states[device_id] = DeviceState(device)
+                self.tasks[device_id] = asyncio.create_task(
+                    self.poll_device(self.states[device_id])
+                )
+                logger.info("Started polling biometric device %s", device)
+
+    async def poll_device(self, state):
+        poll = self.poll_cosec if state.device.machine_type == "cosec" else self.poll_zk
+        try:
+            while not self.stop_event.is_set():
+                try:
+                    fetched, full_page = await self.run_sync(poll, state)
+                    delay = state.next_delay(fetched, full_page)
+                except Exception as error:
+                    self.disconnect(state)
+                    delay = state.backoff_delay()
+                    logger.warning(
+                        "Polling biometric device %s failed %s times, retrying "
+                        "in %.0fs: %s",
+                        state.device,
+                        state.failures,
+                        delay,
+                        error,
+                    )
+                if delay:
+                    await self.wait(delay)
+        finally:
+            self.disconnect(state)
+
+    def poll_cosec(self, state):
+        close_old_connections()
+        device = state.device
+        if state.client is None:
+            state.client = COSECBiometric(
+                device.machine_ip,
+                device.port,
+                device.cosec_username,
+                device.cosec_password,
+                timeout=10,
+                session=self.session,
+            )
+        if state.cursor is None:
+            device_args = COSECAttendanceArguments.objects.filter(
+                device_id=device
+            ).first()
+            state.cursor = (
+                int(device_args.last_fetch_roll_ovr_count) if device_args else 0,
+                int(device_args.last_fetch_seq_number) if device_args else 1,
+            )
+        roll_over_count, seq_number = state.cursor
+        attendances = state.client.get_attendance_events(
+            roll_over_count, seq_number + 1, COSEC_PAGE_SIZE
+        )
+        if not isinstance(attendances, list):
+            raise DevicePollError(attendances)
+        if not attendances:
+            return 0, False
+
+        punches = [cosec_punch(attendance) for attendance in attendances]
+        result = state.apply([punch for punch in punches if punch], "ref_user_id")
+        logger.info("Biometric punches of %s: %s", device, result)
+        last_attendance = attendances[-1]
+        state.cursor = (
+            int(last_attendance["roll-over-count"]),
+            int(last_attendance["seq-No"]),
+        )
+        with self.cursors_lock:
+            self.pending_cursors[device.id] = (device, state.cursor)
+        return len(attendances), len(attendances) >= COSEC_PAGE_SIZE
+
+    def poll_zk(self, state):
+        close_old_connections()
+        device = state.device
+        if state.client is None:
+            state.client = ZK(
+                device.machine_ip,
+                port=device.port,
+                timeout=5,
+                password=int(device.zk_password),
+                force_udp=False,
+                ommit_ping=False,
+            ).connect()
+        attendances = zk_new_attendances(state.client, device)
+        if not attendances:
+            return 0, False
+        result = state.apply(
+            [zk_punch(attendance) for attendance in attendances], "user_id"
+        )
+        logger.info("Biometric punches of %s: %s", device, result)
+        return len(attendances), False
+
+    def disconnect(self, state):
+        client, state.client = state.client, None
+        if state.device.machine_type == "zk" and client is not None:
+            try:
+                client.disconnect()
+            except Exception:
+                pass
+
+    async def flush_cursors_periodically(self):
+        while True:
+            await asyncio.sleep(POLLER_SETTINGS["flush_interval"])
+            try:
+                await self.run_sync(self.flush_cursors)
+            except Exception as error:
+                logger.error("Saving the COSEC cursors failed: %s", error)
+
+    def flush_cursors(self):
+        """
+        Save the COSEC cursors that moved since the last save
+        """
+        with self.cursors_lock:
+            pending, self.pending_cursors = self.pending_cursors, {}
+        if not pending:
+            return
+        close_old_connections()
+        for device, (roll_over_count, seq_number) in pending.values():
+            COSECAttendanceArguments.objects.update_or_create(
+                device_id=device,
+                defaults={
+                    "last_fetch_roll_ovr_count": roll_over_count,
+                    "last_fetch_seq_number": seq_number,
+                },
+            )
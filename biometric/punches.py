@@ -0,0 +1,223 @@
+"""
+punches.py
+
+This module is used to apply the punches fetched from the biometric devices in
+batches.
+
+The device user ids are mapped to the employees with one query per device. The
+punches are grouped by employee and day, and applied in one transaction per
+batch, each employee day in its own savepoint so a failing punch only rolls its
+day back. The shift days, shift schedules and grace times are looked up once
+per batch instead of once per punch.
+"""
+
+import logging
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone as django_timezone
+
+from attendance.views.clock_in_out import (
+    ClockInOutCache,
+    employee_clock_in,
+    employee_clock_out,
+)
+from employee.models import Employee
+
+from .models import BiometricEmployees
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = getattr(settings, "BIOMETRIC_PUNCH_BATCH_SIZE", 500)
+EMPLOYEE_RELATIONS = [
+    "employee_user_id",
+    "employee_work_info__shift_id__grace_time_id",
+]
+
+ZK_CHECK_IN_CODES = {0, 3, 4}
+COSEC_CHECK_IN_CODES = {"1", "3", "5", "7", "9", "0"}
+COSEC_CHECK_OUT_CODES = {"2", "4", "6", "8", "10"}
+ANVIZ_CHECK_IN_CODES = {0, 128}
+
+# user_id is the id the device reports the employee with, datetime is aware
+Punch = namedtuple("Punch", ["user_id", "datetime", "check_in"])
+
+
+def zk_punch(attendance):
+    """
+    Punch of a ZKTeco attendance record
+    """
+    return Punch(
+        str(attendance.user_id),
+        django_timezone.make_aware(attendance.timestamp),
+        attendance.punch in ZK_CHECK_IN_CODES,
+    )
+
+
+def cosec_punch(event):
+    """
+    Punch of a COSEC attendance event, None for the events that are neither a
+    check-in nor a check-out
+    """
+    punch_code = event["detail-2"]
+    if punch_code not in COSEC_CHECK_IN_CODES | COSEC_CHECK_OUT_CODES:
+        return None
+    date_time = datetime.combine(
+        datetime.strptime(event["date"], "%d/%m/%Y").date(),
+        datetime.strptime(event["time"], "%H:%M:%S").time(),
+    )
+    return Punch(
+        str(event["detail-1"]),
+        django_timezone.make_aware(date_time),
+        punch_code in COSEC_CHECK_IN_CODES,
+    )
+
+
+def anviz_punch(record):
+    """
+    Punch of an Anviz attendance record, reported with the employee badge id
+    """
+    date_time = datetime.strptime(record["checktime"], "%Y-%m-%dT%H:%M:%S%z")
+    return Punch(
+        str(record["employee"]["workno"]),
+        date_time.astimezone(django_timezone.get_current_timezone()),
+        # 1 and 129 are the check out and door close check types
+        record["checktype"] in ANVIZ_CHECK_IN_CODES,
+    )
+
+
+def device_employees(device, lookup="user_id"):
+    """
+    Map the ids a device reports the employees with to the employees, with one
+    query.
+
+    Args:
+        device (BiometricDevices): the device
+        lookup (str): user_id for ZKTeco, ref_user_id for COSEC and badge_id for
+            Anviz, which reports the employee badge ids
+
+    Returns:
+        dict: employee by device user id, as string
+    """
+    employees = {}
+    if lookup == "badge_id":
+        for employee in (
+            Employee.objects.entire()
+            .filter(badge_id__isnull=False)
+            .select_related(*EMPLOYEE_RELATIONS)
+        ):
+            employees.setdefault(str(employee.badge_id), employee)
+        return employees
+
+    # users registered on this device take precedence over the same user ids
+    # registered on the other devices
+    for biometric_employee in BiometricEmployees.objects.select_related(
+        *[f"employee_id__{relation}" for relation in EMPLOYEE_RELATIONS]
+    ):
+        user_id = getattr(biometric_employee, lookup)
+        if user_id is None:
+            continue
+        user_id = str(user_id)
+        if biometric_employee.device_id_id == device.id or user_id not in employees:
+            employees[user_id] = biometric_employee.employee_id
+    return employees
+
+
+def apply_punch(employee, punch, cache):
+    """
+    Mark the check-in or check-out of the punch
+    """
+    work_info = getattr(employee, "employee_work_info", None)
+    if work_info is None:
+        return False
+    date_time = punch.datetime
+    apply = employee_clock_in if punch.check_in else employee_clock_out
+    kwargs = {"in_datetime" if punch.check_in else "out_datetime": date_time}
+    apply(
+        employee=employee,
+        work_info=work_info,
+        date_today=date_time.date(),
+        now=date_time.strftime("%H:%M"),
+        cache=cache,
+        **kwargs,
+    )
+    return True
+
+
+def _batches(groups, batch_size):
+    batch = []
+    size = 0
+    for group in groups:
+        batch.append(group)
+        size += len(group)
+        if size >= batch_size:
+            yield batch
+            batch = []
+            size = 0
+    if batch:
+        yield batch
+
+
+def apply_punches(device, punches, lookup="user_id", employees=None, batch_size=None):
+    """
+    Apply the punches of a device in batches.
+
+    Args:
+        device (BiometricDevices): the device the punches come from
+        punches (iterable): Punch tuples
+        lookup (str): the employee field the punch user ids refer to, see
+            device_employees
+        employees (dict): the device_employees map, loaded when not given
+
+    Returns:
+        dict: the number of applied, skipped and failed punches, of batches and
+        the seconds spent
+    """
+    started = time.monotonic()
+    batch_size = batch_size or BATCH_SIZE
+    if employees is None:
+        employees = device_employees(device, lookup)
+
+    result = {"applied": 0, "skipped": 0, "failed": 0, "batches": 0}
+    seen = set()
+    groups = defaultdict(list)
+    for punch in punches:
+        employee = employees.get(str(punch.user_id))
+        if employee is None or punch in seen:
+            result["skipped"] += 1
+            continue
+        seen.add(punch)
+        groups[(employee.id, punch.datetime.date())].append((employee, punch))
+
+    # the days of an employee are applied in order, and so are the punches of
+    # a day
+    ordered = [
+        sorted(groups[key], key=lambda item: item[1].datetime) for key in sorted(groups)
+    ]
+    for batch in _batches(ordered, batch_size):
+        cache = ClockInOutCache()
+        with transaction.atomic():
+            for group in batch:
+                try:
+                    with transaction.atomic():
+                        applied = sum(
+                            apply_punch(employee, punch, cache)
+                            for employee, punch in group
+                        )
+                except Exception as error:
+                    logger.error(
+                        "Biometric punches of %s on %s not applied: %s",
+                        group[0][0],
+                        group[0][1].datetime.date(),
+                        error,
+                    )
+                    result["failed"] += len(group)
+                    continue
+                result["applied"] += applied
+                result["skipped"] += len(group) - applied
+        result["batches"] += 1
+    result["seconds"] = round(time.monotonic() - started, 3)
+    return result
@@ -7,7 +7,7 @@ from django.utils.translation import gettext_lazy as trans
 
 from attendance.sidebar import SUBMENUS
 from base.context_processors import biometric_app_exists
-from biometric.context_processors import biometric_is_installed
+from biometric.context_processors import is_biometric_installed
 
 biometric_submenu = {
     "menu": trans("Biometric Devices"),
@@ -39,5 +39,5 @@ def biometric_device_accessibility(request, submenu, user_perms, *args, **kwargs
     return (
         biometric_app_exists(None).get("biometric_app_exists")
         and request.user.has_perm("biometric.view_biometricdevices")
-        and biometric_is_installed(None)["is_installed"]
+        and is_biometric_installed()
     )
@@ -17,14 +17,11 @@ from apscheduler.schedulers.background import BackgroundScheduler
 from django.contrib import messages
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import redirect, render
-from django.utils import timezone as django_timezone
 from django.utils.translation import gettext as __
 from django.utils.translation import gettext_lazy as _
 from zk import ZK
 from zk import exception as zk_exception
 
-from attendance.methods.utils import Request
-from attendance.views.clock_in_out import clock_in, clock_out
 from base.methods import get_key_instances, get_pagination
 from employee.models import Employee, EmployeeWorkInformation
 from horilla.decorators import (
@@ -46,6 +43,9 @@ from .forms import (
     EmployeeBiometricAddForm,
 )
 from .models import BiometricDevices, BiometricEmployees, COSECAttendanceArguments
+from .poller import POLLER_SETTINGS
+from .punches import anviz_punch, apply_punches, cosec_punch, device_employees, zk_punch
+from .zk_log import cursor_timestamp, move_cursor, zk_new_attendances
 
 logger = logging.getLogger(__name__)
 
@@ -149,58 +149,28 @@ class ZKBioAttendance(Thread):
                     machine_ip=self.machine_ip, port=self.port_no
                 ).first()
                 if device and device.is_live:
+                    employees = device_employees(device)
                     while not self._stop_event.is_set():
                         attendances = conn.live_capture()
                         for attendance in attendances:
-                            if attendance:
-                                user_id = attendance.user_id
-                                punch_code = attendance.punch
-                                date_time = django_timezone.make_aware(
-                                    attendance.timestamp
-                                )
-                                # date_time = attendance.timestamp
-                                date = date_time.date()
-                                time = date_time.time()
-                                device.last_fetch_date = date
-                                device.last_fetch_time = time
-                                device.save()
-                                bio_id = BiometricEmployees.objects.filter(
-                                    user_id=user_id
-                                ).first()
-                                if bio_id:
-                                    if punch_code in {0, 3, 4}:
-                                        try:
-                                            clock_in(
-                                                Request(
-                                                    user=bio_id.employee_id.employee_user_id,
-                                                    date=date,
-                                                    time=time,
-                                                    datetime=date_time,
-                                                )
-                                            )
-                                        except Exception as error:
-                                            logger.error(
-                                                "Got an error in clock_in %s", error
-                                            )
-
-                                            continue
-                                    else:
-                                        try:
-                                            clock_out(
-                                                Request(
-                                                    user=bio_id.employee_id.employee_user_id,
-                                                    date=date,
-                                                    time=time,
-                                                    datetime=date_time,
-                                                )
-                                            )
-                                        except Exception as error:
-                                            logger.error(
-                                                "Got an error in clock_out", error
-                                            )
-                                            continue
-                            else:
+                            if not attendance:
                                 continue
+                            punch = zk_punch(attendance)
+                            # the log size can't be read while capturing, only
+                            # the timestamp moves; the next pull skips the
+                            # punches up to it
+                            cursor = cursor_timestamp(device)
+                            if not cursor or punch.datetime > cursor:
+                                move_cursor(
+                                    device,
+                                    punch.datetime,
+                                    device.last_fetch_record_count or 0,
+                                )
+                            if punch.user_id not in employees:
+                                # the user may have been added since the
+                                # capture started
+                                employees = device_employees(device)
+                            apply_punches(device, [punch], employees=employees)
         except ConnectionResetError as error:
             ZKBioAttendance(self.machine_ip, self.port_no, self.password).start()
 
@@ -263,36 +233,12 @@ class COSECBioAttendanceThread(Thread):
                     self._stop_event.wait(5)
                     continue
 
-                for attendance in attendances:
-                    ref_user_id = attendance["detail-1"]
-                    employee = BiometricEmployees.objects.filter(
-                        ref_user_id=ref_user_id
-                    ).first()
-                    if not employee:
-                        continue
-
-                    date_str = attendance["date"]
-                    time_str = attendance["time"]
-                    attendance_date = datetime.strptime(date_str, "%d/%m/%Y").date()
-                    attendance_time = datetime.strptime(time_str, "%H:%M:%S").time()
-                    attendance_datetime = datetime.combine(
-                        attendance_date, attendance_time
-                    )
-                    punch_code = attendance["detail-2"]
-
-                    request_data = Request(
-                        user=employee.employee_id.employee_user_id,
-                        date=attendance_date,
-                        time=attendance_time,
-                        datetime=django_timezone.make_aware(attendance_datetime),
-                    )
-                    try:
-                        if punch_code in ["1", "3", "5", "7", "9", "0"]:
-                            clock_in(request_data)
-                        elif punch_code in ["2", "4", "6", "8", "10"]:
-                            clock_out(request_data)
-                    except Exception as error:
-                        logger.error("Error processing attendance: ", error)
+                punches = [cosec_punch(attendance) for attendance in attendances]
+                apply_punches(
+                    device,
+                    [punch for punch in punches if punch],
+                    lookup="ref_user_id",
+                )
 
                 if attendances:
                     last_attendance = attendances[-1]
@@ -1743,7 +1689,8 @@ def biometric_device_live(request):
                     device.is_live = True
                     device.is_scheduler = False
                     device.save()
-                    instance.start()
+                    if not POLLER_SETTINGS["enabled"]:
+                        instance.start()
             elif device.machine_type == "cosec":
                 cosec = COSECBiometric(
                     device.machine_ip,
@@ -1757,9 +1704,10 @@ def biometric_device_live(request):
                     device.is_live = True
                     device.is_scheduler = False
                     device.save()
-                    thread = COSECBioAttendanceThread(device.id)
-                    thread.start()
-                    BIO_DEVICE_THREADS[device.id] = thread
+                    if not POLLER_SETTINGS["enabled"]:
+                        thread = COSECBioAttendanceThread(device.id)
+                        thread.start()
+                        BIO_DEVICE_THREADS[device.id] = thread
                 else:
                     raise TimeoutError
             else:
@@ -1848,44 +1796,11 @@ def zk_biometric_device_attendance(device_id):
         try:
             conn = zk_device.connect()
             conn.enable_device()
-            attendances = conn.get_attendance()
-            last_attendance_datetime = attendances[-1].timestamp
-            if device.last_fetch_date and device.last_fetch_time:
-                filtered_attendances = [
-                    attendance
-                    for attendance in attendances
-                    if attendance.timestamp.date() >= device.last_fetch_date
-                    and attendance.timestamp.time() > device.last_fetch_time
-                ]
-            else:
-                filtered_attendances = attendances
-            device.last_fetch_date = last_attendance_datetime.date()
-            device.last_fetch_time = last_attendance_datetime.time()
-            device.save()
-            for attendance in filtered_attendances:
-                user_id = attendance.user_id
-                punch_code = attendance.punch
-                date_time = django_timezone.make_aware(attendance.timestamp)
-                date = date_time.date()
-                time = date_time.time()
-                bio_id = BiometricEmployees.objects.filter(user_id=user_id).first()
-                if bio_id:
-                    request_data = Request(
-                        user=bio_id.employee_id.employee_user_id,
-                        date=date,
-                        time=time,
-                        datetime=date_time,
-                    )
-                    if punch_code in {0, 3, 4}:
-                        try:
-                            clock_in(request_data)
-                        except Exception as error:
-                            logger.error("Got an error : ", error)
-                    else:
-                        try:
-                            clock_out(request_data)
-                        except Exception as error:
-                            logger.error("Got an error : ", error)
+            filtered_attendances = zk_new_attendances(conn, device)
+            result = apply_punches(
+                device, [zk_punch(attendance) for attendance in filtered_attendances]
+            )
+            logger.info("Biometric punches of %s: %s", device, result)
         except Exception as error:
             logger.error("Process terminate : ", error)
         finally:
@@ -1903,34 +1818,15 @@ def anviz_biometric_device_attendance(device_id):
     if device.is_scheduler:
         anviz_device = AnvizBiometricDeviceManager(device_id)
         attendance_records = anviz_device.get_attendance_records()
-        for attendance in attendance_records["payload"]["list"]:
-            badge_id = attendance["employee"]["workno"]
-            punch_code = attendance["checktype"]
-            date_time_utc = datetime.strptime(
-                attendance["checktime"], "%Y-%m-%dT%H:%M:%S%z"
-            )
-            date_time_obj = date_time_utc.astimezone(
-                django_timezone.get_current_timezone()
-            )
-            employee = Employee.objects.filter(badge_id=badge_id).first()
-            if employee:
-                request_data = Request(
-                    user=employee.employee_user_id,
-                    date=date_time_obj.date(),
-                    time=date_time_obj.time(),
-                    datetime=date_time_obj,
-                )
-                if punch_code in {0, 128}:
-                    try:
-                        clock_in(request_data)
-                    except Exception as error:
-                        logger.error("Error in clock in ", error)
-                else:
-                    try:
-                        # // 1 , 129 check type check out and door close
-                        clock_out(request_data)
-                    except Exception as error:
-                        logger.error("Error in clock out ", error)
+        result = apply_punches(
+            device,
+            [
+                anviz_punch(attendance)
+                for attendance in attendance_records["payload"]["list"]
+            ],
+            lookup="badge_id",
+        )
+        logger.info("Biometric punches of %s: %s", device, result)
 
 
 def cosec_biometric_device_attendance(device_id):
@@ -1967,35 +1863,11 @@ def cosec_biometric_device_attendance(device_id):
     if not isinstance(attendances, list):
         return
 
-    for attendance in attendances:
-        ref_user_id = attendance["detail-1"]
-        employee = BiometricEmployees.objects.filter(ref_user_id=ref_user_id).first()
-        if not employee:
-            continue
-
-        date_str = attendance["date"]
-        time_str = attendance["time"]
-        attendance_date = datetime.strptime(date_str, "%d/%m/%Y").date()
-        attendance_time = datetime.strptime(time_str, "%H:%M:%S").time()
-        attendance_datetime = datetime.combine(attendance_date, attendance_time)
-        punch_code = attendance["detail-2"]
-
-        request_data = Request(
-            user=employee.employee_id.employee_user_id,
-            date=attendance_date,
-            time=attendance_time,
-            datetime=django_timezone.make_aware(attendance_datetime),
-        )
-
-        try:
-            if punch_code in ["1", "3", "5", "7", "9", "0"]:
-                clock_in(request_data)
-            elif punch_code in ["2", "4", "6", "8", "10"]:
-                clock_out(request_data)
-            else:
-                pass
-        except Exception as error:
-            logger.error("Error processing attendance: ", error)
+    punches = [cosec_punch(attendance) for attendance in attendances]
+    result = apply_punches(
+        device, [punch for punch in punches if punch], lookup="ref_user_id"
+    )
+    logger.info("Biometric punches of %s: %s", device, result)
 
     if attendances:
         last_attendance = attendances[-1]
@@ -2009,7 +1881,9 @@ def cosec_biometric_device_attendance(device_id):
 
 
 try:
-    devices = BiometricDevices.objects.all().update(is_live=False)
+    if not POLLER_SETTINGS["enabled"]:
+        # the live capture threads do not survive a restart, the poller does
+        devices = BiometricDevices.objects.all().update(is_live=False)
     for device in BiometricDevices.objects.filter(is_scheduler=True):
         if device:
             if str_time_seconds(device.scheduler_duration) > 0:
@@ -0,0 +1,152 @@
+"""
+zk_log.py
+
+This module is used to read only the new records of the attendance log of a
+ZKTeco device.
+
+Each device keeps a cursor: the timestamp of the latest record it was read up
+to and the number of records its log held then. The record count of the log
+is read first, and nothing is downloaded while it has not grown. Otherwise the
+log records are decoded one at a time from the position of the cursor, so the
+records read before are skipped without being decoded. A log shorter than the
+cursor has been cleared on the device, and is read from the start keeping the
+records after the cursor timestamp.
+"""
+
+import logging
+from datetime import datetime
+from struct import unpack
+
+from django.utils import timezone as django_timezone
+from zk import const
+from zk.attendance import Attendance
+
+logger = logging.getLogger(__name__)
+
+CURSOR_FIELDS = [
+    "last_fetch_timestamp",
+    "last_fetch_record_count",
+    "last_fetch_date",
+    "last_fetch_time",
+]
+
+
+def _decode_time(value):
+    """
+    Decode a packed ZKTeco timestamp, the same way pyzk does
+    """
+    value = unpack("<I", value)[0]
+    second = value % 60
+    value //= 60
+    minute = value % 60
+    value //= 60
+    hour = value % 24
+    value //= 24
+    day = value % 31 + 1
+    value //= 31
+    month = value % 12 + 1
+    value //= 12
+    return datetime(value + 2000, month, day, hour, minute, second)
+
+
+def iter_attendance_log(conn, start=0):
+    """
+    Yield the pyzk Attendance records of the device log from the record at
+    the given position, decoding them one at a time.
+
+    The log formats are the 8, 16 and 40 byte records pyzk reads in
+    ZK.get_attendance.
+    """
+    conn.read_sizes()
+    if conn.records <= start:
+        return
+    users = conn.get_users()
+    data, size = conn.read_with_buffer(const.CMD_ATTLOG_RRQ)
+    if size < 4:
+        return
+    record_size = unpack("<I", data[:4])[0] // conn.records
+    data = memoryview(data)[4:]
+    user_ids = {user.uid: user.user_id for user in users}
+    uids = {user.user_id: user.uid for user in users}
+
+    for offset in range(start * record_size, len(data) - record_size + 1, record_size):
+        record = bytes(data[offset : offset + record_size])
+        if record_size == 8:
+            uid, status, timestamp, punch = unpack("<HB4sB", record)
+            user_id = user_ids.get(uid, str(uid))
+        elif record_size == 16:
+            user_id, timestamp, status, punch, _reserved, _workcode = unpack(
+                "<I4sBB2sI", record
+            )
+            user_id = str(user_id)
+            uid = uids.get(user_id, int(user_id))
+        else:
+            uid, user_id, status, timestamp, punch, _space = unpack(
+                "<H24sB4sB8s", record[:40]
+            )
+            user_id = user_id.split(b"\x00")[0].decode(errors="ignore")
+        yield Attendance(user_id, _decode_time(timestamp), status, punch, uid)
+
+
+def cursor_timestamp(device):
+    """
+    The timestamp the device log was read up to, from the date and time the
+    devices were fetched with before the cursor
+    """
+    if device.last_fetch_timestamp:
+        return device.last_fetch_timestamp
+    if device.last_fetch_date and device.last_fetch_time:
+        return django_timezone.make_aware(
+            datetime.combine(device.last_fetch_date, device.last_fetch_time)
+        )
+    return None
+
+
+def move_cursor(device, timestamp, record_count):
+    """
+    Move the cursor of the device to the given aware timestamp and log size
+    """
+    device.last_fetch_timestamp = timestamp
+    device.last_fetch_record_count = record_count
+    local_timestamp = django_timezone.localtime(timestamp)
+    device.last_fetch_date = local_timestamp.date()
+    device.last_fetch_time = local_timestamp.time()
+    device.save(update_fields=CURSOR_FIELDS)
+
+
+def zk_new_attendances(conn, device):
+    """
+    The attendance records of a ZKTeco device added after its cursor, moving
+    the cursor to the end of the log
+    """
+    record_count = device.last_fetch_record_count or 0
+    timestamp = cursor_timestamp(device)
+    conn.read_sizes()
+    if conn.records == record_count and timestamp:
+        return []
+
+    if conn.records > record_count:
+        start = record_count
+    else:
+        # the log was cleared since the last fetch
+        logger.info(
+            "The attendance log of %s shrank from %s to %s records",
+            device,
+            record_count,
+            conn.records,
+        )
+        start = 0
+
+    attendances = []
+    cursor = timestamp
+    for attendance in iter_attendance_log(conn, start):
+        punch_timestamp = django_timezone.make_aware(attendance.timestamp)
+        # the count can lag behind the log, the timestamp never does
+        if cursor and punch_timestamp <= cursor:
+            continue
+        attendances.append(attendance)
+        timestamp = max(timestamp, punch_timestamp) if timestamp else punch_timestamp
+
+    if timestamp:
+        move_cursor(device, timestamp, conn.records)
+    return attendances
@@ -18,8 +18,8 @@ from base.methods import filtersubordinatesemployeemodel
 from employee.models import DisciplinaryAction, Employee, Policy
 from horilla.filters import FilterSet, HorillaFilterSet, filter_by_name
 from horilla.horilla_middlewares import _thread_locals
+from horilla.search import rank_requested, search_employee_name
 from horilla_documents.models import Document
-from horilla_views.templatetags.generic_template_filters import getattribute
 
 
 class EmployeeFilter(HorillaFilterSet):
@@ -206,17 +206,9 @@ class EmployeeFilter(HorillaFilterSet):
         """
         Employee search method
         """
-        value = value.lower()
-
         if self.data.get("search_field"):
             return queryset
-
-        def _icontains(instance):
-            result = str(getattribute(instance, "get_full_name")).lower()
-            return instance.pk if value in result else None
-
-        ids = list(filter(None, map(_icontains, queryset)))
-        return queryset.filter(id__in=ids)
+        return search_employee_name(queryset, value, rank=rank_requested(self.data))
 
 
 class EmployeeReGroup:
@@ -223,10 +223,10 @@ class EmployeeForm(ModelForm):
         """
         This method is used to generate badge id
         """
-        from base.context_processors import get_initial_prefix
+        from base.context_processors import get_badge_id_prefix
         from employee.methods.methods import get_ordered_badge_ids
 
-        prefix = get_initial_prefix(None)["get_initial_prefix"]
+        prefix = get_badge_id_prefix()
         data = get_ordered_badge_ids()
         result = []
         try:
@@ -267,7 +267,7 @@ class EmployeeForm(ModelForm):
                 prefix = "".join(prefix)
         except Exception as e:
             logger.exception(e)
-            prefix = get_initial_prefix(None)["get_initial_prefix"]
+            prefix = get_badge_id_prefix()
         return prefix
 
     def clean_badge_id(self):
@@ -12,7 +12,7 @@ from django.apps import apps
 from django.contrib.auth.models import User
 from django.db import models
 
-from base.context_processors import get_initial_prefix
+from base.context_processors import get_badge_id_prefix
 from base.models import (
     Company,
     Department,
@@ -44,7 +44,7 @@ def dynamic_prefix_sort(item):
     Sorts items based on a dynamic prefix length.
     """
     # Assuming the dynamic prefix length is 3
-    prefix = get_initial_prefix(None)["get_initial_prefix"]
+    prefix = get_badge_id_prefix()
 
     prefix_length = len(prefix) if len(prefix) >= 3 else 3
     return item[:prefix_length]
@@ -62,7 +62,7 @@ def get_ordered_badge_ids():
     )
     if not data.first():
         data = [
-            f'{get_initial_prefix(None)["get_initial_prefix"]}0001',
+            f"{get_badge_id_prefix()}0001",
         ]
     # Separate pure number strings and convert them to integers
     pure_numbers = [int(item) for item in data if item.isdigit()]
@@ -34,7 +34,7 @@ from employee.methods.duration_methods import format_time, strtime_seconds
 from horilla import horilla_middlewares
 from horilla.methods import get_horilla_model_class
 from horilla.models import HorillaModel
-from horilla_audit.methods import get_diff
+from horilla_audit.methods import HistoryTimeline
 from horilla_audit.models import HorillaAuditInfo, HorillaAuditLog
 
 # create your model
@@ -663,7 +663,7 @@ class EmployeeWorkInformation(models.Model):
         """
         This method is used to return the tracked history of the instance
         """
-        return get_diff(self)
+        return HistoryTimeline(self).requested_page()
 
     def experience_calculator(self):
         """
@@ -840,7 +840,7 @@ class BonusPoint(HorillaModel):
         """
         This method is used to return the tracked history of the instance
         """
-        return get_diff(self)
+        return HistoryTimeline(self).requested_page()
 
     @receiver(post_save, sender=Employee)
     def bonus_post_save(sender, instance, **_kwargs):
@@ -1,8 +1,7 @@
 import datetime
-import sys
 from datetime import timedelta
 
-from apscheduler.schedulers.background import BackgroundScheduler
+from horilla.horilla_scheduler import register_job
 
 
 def update_experience():
@@ -13,9 +12,11 @@ def update_experience():
     to update the employee work experience
     """
     queryset = EmployeeWorkInformation.objects.filter(employee_id__is_active=True)
+    updated = 0
     for instance in queryset:
         instance.experience_calculator()
-    return
+        updated += 1
+    return updated
 
 
 def block_unblock_disciplinary():
@@ -132,14 +133,5 @@ def block_unblock_disciplinary():
     return
 
 
-if not any(
-    cmd in sys.argv
-    for cmd in ["makemigrations", "migrate", "compilemessages", "flush", "shell"]
-):
-    """
-    Initializes and starts background tasks using APScheduler when the server is running.
-    """
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(update_experience, "interval", hours=4)
-    scheduler.add_job(block_unblock_disciplinary, "interval", seconds=25)
-    scheduler.start()
+register_job(update_experience, "interval", hours=4)
+register_job(block_unblock_disciplinary, "interval", seconds=25)
@@ -221,6 +221,7 @@ urlpatterns = [
         kwargs={"model": Employee},
     ),
     path("document-tab/<int:emp_id>", views.document_tab, name="document-tab"),
+    path("history-tab/<int:emp_id>", views.history_tab, name="history-tab"),
     path(
         "bonus-points-tab/<int:emp_id>", views.bonus_points_tab, name="bonus-points-tab"
     ),
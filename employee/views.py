@@ -120,6 +120,7 @@ from horilla.filters import HorillaPaginator
 from horilla.group_by import group_by_queryset
 from horilla.horilla_settings import HORILLA_DATE_FORMATS
 from horilla.methods import get_horilla_model_class
+from horilla_audit.methods import get_diff
 from horilla_audit.models import AccountBlockUnblock, HistoryTrackingFields
 from horilla_documents.forms import (
     DocumentForm,
@@ -602,6 +603,24 @@ def document_tab(request, emp_id):
     return render(request, "tabs/document_tab.html", context=context)
 
 
+@login_required
+@hx_request_required
+@owner_can_enter("employee.view_historicalemployeeworkinformation", Employee)
+def history_tab(request, emp_id):
+    """
+    This function is used to view a page of the history tab of an employee in
+    employee individual view.
+
+    Parameters:
+    request (HttpRequest): The HTTP request object.
+    emp_id (int): The id of the employee.
+
+    Returns: return history tab template
+    """
+    employee = get_object_or_404(Employee, id=emp_id)
+    return render(request, "tabs/history.html", {"employee": employee})
+
+
 @login_required
 @hx_request_required
 @owner_can_enter("horilla_documents.add_document", Employee)
@@ -3185,7 +3204,8 @@ def bonus_points_tab(request, emp_id):
             )
         else:
             requested_bonus_points = QuerySet().none()
-        trackings = points.tracking()
+        # the whole history, merged with the requests by date
+        trackings = get_diff(points)
         activity_list = []
         for history in trackings:
             activity_list.append(
@@ -5,13 +5,12 @@ This module is used handle mail sent in thread
 """
 
 import logging
-from threading import Thread
 
-from django.contrib import messages
 from django.core.mail import EmailMessage
 from django.template.loader import render_to_string
 
 from base.backends import ConfiguredEmailBackend
+from base.mail_dispatch import MailTask, queue_mail
 from base.models import Department
 from employee.models import EmployeeWorkInformation
 from helpdesk.models import Ticket
@@ -19,13 +18,12 @@ from helpdesk.models import Ticket
 logger = logging.getLogger(__name__)
 
 
-class TicketSendThread(Thread):
+class TicketSendThread(MailTask):
     """
     MailSend
     """
 
     def __init__(self, request, ticket, type):
-        Thread.__init__(self)
         self.ticket = ticket
         self.type = type
         self.request = request
@@ -76,16 +74,9 @@ class TicketSendThread(Thread):
                 reply_to=[display_email_name],
             )
             email.content_subtype = "html"
-            try:
-                email.send()
-            except:
-                messages.error(
-                    self.request, f"Mail not sent to {recipient.get_full_name()}"
-                )
+            queue_mail(email)
 
     def run(self) -> None:
-        super().run()
-
         if self.type == "create":
             owner = self.ticket.employee_id
             manager = self.department_manager
@@ -130,13 +121,12 @@ class TicketSendThread(Thread):
         return
 
 
-class AddAssigneeThread(Thread):
+class AddAssigneeThread(MailTask):
     """
     MailSend
     """
 
     def __init__(self, request, ticket, recipient):
-        Thread.__init__(self)
         self.ticket = ticket
         self.recipients = recipient
         self.request = request
@@ -144,8 +134,6 @@ class AddAssigneeThread(Thread):
         self.protocol = "https" if request.is_secure() else "http"
 
     def run(self) -> None:
-        super().run()
-
         content = "Please review the ticket details and take appropriate action accordingly. If you have any questions or require further information, feel free to reach out to the owner or the Support/Helpdesk team."
         subject = "You have been assigned to a Ticket"
 
@@ -181,21 +169,15 @@ class AddAssigneeThread(Thread):
                 reply_to=[display_email_name],
             )
             email.content_subtype = "html"
-            try:
-                email.send()
-            except:
-                messages.error(
-                    self.request, f"Mail not sent to {recipient.get_full_name()}"
-                )
+            queue_mail(email)
 
 
-class RemoveAssigneeThread(Thread):
+class RemoveAssigneeThread(MailTask):
     """
     MailSend
     """
 
     def __init__(self, request, ticket, recipient):
-        Thread.__init__(self)
         self.ticket = ticket
         self.recipients = recipient
         self.request = request
@@ -203,8 +185,6 @@ class RemoveAssigneeThread(Thread):
         self.protocol = "https" if request.is_secure() else "http"
 
     def run(self) -> None:
-        super().run()
-
         content = "Please review the ticket details and take appropriate action accordingly. If you have any questions or require further information, feel free to reach out to the owner or the Support/Helpdesk team."
         subject = "You have been removed from a Ticket"
         email_backend = ConfiguredEmailBackend()
@@ -240,9 +220,4 @@ class RemoveAssigneeThread(Thread):
                 reply_to=[display_email_name],
             )
             email.content_subtype = "html"
-            try:
-                email.send()
-            except:
-                messages.error(
-                    self.request, f"Mail not sent to {recipient.get_full_name()}"
-                )
+            queue_mail(email)
@@ -6,12 +6,14 @@ import uuid
 
 import django_filters
 from django import forms
+from django.core.exceptions import FieldDoesNotExist
 from django.core.paginator import Page, Paginator
 from django.db import models
 from django_filters.filterset import FILTER_FOR_DBFIELD_DEFAULTS
 
 from base.methods import reload_queryset
 from horilla.horilla_middlewares import _thread_locals
+from horilla.search import rank_requested, search_employee_name, search_text
 from horilla_views.templatetags.generic_template_filters import getattribute
 
 FILTER_FOR_DBFIELD_DEFAULTS[models.ForeignKey][
@@ -21,27 +23,38 @@ FILTER_FOR_DBFIELD_DEFAULTS[models.ForeignKey][
 
 def filter_by_name(queryset, name, value):
     """
-    Filter queryset by first name or last name.
+    Filter queryset by the full name of the employee.
     """
-    # Split the search value into first name and last name
-    parts = value.split()
-    first_name = parts[0]
-    last_name = " ".join(parts[1:]) if len(parts) > 1 else ""
-
-    # Filter the queryset by first name and last name
-    if first_name and last_name:
-        queryset = queryset.filter(
-            employee_id__employee_first_name__icontains=first_name,
-            employee_id__employee_last_name__icontains=last_name,
-        )
-    elif first_name:
-        queryset = queryset.filter(
-            employee_id__employee_first_name__icontains=first_name
-        )
-    elif last_name:
-        queryset = queryset.filter(employee_id__employee_last_name__icontains=last_name)
+    return search_employee_name(
+        queryset, value, prefix="employee_id__", rank=rank_requested()
+    )
+
 
-    return queryset
+def _search_lookup(model, path):
+    """
+    The database lookup of a search field path and whether it follows a
+    multi valued relation, or None when it isn't a text column or an employee
+    name
+    """
+    opts = model._meta
+    parts = path.split("__")
+    multiple = False
+    for index, part in enumerate(parts):
+        last = index == len(parts) - 1
+        if last and part == "get_full_name" and opts.model_name == "employee":
+            return "__".join(parts[:-1]), multiple
+        try:
+            field = opts.get_field(part)
+        except FieldDoesNotExist:
+            return None
+        # other columns are matched on their string value in Python
+        if last and isinstance(field, (models.CharField, models.TextField)):
+            return path, multiple
+        if last or not field.is_relation:
+            return None
+        multiple = multiple or field.many_to_many or field.one_to_many
+        opts = field.related_model._meta
+    return None
 
 
 class FilterSet(django_filters.FilterSet):
@@ -126,9 +139,24 @@ class HorillaFilterSet(FilterSet):
         if not search_field:
             search_field = self.filters[name].field_name
 
-        def _icontains(instance):
-            result = str(getattribute(instance, search_field)).lower()
-            return instance.pk if search in result else None
-
-        ids = list(filter(None, map(_icontains, queryset)))
-        return queryset.filter(id__in=ids)
+        lookup = _search_lookup(queryset.model, search_field)
+        if lookup is None:
+
+            def _icontains(instance):
+                result = str(getattribute(instance, search_field)).lower()
+                return instance.pk if search in result else None
+
+            ids = list(filter(None, map(_icontains, queryset)))
+            return queryset.filter(id__in=ids)
+
+        path, multiple = lookup
+        if search_field.endswith("get_full_name"):
+            prefix = f"{path}__" if path else ""
+            queryset = search_employee_name(
+                queryset, search, prefix=prefix, rank=rank_requested(self.data)
+            )
+        else:
+            queryset = search_text(
+                queryset, path, search, rank=rank_requested(self.data)
+            )
+        return queryset.distinct() if multiple else queryset
@@ -0,0 +1,312 @@
+"""
+horilla_scheduler.py
+
+This module holds the single registry of the periodic jobs of the horilla apps.
+
+Every process registers the jobs, but only the process holding the leader lease
+runs them. The lease is a row in the django_apscheduler job table that is
+renewed by the leader and taken over by another process once it expires. Each
+run is recorded as a django_apscheduler job execution, and the last run
+duration and row count of a job are kept in its job row.
+"""
+
+import atexit
+import logging
+import os
+import pickle
+import socket
+import sys
+import threading
+import time
+from datetime import timedelta
+
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers.background import BackgroundScheduler
+from django.db import IntegrityError, close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+LEADER_JOB_ID = "horilla_scheduler_leader"
+LEASE_SECONDS = 60
+HEARTBEAT_SECONDS = 20
+EXECUTION_MAX_AGE = 7 * 24 * 60 * 60
+SKIP_COMMANDS = ["makemigrations", "migrate", "compilemessages", "flush", "shell"]
+
+# job id -> (function, trigger, trigger arguments)
+JOBS = {}
+# callables run by the leader on every heartbeat to register or remove the
+# jobs whose schedule is configured in the database
+JOB_LOADERS = []
+
+
+def _job_id(func):
+    return f"{func.__module__}.{func.__name__}"
+
+
+class HorillaJobRunner:
+    """
+    Runs the registered jobs in the process holding the leader lease
+    """
+
+    def __init__(self):
+        self.identity = f"{socket.gethostname()}:{os.getpid()}".encode()
+        self.scheduler = BackgroundScheduler(
+            job_defaults={"coalesce": True, "max_instances": 1}
+        )
+        self.is_leader = False
+        self.lock = threading.Lock()
+
+    def start(self):
+        """
+        Start the heartbeat that acquires and renews the leader lease
+        """
+        if self.scheduler.running:
+            return
+        self.scheduler.add_job(
+            self.heartbeat,
+            "interval",
+            seconds=HEARTBEAT_SECONDS,
+            id=LEADER_JOB_ID,
+            next_run_time=timezone.now(),
+        )
+        self.scheduler.start()
+        atexit.register(self.release_lease)
+
+    def release_lease(self):
+        """
+        Expire the lease held by this process so another one takes over
+        without waiting for it to time out
+        """
+        from django_apscheduler.models import DjangoJob
+
+        if not self.is_leader:
+            return
+        self.is_leader = False
+        try:
+            DjangoJob.objects.filter(id=LEADER_JOB_ID, job_state=self.identity).update(
+                next_run_time=timezone.now()
+            )
+        except Exception as e:
+            logger.error(e)
+
+    def heartbeat(self):
+        """
+        Acquire or renew the leader lease and schedule or drop the jobs
+        accordingly
+        """
+        close_old_connections()
+        try:
+            is_leader = self.acquire_lease()
+        except Exception as e:
+            logger.error(e)
+            is_leader = False
+        finally:
+            close_old_connections()
+
+        with self.lock:
+            if is_leader and not self.is_leader:
+                logger.info("Horilla scheduler leader: %s", self.identity.decode())
+                self.is_leader = True
+                for job_id in JOBS:
+                    self.schedule(job_id)
+            elif not is_leader and self.is_leader:
+                self.is_leader = False
+                for job_id in JOBS:
+                    self.unschedule(job_id)
+
+        if self.is_leader:
+            for loader in JOB_LOADERS:
+                try:
+                    loader()
+                except Exception as e:
+                    logger.error(e)
+            close_old_connections()
+
+    def acquire_lease(self):
+        """
+        Take the lease when it is free or expired, or extend it when this
+        process already holds it
+        """
+        from django_apscheduler.models import DjangoJob
+
+        now = timezone.now()
+        expires = now + timedelta(seconds=LEASE_SECONDS)
+        renewed = (
+            DjangoJob.objects.filter(id=LEADER_JOB_ID)
+            .filter(Q(next_run_time__lt=now) | Q(job_state=self.identity))
+            .update(next_run_time=expires, job_state=self.identity)
+        )
+        if renewed:
+            return True
+        try:
+            with transaction.atomic():
+                DjangoJob.objects.create(
+                    id=LEADER_JOB_ID, next_run_time=expires, job_state=self.identity
+                )
+        except IntegrityError:
+            return False
+        return True
+
+    def schedule(self, job_id):
+        func, trigger, trigger_args = JOBS[job_id]
+        self.scheduler.add_job(
+            self.run,
+            trigger,
+            args=[job_id],
+            id=job_id,
+            name=job_id,
+            replace_existing=True,
+            **trigger_args,
+        )
+
+    def unschedule(self, job_id):
+        try:
+            self.scheduler.remove_job(job_id)
+        except JobLookupError:
+            pass
+
+    def run(self, job_id):
+        """
+        Run the job and record its duration and the number of rows it returned
+        """
+        from django_apscheduler.models import DjangoJob, DjangoJobExecution
+
+        if not self.is_leader or job_id not in JOBS:
+            return
+        func = JOBS[job_id][0]
+        close_old_connections()
+        run_time = timezone.now()
+        started = time.monotonic()
+        status = DjangoJobExecution.SUCCESS
+        exception = None
+        rows = None
+        try:
+            result = func()
+            if isinstance(result, int) and not isinstance(result, bool):
+                rows = result
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            status = DjangoJobExecution.ERROR
+            exception = str(e)[:1000]
+        duration = time.monotonic() - started
+
+        job = self.scheduler.get_job(job_id)
+        metrics = {
+            "last_run": run_time,
+            "duration": duration,
+            "rows": rows,
+            "status": status,
+        }
+        try:
+            DjangoJob.objects.update_or_create(
+                id=job_id,
+                defaults={
+                    "next_run_time": getattr(job, "next_run_time", None),
+                    "job_state": pickle.dumps(metrics),
+                },
+            )
+            DjangoJobExecution.objects.create(
+                job_id=job_id,
+                status=status,
+                run_time=run_time,
+                duration=round(duration, 2),
+                finished=round(time.time(), 2),
+                exception=exception,
+            )
+        except Exception as e:
+            logger.error(e)
+        finally:
+            close_old_connections()
+
+
+runner = HorillaJobRunner()
+
+
+def register_job(func, trigger, job_id=None, **trigger_args):
+    """
+    Register a periodic job. The arguments follow APScheduler's add_job, the
+    job id defaults to the dotted path of the function. Registering an
+    existing id replaces the job.
+    """
+    job_id = job_id or _job_id(func)
+    if JOBS.get(job_id) == (func, trigger, trigger_args):
+        return func
+    JOBS[job_id] = (func, trigger, trigger_args)
+    with runner.lock:
+        if runner.is_leader:
+            runner.schedule(job_id)
+    return func
+
+
+def unregister_job(job_id):
+    """
+    Remove a registered job
+    """
+    if JOBS.pop(job_id, None) is None:
+        return
+    with runner.lock:
+        runner.unschedule(job_id)
+
+
+def register_job_loader(loader):
+    """
+    Register a callable that the leader runs on every heartbeat to keep the
+    database configured jobs in sync
+    """
+    if loader not in JOB_LOADERS:
+        JOB_LOADERS.append(loader)
+    return loader
+
+
+def start_job_runner():
+    """
+    Start the job runner unless the process is a management command that
+    should not run jobs
+    """
+    if any(cmd in sys.argv for cmd in SKIP_COMMANDS):
+        return
+    runner.start()
+
+
+def job_metrics():
+    """
+    Return the last run time, duration, row count and status of every
+    registered job
+    """
+    from django_apscheduler.models import DjangoJob
+
+    stored = {
+        job.id: job
+        for job in DjangoJob.objects.filter(id__in=list(JOBS)).only(
+            "id", "next_run_time", "job_state"
+        )
+    }
+    metrics = []
+    for job_id in sorted(JOBS):
+        job = stored.get(job_id)
+        data = {"last_run": None, "duration": None, "rows": None, "status": None}
+        if job is not None:
+            try:
+                data.update(pickle.loads(job.job_state))
+            except Exception:
+                pass
+        data["id"] = job_id
+        data["next_run_time"] = getattr(job, "next_run_time", None)
+        metrics.append(data)
+    return metrics
+
+
+def delete_old_job_executions():
+    """
+    Remove the job execution records older than a week
+    """
+    from django_apscheduler.models import DjangoJobExecution
+
+    expired = timezone.now() - timedelta(seconds=EXECUTION_MAX_AGE)
+    deleted, _ = DjangoJobExecution.objects.filter(run_time__lte=expired).delete()
+    return deleted
+
+
+register_job(delete_old_job_executions, "interval", hours=24)
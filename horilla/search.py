@@ -0,0 +1,202 @@
+"""
+search.py
+
+This module is used to run the search bars of the list views in the database.
+
+A search is a case insensitive substring match, as the search bars always
+matched, on a text column or on the full name of an employee. The text and
+the searched value are both upper cased by the database, so they are folded
+the same way, and on PostgreSQL the LIKE query is served by the trigram
+indexes of SEARCH_INDEXES, created with the pg_trgm extension after the
+migrations. The other databases run the same LIKE query without the index.
+
+A ranked search orders the matches by relevance: by the pg_trgm word
+similarity with the searched value when the extension is installed, else by
+whether the value matches the whole text, its start, the start of a word or
+only somewhere inside it.
+"""
+
+import logging
+
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+from django.db.models import (
+    Case,
+    CharField,
+    F,
+    FloatField,
+    Func,
+    IntegerField,
+    Value,
+    When,
+)
+from django.db.models.functions import Concat, Upper
+
+from horilla.horilla_middlewares import _thread_locals
+
+logger = logging.getLogger(__name__)
+
+# rank the searches of the search bars when the request doesn't say
+RANK_SEARCH = getattr(settings, "HORILLA_SEARCH_RANKING", False)
+FULL_NAME_SQL = "UPPER(TRIM({first_name} || ' ' || COALESCE({last_name}, '')))"
+# || is the OR operator on MySQL
+MYSQL_FULL_NAME_SQL = (
+    "UPPER(TRIM(CONCAT({first_name}, ' ', COALESCE({last_name}, ''))))"
+)
+# trigram indexes created on PostgreSQL, by app: (name, model, expression)
+SEARCH_INDEXES = {
+    "employee": [
+        (
+            "employee_full_name_trgm_idx",
+            "employee.employee",
+            FULL_NAME_SQL.format(
+                first_name="employee_first_name", last_name="employee_last_name"
+            ),
+        ),
+    ],
+    "recruitment": [
+        ("candidate_name_trgm_idx", "recruitment.candidate", "UPPER(name)"),
+    ],
+}
+
+_trigram_installed = {}
+
+
+class FullName(Func):
+    """
+    The upper case full name of an employee, as Employee.get_full_name
+    builds it, in the SQL of the full name index
+    """
+
+    output_field = CharField()
+
+    def __init__(self, prefix=""):
+        super().__init__(
+            F(f"{prefix}employee_first_name"), F(f"{prefix}employee_last_name")
+        )
+
+    def as_sql(self, compiler, connection, template=FULL_NAME_SQL, **extra_context):
+        first_name, last_name = self.get_source_expressions()
+        first_name_sql, first_name_params = compiler.compile(first_name)
+        last_name_sql, last_name_params = compiler.compile(last_name)
+        sql = template.format(first_name=first_name_sql, last_name=last_name_sql)
+        return sql, [*first_name_params, *last_name_params]
+
+    def as_mysql(self, compiler, connection, **extra_context):
+        return self.as_sql(
+            compiler, connection, template=MYSQL_FULL_NAME_SQL, **extra_context
+        )
+
+
+class WordSimilarity(Func):
+    """
+    The pg_trgm word similarity of the searched value with a text
+    """
+
+    function = "WORD_SIMILARITY"
+    output_field = FloatField()
+
+
+def trigram_installed(using="default"):
+    """
+    Whether the pg_trgm extension is installed on the PostgreSQL database
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return False
+    if using not in _trigram_installed:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram_installed[using] = cursor.fetchone() is not None
+    return _trigram_installed[using]
+
+
+def rank_requested(data=None):
+    """
+    Whether the search is ranked: the search_rank parameter of the filter
+    data, or of the request, else the HORILLA_SEARCH_RANKING setting
+    """
+    if data is None:
+        request = getattr(_thread_locals, "request", None)
+        data = getattr(request, "GET", {})
+    rank = data.get("search_rank")
+    if rank in (None, ""):
+        return RANK_SEARCH
+    return str(rank).lower() in ["true", "on", "1"]
+
+
+def _rank(queryset, search):
+    if trigram_installed(queryset.db):
+        rank = WordSimilarity(search, F("search_text"))
+    else:
+        rank = Case(
+            When(search_text=search, then=Value(3)),
+            When(search_text__startswith=search, then=Value(2)),
+            When(
+                search_text__contains=Concat(Value(" "), search),
+                then=Value(1),
+            ),
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+    ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+    return queryset.annotate(search_rank=rank).order_by("-search_rank", *ordering)
+
+
+def search_expression(queryset, expression, value, rank=False):
+    """
+    Filter the queryset on the upper case text expression containing the
+    value, ordering the matches by relevance when ranked. The value is upper
+    cased by the database too, so both sides are folded the same way.
+    """
+    value = value.strip()
+    if not value:
+        return queryset
+    search = Upper(Value(value, output_field=CharField()))
+    queryset = queryset.alias(search_text=expression).filter(
+        search_text__contains=search
+    )
+    return _rank(queryset, search) if rank else queryset
+
+
+def search_text(queryset, lookup, value, rank=False):
+    """
+    Search the value in a text column of the queryset
+    """
+    return search_expression(queryset, Upper(F(lookup)), value, rank=rank)
+
+
+def search_employee_name(queryset, value, prefix="", rank=False):
+    """
+    Search the value in the full name of the employees, or of the employee
+    the queryset rows relate to through the prefix, e.g. "employee_id__"
+    """
+    return search_expression(queryset, FullName(prefix), value, rank=rank)
+
+
+def create_search_indexes(app_label, using="default"):
+    """
+    Create the trigram indexes of the app on PostgreSQL, installing pg_trgm
+    when the database user is allowed to
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql" or app_label not in SEARCH_INDEXES:
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    except Exception as e:
+        logger.warning("The pg_trgm extension is not installed: %s", e)
+        return
+    _trigram_installed.pop(using, None)
+    for name, label, expression in SEARCH_INDEXES[app_label]:
+        table = connection.ops.quote_name(apps.get_model(label)._meta.db_table)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f"CREATE INDEX IF NOT EXISTS {name} ON {table} "
+                    f"USING gin (({expression}) gin_trgm_ops)"
+                )
+        except Exception as e:
+            logger.warning("The search index %s was not created: %s", name, e)
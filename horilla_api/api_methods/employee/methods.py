@@ -9,10 +9,10 @@ def get_next_badge_id():
     """
     This method is used to generate badge id
     """
-    from base.context_processors import get_initial_prefix
+    from base.context_processors import get_badge_id_prefix
     from employee.methods.methods import get_ordered_badge_ids
 
-    prefix = get_initial_prefix(None)["get_initial_prefix"]
+    prefix = get_badge_id_prefix()
     data = get_ordered_badge_ids()
     result = []
     try:
@@ -50,5 +50,5 @@ def get_next_badge_id():
                 prefix.insert(0, str(item))
             prefix = "".join(prefix)
     except Exception as e:
-        prefix = get_initial_prefix(None)["get_initial_prefix"]
+        prefix = get_badge_id_prefix()
     return prefix
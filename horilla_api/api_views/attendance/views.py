@@ -15,11 +15,7 @@ from rest_framework.views import APIView
 from attendance.models import Attendance, AttendanceActivity, EmployeeShiftDay
 from attendance.views.clock_in_out import *
 from attendance.views.clock_in_out import clock_out
-from attendance.views.dashboard import (
-    find_expected_attendances,
-    find_late_come,
-    find_on_time,
-)
+from attendance.views.dashboard import find_expected_attendances, rollup_totals
 from attendance.views.views import *
 from base.backends import ConfiguredEmailBackend
 from base.methods import generate_pdf, is_reportingmanager
@@ -656,9 +652,9 @@ class TodayAttendance(APIView):
         today = datetime.today()
         week_day = today.strftime("%A").lower()
 
-        on_time = find_on_time(request, today=today, week_day=week_day)
-        late_come = find_late_come(start_date=today)
-        late_come_obj = len(late_come)
+        totals = rollup_totals(today)
+        on_time = totals["on_time"]
+        late_come_obj = totals["late_come"]
 
         marked_attendances = late_come_obj + on_time
 
@@ -1,5 +1,4 @@
 import gettext
-from collections import defaultdict
 
 from django.contrib.auth.decorators import permission_required
 from django.shortcuts import render
@@ -17,6 +16,7 @@ from payroll.filters import (
     DeductionFilter,
     PayslipFilter,
 )
+from payroll.methods.payslip_distribution import create_distribution_job
 from payroll.models.models import (
     Allowance,
     Contract,
@@ -99,18 +99,9 @@ class PayslipSendMailView(APIView):
 
         payslip_ids = request.data.get("id", [])
         payslips = Payslip.objects.filter(id__in=payslip_ids)
-        result_dict = defaultdict(
-            lambda: {"employee_id": None, "instances": [], "count": 0}
-        )
-
-        for payslip in payslips:
-            employee_id = payslip.employee_id
-            result_dict[employee_id]["employee_id"] = employee_id
-            result_dict[employee_id]["instances"].append(payslip)
-            result_dict[employee_id]["count"] += 1
-        mail_thread = MailSendThread(request, result_dict=result_dict, ids=payslip_ids)
-        mail_thread.start()
-        return Response({"status": "success"}, status=200)
+        job = create_distribution_job(request, payslips)
+        MailSendThread(request, job).start()
+        return Response({"status": "success", "job_id": job.id}, status=200)
 
 
 class ContractView(APIView):
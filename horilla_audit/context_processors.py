@@ -6,6 +6,7 @@ This module is used to register context processor`
 
 from django.http import JsonResponse
 from django.urls import include, path
+from django.utils.functional import SimpleLazyObject
 
 from horilla.urls import urlpatterns
 from horilla_audit.forms import HistoryForm
@@ -16,8 +17,7 @@ def history_form(request):
     """
     This method will return the history additional field form
     """
-    form = HistoryForm()
-    return {"history_form": form}
+    return {"history_form": SimpleLazyObject(HistoryForm)}
 
 
 def dynamic_tag(request):
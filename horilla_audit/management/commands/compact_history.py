@@ -0,0 +1,90 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from simple_history.models import HistoricalChanges
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove the history entries that change nothing from the entry before "
+        "them, which were kept before the duplicates were removed on save"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--model",
+            action="append",
+            help="Tracked model to compact (app_label.ModelName), defaults to all",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Number of duplicate entries deleted per query",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Count the duplicate entries without deleting them",
+        )
+
+    def handle(self, *args, **kwargs):
+        history_models = [
+            model for model in apps.get_models() if issubclass(model, HistoricalChanges)
+        ]
+        if kwargs["model"]:
+            labels = {label.lower() for label in kwargs["model"]}
+            history_models = [
+                model
+                for model in history_models
+                if model.instance_type._meta.label_lower in labels
+            ]
+            if not history_models:
+                raise CommandError(f"No tracked model among {kwargs['model']}")
+
+        total = 0
+        for history_model in history_models:
+            duplicates = self.compact(
+                history_model, kwargs["batch_size"], kwargs["dry_run"]
+            )
+            total += duplicates
+            if duplicates:
+                self.stdout.write(
+                    f"{history_model.instance_type._meta.label}: {duplicates} "
+                    "duplicate entries"
+                )
+
+        action = "found" if kwargs["dry_run"] else "removed"
+        self.stdout.write(self.style.SUCCESS(f"{total} duplicate entries {action}."))
+
+    def compact(self, history_model, batch_size, dry_run):
+        """
+        Walk the entries of each object from the newest, comparing every entry
+        with the entry before it, and delete the ones that change nothing
+        """
+        object_field = history_model.instance_type._meta.pk.attname
+        entries = history_model.objects.order_by(
+            object_field, "-history_date", "-history_id"
+        ).iterator(chunk_size=batch_size)
+
+        duplicates = []
+        count = 0
+        entry = None
+        for previous in entries:
+            if (
+                entry is not None
+                and getattr(entry, object_field) == getattr(previous, object_field)
+                and not entry.diff_against(previous).changed_fields
+            ):
+                duplicates.append(entry.pk)
+            entry = previous
+            if len(duplicates) >= batch_size:
+                count += self.delete(history_model, duplicates, dry_run)
+                duplicates = []
+        return count + self.delete(history_model, duplicates, dry_run)
+
+    def delete(self, history_model, pks, dry_run):
+        if pks and not dry_run:
+            history_model.objects.filter(pk__in=pks).delete()
+        return len(pks)
@@ -4,12 +4,21 @@ methods.py
 This module is used to write methods related to the history
 """
 
-from django.contrib.auth.models import User
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.cache import cache as CACHE
 from django.core.paginator import Paginator
 from django.db import models
 from django.shortcuts import render
+from django.utils.functional import cached_property
 
 from horilla.decorators import apply_decorators
+from horilla.horilla_middlewares import _thread_locals
+
+# history entries never change, their diffs are kept until the cache evicts
+DIFF_CACHE_TIMEOUT = getattr(settings, "HORILLA_AUDIT_DIFF_CACHE_TIMEOUT", None)
+HISTORY_PAGE_SIZE = 10
 
 
 class Bot:
@@ -34,20 +43,29 @@ def _check_and_delete(entry1, entry2, dry_run=False):
 
 def remove_duplicate_history(instance):
     """
-    This method is used to remove duplicate entries
+    This method is used to remove the latest history entry of the instance
+    when it changes nothing from the entry before it
     """
-    o_qs = instance.history_set.all()
-    entries_deleted = 0
     # ordering is ('-history_date', '-history_id') so this is ok
-    f1 = o_qs.first()
-    if not f1:
-        return
-    for f2 in o_qs[1:]:
-        entries_deleted += _check_and_delete(
-            f1,
-            f2,
-        )
-        f1 = f2
+    entries = list(instance.history_set.all()[:2])
+    if len(entries) < 2:
+        return 0
+    return _check_and_delete(*entries)
+
+
+def history_changes(entry, previous):
+    """
+    This method is used to return the (field, old, new) changes between a
+    history entry and the entry before it, cached as history entries do not
+    change
+    """
+    key = f"horilla_audit_diff:{entry._meta.label_lower}:{entry.pk}:{previous.pk}"
+    changes = CACHE.get(key)
+    if changes is None:
+        delta = entry.diff_against(previous)
+        changes = [(change.field, change.old, change.new) for change in delta.changes]
+        CACHE.set(key, changes, DIFF_CACHE_TIMEOUT)
+    return changes
 
 
 def get_field_label(model_class, field_name):
@@ -73,74 +91,100 @@ def filter_history(histories, track_fields):
     return histories
 
 
-def get_diff(instance):
-    """
-    This method is used to find the differences in the history
-    """
-    remove_duplicate_history(instance)
-    history = instance.history_set.all()
-    history_list = list(history)
-    pairs = [
-        [history_list[i], history_list[i + 1]] for i in range(len(history_list) - 1)
-    ]
-    delta_changes = []
-    create_history = history.filter(history_type="+").first()
-    for pair in pairs:
-        delta = pair[0].diff_against(pair[1])
-        diffs = []
-        class_name = pair[0].instance.__class__
-        for change in delta.changes:
-            old = change.old
-            new = change.new
-            field = instance._meta.get_field(change.field)
-            is_fk = False
-            if (
-                isinstance(field, models.fields.CharField)
-                and field.choices
-                and old
-                and new
-            ):
-                choices = dict(field.choices)
-                old = choices[old]
-                new = choices[new]
-            if isinstance(field, models.ForeignKey):
-                is_fk = True
-                # old = getattr(pair[0], change.field)
-                # new = getattr(pair[1], change.field)
-            diffs.append(
-                {
-                    "field": get_field_label(class_name, change.field),
-                    "field_name": change.field,
-                    "is_fk": is_fk,
-                    "old": old,
-                    "new": new,
-                }
-            )
-        updated_by = (
-            User.objects.get(id=pair[0].history_user.id).employee_get
-            if pair[0].history_user
-            else Bot()
-        )
-        delta_changes.append(
-            {
-                "type": "Changes",
-                "pair": pair,
-                "changes": diffs,
-                "updated_by": updated_by,
-            }
-        )
-    if create_history:
-        try:
-            updated_by = create_history.history_user.employee_get
-        except:
-            updated_by = Bot()
-        delta_changes.append(
+def _history_user(entry):
+    if not entry.history_user:
+        return Bot()
+    try:
+        return entry.history_user.employee_get
+    except:
+        return Bot()
+
+
+def _delta_change(instance, entry, previous, changes):
+    diffs = []
+    class_name = instance.__class__
+    for field_name, old, new in changes:
+        field = instance._meta.get_field(field_name)
+        is_fk = False
+        if isinstance(field, models.fields.CharField) and field.choices and old and new:
+            choices = dict(field.choices)
+            old = choices[old]
+            new = choices[new]
+        if isinstance(field, models.ForeignKey):
+            is_fk = True
+        diffs.append(
             {
-                "type": f"{create_history.instance.__class__._meta.verbose_name.capitalize()} created",
-                "pair": (create_history, create_history),
-                "updated_by": updated_by,
+                "field": get_field_label(class_name, field_name),
+                "field_name": field_name,
+                "is_fk": is_fk,
+                "old": old,
+                "new": new,
+                "old_display": old,
+                "new_display": new,
             }
         )
+    return {
+        "type": "Changes",
+        "pair": [entry, previous],
+        "changes": diffs,
+        "updated_by": _history_user(entry),
+    }
+
+
+def _create_change(instance, create_history):
+    return {
+        "type": f"{instance._meta.verbose_name.capitalize()} created",
+        "pair": (create_history, create_history),
+        "updated_by": _history_user(create_history),
+    }
+
+
+def _resolve_foreign_keys(instance, delta_changes):
+    """
+    Set the objects the foreign key changes point to as their display values,
+    loading them with one query per related model
+    """
+    fk_changes = []
+    pks = defaultdict(set)
+    for delta_change in delta_changes:
+        for change in delta_change.get("changes", []):
+            if change["is_fk"]:
+                model = instance._meta.get_field(change["field_name"]).related_model
+                fk_changes.append((model, change))
+                for key in ("old", "new"):
+                    # older django-simple-history versions diff the objects
+                    change[key] = getattr(change[key], "pk", change[key])
+                    if change[key] is not None:
+                        pks[model].add(change[key])
+    related_objects = {
+        model: model._base_manager.in_bulk(model_pks)
+        for model, model_pks in pks.items()
+    }
+    for model, change in fk_changes:
+        for key in ("old", "new"):
+            pk = change[key]
+            if pk is not None and pk not in related_objects[model]:
+                change[f"{key}_display"] = f"{pk} (Previous {change['field']} deleted)"
+            else:
+                change[f"{key}_display"] = related_objects[model].get(pk)
+
+
+def _delta_changes(instance, entries, with_create=True):
+    """
+    Changes between the consecutive entries, newest first. The entries that
+    change nothing, kept until the history is compacted, are left out.
+    """
+    delta_changes = []
+    for entry, previous in zip(entries, entries[1:]):
+        changes = history_changes(entry, previous)
+        if changes:
+            delta_changes.append(_delta_change(instance, entry, previous, changes))
+    create_history = next(
+        (entry for entry in entries if entry.history_type == "+"), None
+    )
+    if with_create and create_history:
+        delta_changes.append(_create_change(instance, create_history))
+    _resolve_foreign_keys(instance, delta_changes)
     if instance._meta.model_name == "employeeworkinformation":
         from .models import HistoryTrackingFields
 
@@ -152,6 +196,75 @@ def get_diff(instance):
     return delta_changes
 
 
+def _history(instance):
+    history = instance.history_set.select_related("history_user__employee_get")
+    if any(field.name == "history_tags" for field in history.model._meta.get_fields()):
+        history = history.prefetch_related("history_tags")
+    return history
+
+
+def get_diff(instance):
+    """
+    This method is used to find the differences in the history
+    """
+    return _delta_changes(instance, list(_history(instance)))
+
+
+class HistoryTimeline:
+    """
+    The differences in the history of an instance, newest first, a page at a
+    time. The entries of a page are loaded and compared when the page is read.
+    """
+
+    def __init__(self, instance, per_page=HISTORY_PAGE_SIZE):
+        self.instance = instance
+        self.per_page = per_page
+        self.history = _history(instance)
+        self.paginator = Paginator(self.history, per_page)
+
+    def page(self, number=1):
+        return HistoryTimelinePage(self, self.paginator.get_page(number))
+
+    def requested_page(self):
+        """
+        The page named by the history_page parameter of the current request
+        """
+        request = getattr(_thread_locals, "request", None)
+        return self.page(getattr(request, "GET", {}).get("history_page", 1))
+
+
+class HistoryTimelinePage:
+    """
+    A page of a HistoryTimeline, iterating the differences of its entries
+    """
+
+    def __init__(self, timeline, page_obj):
+        self.timeline = timeline
+        self.page_obj = page_obj
+
+    def __getattr__(self, name):
+        return getattr(self.page_obj, name)
+
+    def __iter__(self):
+        return iter(self.changes)
+
+    def __len__(self):
+        return len(self.changes)
+
+    @cached_property
+    def changes(self):
+        if not self.page_obj.paginator.count:
+            return []
+        start = self.page_obj.start_index() - 1
+        # the entry before the page is loaded to compare the last one with
+        entries = list(
+            self.timeline.history[start : start + self.timeline.per_page + 1]
+        )
+        return _delta_changes(
+            self.timeline.instance, entries, with_create=not self.page_obj.has_next()
+        )
+
+
 def history_tracking(request, obj_id, **kwargs):
     model = kwargs.get("model")
     decorator_strings = kwargs.get("decorators", [])
@@ -111,12 +111,17 @@ def post_create_horilla_audit_log(sender, instance, *_args, **kwargs):
         )
         if isinstance(history_instance, HorillaAuditLog):
             history_instance.history_title = "Demo Title"
-            remove_duplicate_history(instance)
             if instance.skip_history:
                 instance.history_set.filter(pk=history_instance.pk).delete()
             kwargs["history_instance"] = None
     except:
         pass
+    try:
+        # only the new entry is compared, with the entry before it
+        if hasattr(instance, "history_set"):
+            remove_duplicate_history(instance)
+    except:
+        pass
 
 
 class HistoryTrackingFields(HorillaModel):
@@ -4,7 +4,9 @@ horilla_automations/methods/methods.py
 """
 
 import operator
+from functools import lru_cache
 
+from django import template
 from django.core.exceptions import FieldDoesNotExist
 from django.db import models as django_models
 from django.http import QueryDict
@@ -139,6 +141,34 @@ def evaluate_condition(value1, operator_str, value2):
     return op_func(value1, value2)
 
 
+def compile_conditions(condition_querystring):
+    """
+    Parse the condition query string of an automation once into a list of
+    (attribute, operator, value, logic) tuples
+    """
+    conditions = []
+    query_string = (condition_querystring or "").replace("automation_multiple_", "")
+    for condition in split_query_string(query_string):
+        if not condition.getlist("condition"):
+            continue
+        attr, operator_str, value = condition.getlist("condition")[:3]
+        if value == "on":
+            value = True
+        elif value == "off":
+            value = False
+        conditions.append((attr, operator_str, value, condition.get("logic")))
+    return conditions
+
+
+@lru_cache(maxsize=256)
+def compile_template(source):
+    """
+    Return the compiled template of the source. Templates are cached by their
+    text, so an edited template is compiled again.
+    """
+    return template.Template(source)
+
+
 def get_related_field_model(model: Employee, field_path):
     parts = field_path.split("__")
     for part in parts:
@@ -5,7 +5,6 @@ horilla_automation/signals.py
 
 import copy
 import logging
-import threading
 import time
 import types
 
@@ -16,6 +15,7 @@ from django.db.models.query import QuerySet
 from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 
+from base.mail_dispatch import queue_mail, submit_mail_task
 from horilla.horilla_middlewares import _thread_locals
 from horilla.signals import post_bulk_update, pre_bulk_update
 
@@ -42,7 +42,7 @@ def start_automation():
     Automation signals
     """
     from base.models import HorillaMailTemplate
-    from horilla_automations.methods.methods import get_model_class, split_query_string
+    from horilla_automations.methods.methods import compile_conditions, get_model_class
     from horilla_automations.models import MailAutomation
 
     @receiver(post_delete, sender=MailAutomation)
@@ -72,7 +72,7 @@ def start_automation():
             post_bulk_update.disconnect(handler, sender=handler.model_class)
         SIGNAL_HANDLERS.clear()
 
-    def create_post_bulk_update_handler(automation, model_class, query_strings):
+    def create_post_bulk_update_handler(automation, model_class, conditions):
         def post_bulk_update_handler(sender, queryset, *args, **kwargs):
             def _bulk_update_thread_handler(
                 queryset, previous_queryset_copy, automation
@@ -86,7 +86,7 @@ def start_automation():
                             request,
                             False,
                             automation,
-                            query_strings,
+                            conditions,
                             instance,
                             previous_instance,
                         )
@@ -97,11 +97,12 @@ def start_automation():
                 previous_queryset = previous_bulk_record.get("queryset", None)
                 previous_queryset_copy = previous_bulk_record.get("queryset_copy", [])
 
-            bulk_thread = threading.Thread(
-                target=_bulk_update_thread_handler,
-                args=(queryset, previous_queryset_copy, automation),
+            submit_mail_task(
+                _bulk_update_thread_handler,
+                queryset,
+                previous_queryset_copy,
+                automation,
             )
-            bulk_thread.start()
 
         func_name = f"{automation.method_title}_post_bulk_signal_handler"
 
@@ -126,25 +127,22 @@ def start_automation():
         """
         clear_connection()
         automations = MailAutomation.objects.filter(is_active=True)
-        for automation in automations:
-
-            condition_querystring = automation.condition_querystring.replace(
-                "automation_multiple_", ""
-            )
-
-            query_strings = split_query_string(condition_querystring)
+        for automation in automations.select_related("mail_template"):
+            # conditions are parsed once here, start_connection runs again
+            # whenever an automation or a mail template is saved
+            conditions = compile_conditions(automation.condition_querystring)
 
             model_path = automation.model
             model_class = get_model_class(model_path)
 
             handler = create_post_bulk_update_handler(
-                automation, model_class, query_strings
+                automation, model_class, conditions
             )
             SIGNAL_HANDLERS.append(handler)
 
             post_bulk_update.connect(handler, sender=model_class)
 
-            def create_signal_handler(name, automation, query_strings):
+            def create_signal_handler(name, automation, conditions):
                 def signal_handler(sender, instance, created, **kwargs):
                     """
                     Signal handler for post-save events of the model instances.
@@ -159,14 +157,11 @@ def start_automation():
                         request,
                         created,
                         automation,
-                        query_strings,
+                        conditions,
                         instance,
                         previous_instance,
                     )
-                    thread = threading.Thread(
-                        target=lambda: send_automated_mail(*args),
-                    )
-                    thread.start()
+                    submit_mail_task(send_automated_mail, *args)
 
                 signal_handler.__name__ = name
                 signal_handler.model_class = model_class
@@ -176,7 +171,7 @@ def start_automation():
             # Create and connect the signal handler
             handler_name = f"{automation.method_title}_signal_handler"
             dynamic_signal_handler = create_signal_handler(
-                handler_name, automation, query_strings
+                handler_name, automation, conditions
             )
             SIGNAL_HANDLERS.append(dynamic_signal_handler)
             post_save.connect(
@@ -227,39 +222,42 @@ def start_automation():
                 pre_bulk_update.disconnect(handler, sender=handler.model_class)
             INSTANCE_HANDLERS.clear()
 
-        clear_instance_signal_connection()
-        automations = MailAutomation.objects.filter(is_active=True)
-        for automation in automations:
-            model_class = get_model_class(automation.model)
-
-            handler = create_pre_bulk_update_handler(automation, model_class)
-            INSTANCE_HANDLERS.append(handler)
-            pre_bulk_update.connect(handler, sender=model_class)
-
-            @receiver(pre_save, sender=model_class)
+        def create_instance_handler(model_class):
             def instance_handler(sender, instance, **kwargs):
                 """
-                Signal handler for pres-save events of the model instances.
+                Signal handler for pre-save events of the model instances.
+                The previous row is fetched once and shared by every
+                automation of the model.
                 """
                 # prevented storing the scheduled activities
                 request = getattr(_thread_locals, "request", None)
-                if instance.pk:
-                    # to get the previous instance
-                    instance = model_class.objects.filter(id=instance.pk).first()
                 if request:
+                    if instance.pk:
+                        # to get the previous instance
+                        instance = model_class.objects.filter(id=instance.pk).first()
                     _thread_locals.previous_record = {
-                        "automation": automation,
                         "instance": instance,
                     }
-                instance_handler.__name__ = (
-                    f"{automation.method_title}_instance_handler"
-                )
-                return instance_handler
 
+            instance_handler.__name__ = f"{model_class.__name__}_instance_handler"
             instance_handler.model_class = model_class
-            instance_handler.automation = automation
+            return instance_handler
 
+        clear_instance_signal_connection()
+        automations = MailAutomation.objects.filter(is_active=True)
+        # one snapshot handler per model, whatever the number of automations
+        model_automations = {}
+        for automation in automations:
+            model_automations.setdefault(get_model_class(automation.model), automation)
+
+        for model_class, automation in model_automations.items():
+            handler = create_pre_bulk_update_handler(automation, model_class)
+            INSTANCE_HANDLERS.append(handler)
+            pre_bulk_update.connect(handler, sender=model_class)
+
+            instance_handler = create_instance_handler(model_class)
             INSTANCE_HANDLERS.append(instance_handler)
+            pre_save.connect(instance_handler, sender=model_class)
 
     track_previous_instance()
     start_connection()
@@ -269,10 +267,14 @@ def send_automated_mail(
     request,
     created,
     automation,
-    query_strings,
+    conditions,
     instance,
     previous_instance,
 ):
+    """
+    Evaluate the compiled conditions of the automation on the saved instance
+    and send the mail when they apply
+    """
     from horilla_automations.methods.methods import evaluate_condition, operator_map
     from horilla_views.templatetags.generic_template_filters import getattribute
 
@@ -281,54 +283,42 @@ def send_automated_mail(
     false_exists = False
     instance_values = []
     previous_instance_values = []
-    for condition in query_strings:
-        if condition.getlist("condition"):
-            attr = condition.getlist("condition")[0]
-            operator = condition.getlist("condition")[1]
-            value = condition.getlist("condition")[2]
-
-            if value == "on":
-                value = True
-            elif value == "off":
-                value = False
-            instance_value = getattribute(instance, attr)
-            previous_instance_value = getattribute(previous_instance, attr)
-            # The send mail method only trigger when actually any changes
-            # b/w the previous, current instance's `attr` field's values and
-            # if applicable for the automation
-            if getattr(instance_value, "pk", None) and isinstance(
-                instance_value, models.Model
-            ):
-                instance_value = str(getattr(instance_value, "pk", None))
-                previous_instance_value = str(
-                    getattr(previous_instance_value, "pk", None)
-                )
-            elif isinstance(instance_value, QuerySet):
-                instance_value = list(instance_value.values_list("pk", flat=True))
-                previous_instance_value = list(
-                    previous_instance_value.values_list("pk", flat=True)
-                )
+    for attr, operator, value, logic in conditions:
+        instance_value = getattribute(instance, attr)
+        previous_instance_value = getattribute(previous_instance, attr)
+        # The send mail method only trigger when actually any changes
+        # b/w the previous, current instance's `attr` field's values and
+        # if applicable for the automation
+        if getattr(instance_value, "pk", None) and isinstance(
+            instance_value, models.Model
+        ):
+            instance_value = str(getattr(instance_value, "pk", None))
+            previous_instance_value = str(getattr(previous_instance_value, "pk", None))
+        elif isinstance(instance_value, QuerySet):
+            instance_value = list(instance_value.values_list("pk", flat=True))
+            previous_instance_value = list(
+                previous_instance_value.values_list("pk", flat=True)
+            )
 
-            instance_values.append(instance_value)
+        instance_values.append(instance_value)
 
-            previous_instance_values.append(previous_instance_value)
+        previous_instance_values.append(previous_instance_value)
 
-            if not condition.get("logic"):
+        if not logic:
 
-                applicable = evaluate_condition(instance_value, operator, value)
-            logic = condition.get("logic")
-            if logic:
-                applicable = operator_map[logic](
-                    applicable,
-                    evaluate_condition(instance_value, operator, value),
-                )
-            if not applicable:
-                false_exists = True
-            if logic == "and":
-                and_exists = True
-            if false_exists and and_exists:
-                applicable = False
-                break
+            applicable = evaluate_condition(instance_value, operator, value)
+        if logic:
+            applicable = operator_map[logic](
+                applicable,
+                evaluate_condition(instance_value, operator, value),
+            )
+        if not applicable:
+            false_exists = True
+        if logic == "and":
+            and_exists = True
+        if false_exists and and_exists:
+            applicable = False
+            break
     if applicable:
         if created and automation.trigger == "on_create":
             send_mail(request, automation, instance)
@@ -346,6 +336,7 @@ def send_mail(request, automation, instance):
     from base.backends import ConfiguredEmailBackend
     from base.methods import eval_validate, generate_pdf
     from horilla_automations.methods.methods import (
+        compile_template,
         get_model_class,
         get_related_field_model,
     )
@@ -407,7 +398,7 @@ def send_mail(request, automation, instance):
             sender = None
         if context_instance:
             for template_attachment in automation.template_attachments.all():
-                template_bdy = template.Template(template_attachment.body)
+                template_bdy = compile_template(template_attachment.body)
                 context = template.Context(
                     {"instance": context_instance, "self": sender}
                 )
@@ -422,15 +413,15 @@ def send_mail(request, automation, instance):
                     )
                 )
 
-            template_bdy = template.Template(mail_template.body)
+            template_bdy = compile_template(mail_template.body)
         else:
-            template_bdy = template.Template(pk_or_text)
+            template_bdy = compile_template(pk_or_text)
         context = template.Context(
             {"instance": context_instance, "self": sender, "model_instance": instance}
         )
         render_bdy = template_bdy.render(context)
 
-        title_template = template.Template(automation.title)
+        title_template = compile_template(automation.title)
         title_context = template.Context({"instance": instance, "self": sender})
         render_title = title_template.render(title_context)
         email = EmailMessage(
@@ -445,13 +436,4 @@ def send_mail(request, automation, instance):
 
         email.attachments = attachments
 
-        def _send_mail(email):
-            try:
-                email.send()
-            except Exception as e:
-                logger.error(e)
-
-        thread = threading.Thread(
-            target=lambda: _send_mail(email),
-        )
-        thread.start()
+        queue_mail(email)
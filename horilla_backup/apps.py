@@ -9,6 +9,7 @@ class BackupConfig(AppConfig):
         from django.urls import include, path
 
         from horilla.urls import urlpatterns
+        from horilla_backup import scheduler
 
         urlpatterns.append(
             path("backup/", include("horilla_backup.urls")),
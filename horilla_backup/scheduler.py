@@ -1,9 +1,9 @@
 import os
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from django.core.management import call_command
 
 from horilla import settings
+from horilla.horilla_scheduler import register_job, register_job_loader, unregister_job
 
 from .gdrive import *
 
@@ -12,8 +12,6 @@ from .models import *
 from .pgdump import *
 from .zip import *
 
-scheduler = BackgroundScheduler()
-
 # def backup_database():
 #     folder_path = DBBACKUP_STORAGE_OPTIONS['location']
 #     local_backup = LocalBackup.objects.first()
@@ -112,32 +110,23 @@ def start_gdrive_backup_job():
     if GoogleDriveBackup.objects.exists():
         gdrive_backup = GoogleDriveBackup.objects.first()
 
-        # Remove existing job if it exists
-        try:
-            scheduler.remove_job("backup_job")
-        except:
-            pass
-        # Add new job based on Gdrive Backup configuration
+        # Add or replace the job based on Gdrive Backup configuration
         if gdrive_backup.interval:
-            scheduler.add_job(
+            register_job(
                 google_drive_backup,
                 "interval",
+                job_id="gdrive_backup_job",
                 seconds=gdrive_backup.seconds,
-                id="gdrive_backup_job",
             )
         else:
-            scheduler.add_job(
+            register_job(
                 google_drive_backup,
-                trigger="cron",
+                "cron",
+                job_id="gdrive_backup_job",
                 hour=gdrive_backup.hour,
                 minute=gdrive_backup.minute,
-                id="gdrive_backup_job",
             )
 
-        # Start the scheduler if it's not already running
-        if not scheduler.running:
-            scheduler.start()
-
     else:
         stop_gdrive_backup_job()
 
@@ -146,10 +135,20 @@ def stop_gdrive_backup_job():
     """
     Stop the backup job if it exists.
     """
-    try:
-        scheduler.remove_job("gdrive_backup_job")
-    except:
-        pass
+    unregister_job("gdrive_backup_job")
+
+
+@register_job_loader
+def sync_gdrive_backup_job():
+    """
+    Keep the backup job in sync with the Gdrive Backup configuration, so it runs
+    in the scheduler leader whichever process changed the configuration.
+    """
+    gdrive_backup = GoogleDriveBackup.objects.first()
+    if gdrive_backup and gdrive_backup.active:
+        start_gdrive_backup_job()
+    else:
+        stop_gdrive_backup_job()
 
 
 # def restart_gdrive_backup_job():
@@ -5,7 +5,7 @@ from django.apps import apps
 from django.shortcuts import redirect
 from django.urls import Resolver404, path, resolve, reverse
 
-from base.context_processors import white_labelling_company
+from base.context_processors import white_label_company_name
 from employee.models import Employee
 from horilla.urls import urlpatterns
 
@@ -168,7 +168,7 @@ user_breadcrumbs = {}
 
 def breadcrumbs(request):
     base_url = request.build_absolute_uri("/")
-    company = white_labelling_company(request)["white_label_company_name"]
+    company = white_label_company_name(request)
 
     # Initialize breadcrumbs in the session if not already present
     if "breadcrumbs" not in request.session:
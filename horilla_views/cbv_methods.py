@@ -2,8 +2,11 @@
 horilla/cbv_methods.py
 """
 
+import threading
+import time
 import types
 import uuid
+from collections import OrderedDict
 from typing import Any
 from urllib.parse import urlencode
 from venv import logger
@@ -510,3 +513,166 @@ def merge_dicts(dict1, dict2):
             merged_dict[key] = value
 
     return merged_dict
+
+
+class ListViewRegistry:
+    """
+    The list views rendered in each session, looked up by the export and bulk
+    update endpoints. Only the most recently rendered views are kept, and they
+    expire after the timeout.
+    """
+
+    def __init__(self, max_size=2048, timeout=60 * 60):
+        self.max_size = max_size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def register(self, view_id, session_key, view_class, attrs):
+        """
+        Register the class of a rendered list view and the attributes its
+        export and bulk update handlers read
+        """
+        key = (view_id, session_key)
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (time.monotonic() + self.timeout, view_class, attrs)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get_view(self, view_id, session_key, request):
+        """
+        Returns an instance of the registered list view for the request, or
+        None when it expired
+        """
+        key = (view_id, session_key)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, view_class, attrs = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+        # the handlers only read the registered attributes, so the queries
+        # made by the view __init__ are skipped
+        view = view_class.__new__(view_class)
+        view.__dict__.update(attrs)
+        view.request = request
+        return view
+
+
+LIST_VIEW_REGISTRY = ListViewRegistry(
+    **getattr(settings, "HORILLA_LIST_VIEW_REGISTRY", {})
+)
+
+
+# ids of a list kept in the session for the views showing a few of them
+ORDERED_IDS_LIMIT = 200
+
+
+def _list_navigation_key(request, model):
+    return f"{request.session.session_key}list-navigation-{model.__name__.lower()}"
+
+
+def store_list_navigation(request, model, queryset):
+    """
+    Keep what the detail views need to find the previous and next records of
+    a list. A queryset is kept as its query, without loading its rows, and a
+    list sorted in python as its ids, both in the cache. The session only
+    gets the first ORDERED_IDS_LIMIT ids.
+    """
+    key = _list_navigation_key(request, model)
+    if isinstance(queryset, models.QuerySet):
+        try:
+            CACHE.set(key, {"query": queryset.query})
+        except Exception as e:
+            # queries the cache cannot pickle are kept as their ids
+            logger.error(f"List navigation query not cached: {e}")
+            CACHE.set(key, {"ids": list(queryset.values_list("pk", flat=True))})
+        ordered_ids = list(queryset.values_list("pk", flat=True)[:ORDERED_IDS_LIMIT])
+    else:
+        ids = [instance.pk for instance in queryset]
+        CACHE.set(key, {"ids": ids})
+        ordered_ids = ids[:ORDERED_IDS_LIMIT]
+    request.session[f"ordered_ids_{model.__name__.lower()}"] = ordered_ids
+
+
+def _keyset_ordering(queryset):
+    """
+    The (field, descending) ordering of the queryset ending with the primary
+    key, or None when it is not made of plain fields
+    """
+    ordering = []
+    for field in queryset.query.order_by or queryset.model._meta.ordering:
+        if not isinstance(field, str) or field == "?":
+            return None
+        name = field.lstrip("-")
+        ordering.append(("pk" if name in ("pk", "id") else name, field[0] == "-"))
+    if "pk" not in [name for name, _descending in ordering]:
+        ordering.append(("pk", False))
+    return ordering
+
+
+def _keyset_filter(ordering, values, backwards):
+    """
+    Records after the given ordering values, or before them with backwards
+    """
+    condition = models.Q()
+    for index, (name, descending) in enumerate(ordering):
+        lookup = "lt" if descending != backwards else "gt"
+        equal = {
+            previous_name: values[previous_name]
+            for previous_name, _descending in ordering[:index]
+        }
+        condition |= models.Q(**equal, **{f"{name}__{lookup}": values[name]})
+    return condition
+
+
+def keyset_neighbours(queryset, pk):
+    """
+    The previous and next primary keys of pk in the queryset, wrapping around
+    at its ends, with indexed queries instead of loading the whole queryset
+    """
+    from base.methods import closest_numbers
+
+    ordering = _keyset_ordering(queryset)
+    values = None
+    if ordering:
+        queryset = queryset.order_by(
+            *[f"-{name}" if descending else name for name, descending in ordering]
+        )
+        values = (
+            queryset.filter(pk=pk).values(*[name for name, _desc in ordering]).first()
+        )
+    if values is None or None in values.values():
+        # expressions and null values are not compared, fall back to the ids
+        return closest_numbers(list(queryset.values_list("pk", flat=True)), pk)
+
+    ids = queryset.values_list("pk", flat=True)
+    next_id = ids.filter(_keyset_filter(ordering, values, False)).first()
+    previous_id = ids.filter(_keyset_filter(ordering, values, True)).last()
+    if next_id is None:
+        next_id = ids.first()
+    if previous_id is None:
+        previous_id = ids.last()
+    return previous_id, next_id
+
+
+def list_neighbours(request, model, pk):
+    """
+    The previous and next primary keys of pk in the list the session last
+    showed for the model, and whether there is such a list
+    """
+    from base.methods import closest_numbers
+
+    navigation = CACHE.get(_list_navigation_key(request, model))
+    if navigation is None:
+        instance_ids = request.session.get(f"ordered_ids_{model.__name__.lower()}", [])
+        return (*closest_numbers(instance_ids, pk), bool(instance_ids))
+    if "ids" in navigation:
+        return (*closest_numbers(navigation["ids"], pk), bool(navigation["ids"]))
+    queryset = model._default_manager.all()
+    queryset.query = navigation["query"]
+    return (*keyset_neighbours(queryset, pk), True)
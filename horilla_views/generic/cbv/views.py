@@ -19,16 +19,19 @@ from django.utils.decorators import method_decorator
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import DetailView, FormView, ListView, TemplateView
 
-from base.methods import closest_numbers, eval_validate, get_key_instances
+from base.methods import eval_validate, get_key_instances
 from horilla.filters import FilterSet
 from horilla.group_by import group_by_queryset
 from horilla.horilla_middlewares import _thread_locals
 from horilla_views import models
 from horilla_views.cbv_methods import (  # update_initial_cache,
+    LIST_VIEW_REGISTRY,
     get_short_uuid,
     hx_request_required,
+    list_neighbours,
     paginator_qry,
     sortby,
+    store_list_navigation,
     structured,
     update_saved_filter_cache,
 )
@@ -107,6 +110,17 @@ class HorillaListView(ListView):
 
     header_attrs: dict = {}
 
+    # the attributes the export and bulk update handlers read
+    registered_attrs: list = [
+        "view_id",
+        "model",
+        "export_file_name",
+        "bulk_update_fields",
+        "bulk_template",
+        "selected_instances_key_id",
+        "post_bulk_path",
+    ]
+
     def post(self, *args, **kwargs):
         """
         POST method to handle post submissions
@@ -282,9 +296,7 @@ class HorillaListView(ListView):
                 ) == "true" and self.request.session.get("hlv_selected_ids"):
                     del self.request.session["hlv_selected_ids"]
                 if self.request.session.get("hlv_selected_ids"):
-                    self.request.actual_ids = list(
-                        self.queryset.values_list("id", flat=True)
-                    )
+                    self.request.actual_ids_count = self.queryset.count()
                     self.queryset = self.queryset.filter(
                         id__in=self.request.session["hlv_selected_ids"]
                     )
@@ -385,12 +397,8 @@ class HorillaListView(ListView):
                 query_dict, queryset, self.sortby_key, is_first_sort=is_first_sort
             )
 
-        ordered_ids = []
         if not self._saved_filters.get("field"):
-            for instance in queryset:
-                ordered_ids.append(instance.pk)
-
-        self.request.session[f"ordered_ids_{self.model.__name__.lower()}"] = ordered_ids
+            store_list_navigation(self.request, self.model, queryset)
         context["queryset"] = paginator_qry(
             queryset, self._saved_filters.get("page"), self.records_per_page
         )
@@ -415,38 +423,37 @@ class HorillaListView(ListView):
             #         ordered_ids.append(instance.pk)
 
         # CACHE.get(self.request.session.session_key + "cbv")[HorillaListView] = context
-        from horilla.urls import path, urlpatterns
-
-        self.export_path = f"export-list-view-{get_short_uuid(4)}/"
-
-        urlpatterns.append(path(self.export_path, self.export_data))
+        self.export_path = reverse("list-view-export", args=[self.view_id]).lstrip("/")
         context["export_path"] = self.export_path
 
         if self.bulk_update_fields and self.bulk_update_accessibility():
-            get_bulk_path = (
-                f"get-bulk-update-{self.view_id}-{self.request.session.session_key}/"
-            )
-            post_bulk_path = (
-                f"post-bulk-update-{self.view_id}-{self.request.session.session_key}/"
-            )
-            self.post_bulk_path = post_bulk_path
-            urlpatterns.append(
-                path(
-                    get_bulk_path,
-                    self.serve_bulk_form,
-                )
-            )
-            urlpatterns.append(
-                path(
-                    post_bulk_path,
-                    self.handle_bulk_submission,
-                )
-            )
+            self.post_bulk_path = reverse(
+                "list-view-bulk-update", args=[self.view_id]
+            ).lstrip("/")
             context["bulk_update_fields"] = self.bulk_update_fields
-            context["bulk_path"] = get_bulk_path
+            context["bulk_path"] = reverse(
+                "list-view-bulk-form", args=[self.view_id]
+            ).lstrip("/")
+        self.register_view()
 
         return context
 
+    def register_view(self):
+        """
+        Register the view for the export and bulk update endpoints of the
+        session
+        """
+        LIST_VIEW_REGISTRY.register(
+            self.view_id,
+            self.request.session.session_key,
+            type(self),
+            {
+                attr: getattr(self, attr)
+                for attr in self.registered_attrs
+                if hasattr(self, attr)
+            },
+        )
+
     def select_all(self, *args, **kwargs):
         """
         Select all method
@@ -618,11 +625,11 @@ class HorillaDetailedView(DetailView):
 
         url_name = url.url_name
 
-        previous_id, next_id = closest_numbers(instance_ids, pk)
+        previous_id, next_id, in_list = list_neighbours(self.request, self.model, pk)
 
         next_url = reverse(url_name, kwargs={key: next_id})
         previous_url = reverse(url_name, kwargs={key: previous_id})
-        if instance_ids:
+        if in_list:
             context["instance_ids"] = str(instance_ids)
             context["ids_key"] = self.ids_key
 
@@ -794,12 +801,8 @@ class HorillaCardView(ListView):
 
             context["filter_dict"] = data_dict
 
-        ordered_ids = list(queryset.values_list("id", flat=True))
-        ordered_ids = []
         if not self._saved_filters.get("field"):
-            for instance in queryset:
-                ordered_ids.append(instance.pk)
-        self.request.session[f"ordered_ids_{self.model.__name__.lower()}"] = ordered_ids
+            store_list_navigation(self.request, self.model, queryset)
 
         # CACHE.get(self.request.session.session_key + "cbv")[HorillaCardView] = context
         referrer = self.request.GET.get("referrer", "")
@@ -969,8 +972,10 @@ class HorillaFormView(FormView):
             url = resolve(self.request.path)
             key = list(url.kwargs.keys())[0]
             url_name = url.url_name
-            if instance_ids:
-                previous_id, next_id = closest_numbers(instance_ids, pk)
+            previous_id, next_id, in_list = list_neighbours(
+                self.request, self.model, pk
+            )
+            if in_list:
 
                 next_url = reverse(url_name, kwargs={key: next_id})
                 previous_url = reverse(url_name, kwargs={key: previous_id})
@@ -1303,7 +1308,9 @@ class HorillaProfileView(DetailView):
         else:
             display_count = None
 
-        previous_id, next_id = closest_numbers(instance_ids, context["instance"].pk)
+        previous_id, next_id, _in_list = list_neighbours(
+            self.request, self.model, context["instance"].pk
+        )
         url = resolve(self.request.path)
         key = list(url.kwargs.keys())[0]
 
@@ -39,6 +39,24 @@ urlpatterns = [
         views.LastAppliedFilter.as_view(),
         name="last-applied-filter",
     ),
+    path(
+        "list-view-export/<str:view_id>/",
+        views.ListViewAction.as_view(),
+        {"action": "export"},
+        name="list-view-export",
+    ),
+    path(
+        "list-view-bulk-form/<str:view_id>/",
+        views.ListViewAction.as_view(),
+        {"action": "bulk-form"},
+        name="list-view-bulk-form",
+    ),
+    path(
+        "list-view-bulk-update/<str:view_id>/",
+        views.ListViewAction.as_view(),
+        {"action": "bulk-update"},
+        name="list-view-bulk-update",
+    ),
     path(
         "generic-delete",
         views.HorillaDeleteConfirmationView.as_view(),
@@ -10,13 +10,19 @@ from django.db import router
 from django.http import HttpResponse, JsonResponse
 from django.shortcuts import render
 from django.utils.decorators import method_decorator
+from django.utils.translation import gettext_lazy as _
 from django.views import View
 from django.views.decorators.csrf import csrf_protect
 
 from base.methods import eval_validate
 from horilla.signals import post_generic_delete, pre_generic_delete
 from horilla_views import models
-from horilla_views.cbv_methods import get_short_uuid, login_required, merge_dicts
+from horilla_views.cbv_methods import (
+    LIST_VIEW_REGISTRY,
+    get_short_uuid,
+    login_required,
+    merge_dicts,
+)
 from horilla_views.forms import SavedFilterForm
 from horilla_views.generic.cbv.views import HorillaFormView, HorillaListView
 
@@ -281,6 +287,30 @@ class LastAppliedFilter(View):
         return HttpResponse("success")
 
 
+@method_decorator(login_required, name="dispatch")
+class ListViewAction(View):
+    """
+    Export and bulk update endpoints of the list views rendered in the
+    session
+    """
+
+    handlers = {
+        "export": "export_data",
+        "bulk-form": "serve_bulk_form",
+        "bulk-update": "handle_bulk_submission",
+    }
+
+    def post(self, request, view_id, action):
+        view = LIST_VIEW_REGISTRY.get_view(
+            view_id, request.session.session_key, request
+        )
+        if view is None:
+            return HttpResponse(
+                _("The list has expired, please reload the page"), status=404
+            )
+        return getattr(view, self.handlers[action])(request)
+
+
 class DynamiListView(HorillaListView):
     """
     DynamicListView for Generic Delete
@@ -0,0 +1,231 @@
+"""
+clash_index.py
+
+Interval-overlap index used to keep LeaveRequest.leave_clashes_count up to date.
+
+Leave requests clash when their date ranges overlap and the employees share a
+company and either a department or a job position. Instead of recounting every
+leave request in the database on each save, only the requests that overlap the
+changed request's old and new ranges are recounted, using a single windowed
+query per company.
+"""
+
+from collections import defaultdict
+
+from django.apps import apps
+from django.db.models import Q
+
+INACTIVE_STATUSES = ["cancelled", "rejected"]
+WORK_INFO = "employee_id__employee_work_info__"
+INDEX_FIELDS = [
+    "id",
+    "start_date",
+    "end_date",
+    f"{WORK_INFO}id",
+    f"{WORK_INFO}company_id",
+    f"{WORK_INFO}department_id",
+    f"{WORK_INFO}job_position_id",
+]
+
+
+def _leave_request_model():
+    return apps.get_model("leave", "LeaveRequest")
+
+
+def _end(start_date, end_date):
+    return end_date if end_date is not None else start_date
+
+
+def clash_key(employee):
+    """
+    Returns the (company, department, job position) key of the employee, or None
+    when the employee has no work information.
+    """
+    work_info = getattr(employee, "employee_work_info", None)
+    if work_info is None:
+        return None
+    return (
+        work_info.company_id_id,
+        work_info.department_id_id,
+        work_info.job_position_id_id,
+    )
+
+
+def _group_filter(key):
+    company_id, department_id, job_position_id = key
+    return Q(**{f"{WORK_INFO}company_id": company_id}) & (
+        Q(**{f"{WORK_INFO}department_id": department_id})
+        | Q(**{f"{WORK_INFO}job_position_id": job_position_id})
+    )
+
+
+def _active_requests():
+    return _leave_request_model().objects.entire().exclude(status__in=INACTIVE_STATUSES)
+
+
+def _row_key(row):
+    return (
+        row[f"{WORK_INFO}company_id"],
+        row[f"{WORK_INFO}department_id"],
+        row[f"{WORK_INFO}job_position_id"],
+    )
+
+
+def _overlaps(row, other):
+    return (
+        other["id"] != row["id"]
+        and other["start_date"] <= _end(row["start_date"], row["end_date"])
+        and _end(other["start_date"], other["end_date"]) >= row["start_date"]
+    )
+
+
+def _count_for_rows(rows):
+    """
+    Counts clashes for the given rows. Rows are grouped by company and, per
+    company, every active request overlapping the rows' combined date window is
+    fetched once and bucketed by department and job position.
+    """
+    counts = {}
+    by_company = defaultdict(list)
+    for row in rows:
+        if row[f"{WORK_INFO}id"] is None:
+            counts[row["id"]] = 0
+            continue
+        by_company[row[f"{WORK_INFO}company_id"]].append(row)
+
+    for company_id, company_rows in by_company.items():
+        window_start = min(row["start_date"] for row in company_rows)
+        window_end = max(
+            _end(row["start_date"], row["end_date"]) for row in company_rows
+        )
+        by_department = defaultdict(list)
+        by_job_position = defaultdict(list)
+        for other in (
+            _active_requests()
+            .filter(
+                **{f"{WORK_INFO}company_id": company_id},
+                start_date__lte=window_end,
+                end_date__gte=window_start,
+            )
+            .values(*INDEX_FIELDS)
+        ):
+            by_department[other[f"{WORK_INFO}department_id"]].append(other)
+            by_job_position[other[f"{WORK_INFO}job_position_id"]].append(other)
+
+        for row in company_rows:
+            _company_id, department_id, job_position_id = _row_key(row)
+            count = sum(
+                1 for other in by_department[department_id] if _overlaps(row, other)
+            )
+            # requests sharing both keys are already counted by department
+            count += sum(
+                1
+                for other in by_job_position[job_position_id]
+                if other[f"{WORK_INFO}department_id"] != department_id
+                and _overlaps(row, other)
+            )
+            counts[row["id"]] = count
+    return counts
+
+
+def refresh_clash_counts(queryset):
+    """
+    Recomputes leave_clashes_count for the active requests in the queryset and
+    writes back only the rows whose count changed.
+    Returns the number of updated rows.
+    """
+    LeaveRequest = _leave_request_model()
+    rows = list(
+        queryset.exclude(status__in=INACTIVE_STATUSES).values(
+            *INDEX_FIELDS, "leave_clashes_count"
+        )
+    )
+    counts = _count_for_rows(rows)
+    changed = [
+        LeaveRequest(id=row["id"], leave_clashes_count=counts[row["id"]])
+        for row in rows
+        if counts[row["id"]] != row["leave_clashes_count"]
+    ]
+    LeaveRequest.objects.entire().bulk_update(
+        changed, ["leave_clashes_count"], batch_size=500
+    )
+    return len(changed)
+
+
+def affected_requests(ranges, exclude_id=None):
+    """
+    Returns the active leave requests overlapping any of the given
+    (key, start_date, end_date) ranges within the same clash group.
+    """
+    query = Q()
+    for key, start_date, end_date in ranges:
+        if key is None or start_date is None:
+            continue
+        query |= _group_filter(key) & Q(
+            start_date__lte=_end(start_date, end_date), end_date__gte=start_date
+        )
+    if not query:
+        return _leave_request_model().objects.none()
+    queryset = _active_requests().filter(query)
+    if exclude_id is not None:
+        queryset = queryset.exclude(id=exclude_id)
+    return queryset
+
+
+def snapshot(leave_request):
+    """
+    Returns the stored (key, start_date, end_date) range of a leave request
+    before it is changed, or None for unsaved requests.
+    """
+    if leave_request.pk is None:
+        return None
+    previous = (
+        _leave_request_model()
+        .objects.entire()
+        .filter(pk=leave_request.pk)
+        .select_related("employee_id__employee_work_info")
+        .first()
+    )
+    if previous is None:
+        return None
+    return (clash_key(previous.employee_id), previous.start_date, previous.end_date)
+
+
+def update_clash_index(leave_request, previous=None):
+    """
+    Updates the clash counts of the requests affected by a change to
+    leave_request. `previous` is the snapshot taken before the change.
+    """
+    ranges = [
+        (
+            clash_key(leave_request.employee_id),
+            leave_request.start_date,
+            leave_request.end_date,
+        )
+    ]
+    if previous is not None:
+        ranges.append(previous)
+    return refresh_clash_counts(affected_requests(ranges, exclude_id=leave_request.pk))
+
+
+def rebuild_clash_index(batch_size=2000):
+    """
+    Recomputes leave_clashes_count for every leave request.
+    Returns the number of updated rows.
+    """
+    LeaveRequest = _leave_request_model()
+    updated = (
+        LeaveRequest.objects.entire()
+        .filter(status__in=INACTIVE_STATUSES)
+        .exclude(leave_clashes_count=0)
+        .update(leave_clashes_count=0)
+    )
+
+    ids = list(
+        _active_requests().order_by("start_date", "id").values_list("id", flat=True)
+    )
+    for index in range(0, len(ids), batch_size):
+        updated += refresh_clash_counts(
+            LeaveRequest.objects.entire().filter(id__in=ids[index : index + batch_size])
+        )
+    return updated
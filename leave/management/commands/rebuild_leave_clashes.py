@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from leave.clash_index import rebuild_clash_index
+
+
+class Command(BaseCommand):
+    help = "Recompute the leave clashes count of every leave request"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Number of leave requests recounted per batch",
+        )
+
+    def handle(self, *args, **kwargs):
+        updated = rebuild_clash_index(batch_size=kwargs["batch_size"])
+        self.stdout.write(
+            self.style.SUCCESS(f"Leave clashes rebuilt, {updated} requests updated.")
+        )
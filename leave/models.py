@@ -15,9 +15,9 @@ from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from base.horilla_company_manager import HorillaCompanyManager
+from base.methods import get_company_leave_dates
 from base.models import (
     Company,
-    CompanyLeaves,
     Department,
     Holidays,
     JobPosition,
@@ -27,8 +27,9 @@ from base.models import (
 from employee.models import Employee, EmployeeWorkInformation
 from horilla import horilla_middlewares
 from horilla.models import HorillaModel
-from horilla_audit.methods import get_diff
+from horilla_audit.methods import HistoryTimeline
 from horilla_audit.models import HorillaAuditInfo, HorillaAuditLog
+from leave.clash_index import snapshot, update_clash_index
 from leave.methods import calculate_requested_days
 
 logger = logging.getLogger(__name__)
@@ -592,9 +593,12 @@ class LeaveRequest(HorillaModel):
 
     class Meta:
         ordering = ["-id"]
+        indexes = [
+            models.Index(fields=["start_date", "end_date"]),
+        ]
 
     def tracking(self):
-        return get_diff(self)
+        return HistoryTimeline(self).requested_page()
 
     def __str__(self):
         return f"{self.employee_id} | {self.leave_type_id} | {self.status}"
@@ -662,49 +666,8 @@ class LeaveRequest(HorillaModel):
     def company_leave_dates(self):
         """
         :return: This function returns a list of all company leave dates"""
-        from datetime import date
-
-        company_leaves = CompanyLeaves.objects.all()
-        company_leave_dates = []
-        for company_leave in company_leaves:
-            if self:
-                year = self.start_date.year
-            else:
-                year = date.today().year
-            based_on_week = company_leave.based_on_week
-            based_on_week_day = company_leave.based_on_week_day
-            for month in range(1, 13):
-                if based_on_week != None:
-                    # Set Sunday as the first day of the week
-                    calendar.setfirstweekday(6)
-                    month_calendar = calendar.monthcalendar(year, month)
-                    try:
-                        weeks = month_calendar[int(based_on_week)]
-                        weekdays_in_weeks = [day for day in weeks if day != 0]
-                        for day in weekdays_in_weeks:
-                            date = datetime.strptime(
-                                f"{year}-{month:02}-{day:02}", "%Y-%m-%d"
-                            ).date()
-                            if (
-                                date.weekday() == int(based_on_week_day)
-                                and date not in company_leave_dates
-                            ):
-                                company_leave_dates.append(date)
-                    except IndexError:
-                        pass
-                else:
-                    # Set Monday as the first day of the week
-                    calendar.setfirstweekday(0)
-                    month_calendar = calendar.monthcalendar(year, month)
-                    for week in month_calendar:
-                        if week[int(based_on_week_day)] != 0:
-                            date = datetime.strptime(
-                                f"{year}-{month:02}-{week[int(based_on_week_day)]:02}",
-                                "%Y-%m-%d",
-                            ).date()
-                            if date not in company_leave_dates:
-                                company_leave_dates.append(date)
-        return company_leave_dates
+        year = self.start_date.year if self else date.today().year
+        return get_company_leave_dates(year)
 
     def save(self, *args, **kwargs):
 
@@ -727,9 +690,10 @@ class LeaveRequest(HorillaModel):
         else:
             self.leave_clashes_count = self.count_leave_clashes()
 
+        previous = snapshot(self)
         super().save(*args, **kwargs)
 
-        self.update_leave_clashes_count()
+        self.update_leave_clashes_count(previous)
         work_info = EmployeeWorkInformation.objects.filter(employee_id=self.employee_id)
         department_id = None
         conditions = None
@@ -925,7 +889,7 @@ class LeaveRequest(HorillaModel):
         if self.status == "requested":
             super().delete(*args, **kwargs)
 
-            # Update the leave clashes count for all relevant leave requests
+            # Update the leave clashes count for the overlapping leave requests
             self.update_leave_clashes_count()
         else:
             request = getattr(horilla_middlewares._thread_locals, "request", None)
@@ -936,21 +900,13 @@ class LeaveRequest(HorillaModel):
                     _("The {} leave request cannot be deleted !").format(self.status),
                 )
 
-    def update_leave_clashes_count(self):
+    def update_leave_clashes_count(self, previous=None):
         """
-        Update the leave clashes count for all leave requests.
+        Update the leave clashes count for the leave requests overlapping this
+        request's current range and, when given, its previous range.
+        Use the `rebuild_leave_clashes` command to recompute every request.
         """
-        leave_requests_to_update = LeaveRequest.objects.exclude(
-            Q(id=self.id) | Q(status="cancelled") | Q(status="rejected")
-        )
-
-        for leave_request in leave_requests_to_update:
-            leave_request.leave_clashes_count = leave_request.count_leave_clashes()
-
-        # Bulk update leave clashes count for all leave requests
-        LeaveRequest.objects.bulk_update(
-            leave_requests_to_update, ["leave_clashes_count"]
-        )
+        return update_clash_index(self, previous)
 
     def count_leave_clashes(self):
         """
@@ -1042,7 +998,7 @@ class LeaveAllocationRequest(HorillaModel):
         self.skip_history = False
 
     def tracking(self):
-        return get_diff(self)
+        return HistoryTimeline(self).requested_page()
 
     def allocate_tracking(self):
         """
@@ -1050,7 +1006,7 @@ class LeaveAllocationRequest(HorillaModel):
         """
 
         try:
-            histories = get_diff(self)[:2]
+            histories = HistoryTimeline(self, per_page=2).page(1)
             for history in histories:
                 if history["type"] == "Changes":
                     for update in history["changes"]:
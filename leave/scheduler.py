@@ -1,11 +1,11 @@
 import calendar
 import datetime as dt
-import sys
 from datetime import datetime, timedelta
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from dateutil.relativedelta import relativedelta
 
+from horilla.horilla_scheduler import register_job
+
 today = datetime.now()
 
 
@@ -47,14 +47,4 @@ def leave_reset():
             leave_type.save()
 
 
-if not any(
-    cmd in sys.argv
-    for cmd in ["makemigrations", "migrate", "compilemessages", "flush", "shell"]
-):
-    """
-    Initializes and starts background tasks using APScheduler when the server is running.
-    """
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(leave_reset, "interval", seconds=20)
-
-    scheduler.start()
+register_job(leave_reset, "interval", seconds=20)
@@ -1,21 +1,20 @@
 import logging
 from threading import Thread
 
-from django.contrib import messages
 from django.core.mail import EmailMessage
 from django.db.models import Q
 from django.template.loader import render_to_string
 from django.utils.translation import gettext as _
 
 from base.backends import ConfiguredEmailBackend
+from base.mail_dispatch import MailTask, queue_mail
 
 logger = logging.getLogger(__name__)
 
 
-class LeaveMailSendThread(Thread):
+class LeaveMailSendThread(MailTask):
 
     def __init__(self, request, leave_request, type):
-        Thread.__init__(self)
         self.request = request
         self.leave_request = leave_request
         self.type = type
@@ -58,15 +57,9 @@ class LeaveMailSendThread(Thread):
                     reply_to=[display_email_name],
                 )
                 email.content_subtype = "html"
-                try:
-                    email.send()
-                except:
-                    messages.error(
-                        self.request, f"Mail not sent to {recipient.get_full_name()}"
-                    )
+                queue_mail(email)
 
     def run(self) -> None:
-        super().run()
         if self.type == "request":
             owner = self.leave_request.employee_id
             reporting_manager = self.leave_request.employee_id.get_reporting_manager()
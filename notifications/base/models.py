@@ -1,15 +1,19 @@
 # -*- coding: utf-8 -*-
 # pylint: disable=too-many-lines
+import contextvars
+import logging
 from distutils.version import (  # pylint: disable=no-name-in-module,import-error
     StrictVersion,
 )
+from queue import Queue
+from threading import Lock, Thread
 
 from django import get_version
 from django.conf import settings
 from django.contrib.auth.models import Group
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ImproperlyConfigured
-from django.db import models
+from django.db import close_old_connections, models
 from django.db.models import JSONField
 from django.db.models.query import QuerySet
 from django.utils import timezone
@@ -26,6 +30,8 @@ else:
     from django.contrib.contenttypes.generic import GenericForeignKey  # noqa
 
 
+logger = logging.getLogger(__name__)
+
 EXTRA_DATA = notifications_settings.get_config()["USE_JSONFIELD"]
 
 
@@ -270,12 +276,74 @@ class AbstractNotification(models.Model):
             self.save()
 
 
+class NotificationFanOut(Thread):
+    """
+    Background worker creating the notifications queued by deferred
+    notify.send calls
+    """
+
+    def __init__(self):
+        Thread.__init__(self, daemon=True)
+        self.queue = Queue()
+
+    def run(self):
+        while True:
+            context, verb, kwargs = self.queue.get()
+            try:
+                # created here, not queued again by the DEFERRED config
+                context.run(notify_handler, verb, deferred=False, **kwargs)
+            except Exception as e:
+                logger.error(e)
+            finally:
+                close_old_connections()
+                self.queue.task_done()
+
+
+_fan_out = None
+_fan_out_lock = Lock()
+
+
+def defer_notify(verb, **kwargs):
+    """
+    Queue the notifications to be created by the background worker
+    """
+    global _fan_out
+    with _fan_out_lock:
+        if _fan_out is None:
+            _fan_out = NotificationFanOut()
+            _fan_out.start()
+    kwargs["timestamp"] = kwargs.get("timestamp") or timezone.now()
+    _fan_out.queue.put((contextvars.copy_context(), verb, kwargs))
+
+
+def _recipient_batches(recipients, size):
+    if isinstance(recipients, QuerySet):
+        recipients = recipients.iterator(chunk_size=size)
+    batch = []
+    for recipient in recipients:
+        if recipient is None:
+            continue
+        batch.append(recipient)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
 def notify_handler(verb, **kwargs):
     """
     Handler function to create Notification instance upon action signal call.
+
+    The notifications are inserted in batches. Pass deferred=True, or set
+    DEFERRED in DJANGO_NOTIFICATIONS_CONFIG, to create them in the background
+    and return immediately.
     """
     # Pull the options out of kwargs
     kwargs.pop("signal", None)
+    if kwargs.pop("deferred", notifications_settings.get_config()["DEFERRED"]):
+        defer_notify(verb, **kwargs)
+        return []
     recipient = kwargs.pop("recipient")
     actor = kwargs.pop("sender")
     optional_objs = [
@@ -283,7 +351,7 @@ def notify_handler(verb, **kwargs):
     ]
     public = bool(kwargs.pop("public", True))
     description = kwargs.pop("description", None)
-    timestamp = kwargs.pop("timestamp", timezone.now())
+    timestamp = kwargs.pop("timestamp", None) or timezone.now()
     Notification = load_model("notifications", "Notification")
     level = kwargs.pop("level", Notification.LEVELS.info)
 
@@ -295,39 +363,34 @@ def notify_handler(verb, **kwargs):
     else:
         recipients = [recipient]
 
+    # the same for every recipient, resolved once
+    fields = {
+        "actor_content_type": ContentType.objects.get_for_model(actor),
+        "actor_object_id": actor.pk,
+        "verb": str(verb),
+        "public": public,
+        "description": description,
+        "timestamp": timestamp,
+        "level": level,
+    }
+    for obj, opt in optional_objs:
+        if obj is not None:
+            fields["%s_object_id" % opt] = obj.pk
+            fields["%s_content_type" % opt] = ContentType.objects.get_for_model(obj)
+    if kwargs and EXTRA_DATA:
+        fields["data"] = kwargs
+        fields["verb_ar"] = kwargs.get("verb_ar", None)
+        fields["verb_de"] = kwargs.get("verb_de", None)
+        fields["verb_es"] = kwargs.get("verb_es", None)
+        fields["verb_fr"] = kwargs.get("verb_fr", None)
+
+    batch_size = notifications_settings.get_config()["BATCH_SIZE"]
     new_notifications = []
-
-    for recipient in recipients:
-        newnotify = Notification(
-            recipient=recipient,
-            actor_content_type=ContentType.objects.get_for_model(actor),
-            actor_object_id=actor.pk,
-            verb=str(verb),
-            public=public,
-            description=description,
-            timestamp=timestamp,
-            level=level,
+    for batch in _recipient_batches(recipients, batch_size):
+        new_notifications += Notification.objects.bulk_create(
+            [Notification(recipient=recipient, **fields) for recipient in batch]
         )
 
-        # Set optional objects
-        for obj, opt in optional_objs:
-            if obj is not None:
-                setattr(newnotify, "%s_object_id" % opt, obj.pk)
-                setattr(
-                    newnotify,
-                    "%s_content_type" % opt,
-                    ContentType.objects.get_for_model(obj),
-                )
-
-        if kwargs and EXTRA_DATA:
-            newnotify.data = kwargs
-            newnotify.verb_ar = newnotify.data.get("verb_ar", None)
-            newnotify.verb_de = newnotify.data.get("verb_de", None)
-            newnotify.verb_es = newnotify.data.get("verb_es", None)
-            newnotify.verb_fr = newnotify.data.get("verb_fr", None)
-        newnotify.save()
-        new_notifications.append(newnotify)
-
     return new_notifications
 
 
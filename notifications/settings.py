@@ -8,6 +8,10 @@ CONFIG_DEFAULTS = {
     "USE_JSONFIELD": False,
     "SOFT_DELETE": False,
     "NUM_TO_FETCH": 10,
+    # notifications inserted per query
+    "BATCH_SIZE": 500,
+    # create the notifications in a background worker by default
+    "DEFERRED": False,
 }
 
 
@@ -0,0 +1,30 @@
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase, override_settings
+
+from notifications.base import models as base_models
+from notifications.models import Notification
+from notifications.signals import notify
+
+
+class DeferredNotificationTest(TransactionTestCase):
+    def setUp(self):
+        self.actor = User.objects.create(username="actor")
+        self.recipients = [
+            User.objects.create(username=f"recipient{index}") for index in range(3)
+        ]
+
+    def wait_for_fan_out(self):
+        base_models._fan_out.queue.join()
+
+    @override_settings(DJANGO_NOTIFICATIONS_CONFIG={"DEFERRED": True})
+    def test_deferred_config_creates_notifications(self):
+        notify.send(self.actor, recipient=self.recipients, verb="deferred config")
+        self.wait_for_fan_out()
+        self.assertEqual(Notification.objects.filter(verb="deferred config").count(), 3)
+
+    def test_deferred_send_creates_notifications(self):
+        notify.send(
+            self.actor, recipient=self.recipients, verb="deferred send", deferred=True
+        )
+        self.wait_for_fan_out()
+        self.assertEqual(Notification.objects.filter(verb="deferred send").count(), 3)
@@ -5,7 +5,7 @@ offboarding/sidebar.py
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
-from base.context_processors import resignation_request_enabled
+from base.context_processors import is_resignation_request_enabled
 from offboarding.templatetags.offboarding_filter import (
     any_manager,
     is_offboarding_employee,
@@ -42,6 +42,6 @@ def offboarding_accessibility(request, menu, user_perms, *args, **kwargs):
 
 
 def resignation_letter_accessibility(request, menu, user_perms, *args, **kwargs):
-    return resignation_request_enabled(request)[
-        "enabled_resignation_request"
-    ] and request.user.has_perm("offboarding.view_resignationletter")
+    return is_resignation_request_enabled() and request.user.has_perm(
+        "offboarding.view_resignationletter"
+    )
@@ -11,7 +11,7 @@ from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
-from base.context_processors import intial_notice_period
+from base.context_processors import get_initial_notice_period
 from base.methods import closest_numbers, eval_validate, paginator_qry, sortby
 from base.views import general_settings
 from employee.models import Employee
@@ -297,11 +297,7 @@ def add_employee(request):
     """
     This method is used to add employee to the stage
     """
-    default_notice_period = (
-        intial_notice_period(request)["get_initial_notice_period"]
-        if intial_notice_period(request)["get_initial_notice_period"]
-        else 0
-    )
+    default_notice_period = get_initial_notice_period() or 0
     end_date = datetime.today() + timedelta(days=default_notice_period)
     stage_id = request.GET["stage_id"]
     instance_id = eval_validate(str(request.GET.get("instance_id")))
@@ -976,7 +972,7 @@ def get_notice_period(request):
         employee_contract = None
 
     response = {
-        "notice_period": intial_notice_period(request)["get_initial_notice_period"],
+        "notice_period": get_initial_notice_period(),
         "unit": "month",
         "notice_period_starts": str(datetime.today().date()),
     }
@@ -991,7 +987,7 @@ def get_notice_period_end_date(request):
     """
     start_date = request.GET.get("start_date")
     start_date = datetime.strptime(start_date, "%Y-%m-%d").date()
-    notice_period = intial_notice_period(request)["get_initial_notice_period"]
+    notice_period = get_initial_notice_period()
     end_date = start_date + timedelta(days=notice_period)
     response = {
         "end_date": end_date,
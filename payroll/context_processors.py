@@ -4,24 +4,39 @@ context_processor.py
 This module is used to register context processor`
 """
 
+from django.utils.functional import SimpleLazyObject
+
+from base.settings_registry import get_setting
 from employee.models import Employee
 from payroll.models import tax_models as models
 from payroll.models.models import Deduction
 
 
-def default_currency(request):
+def get_payroll_settings():
     """
-    This method will return the currency
+    This method will return the payroll settings, creating them with the
+    default currency when missing
     """
-    if models.PayrollSettings.objects.first() is None:
+    settings = get_setting("payroll.payrollsettings")
+    if settings is None:
         settings = models.PayrollSettings()
         settings.currency_symbol = "$"
         settings.save()
-    symbol = models.PayrollSettings.objects.first().currency_symbol
-    position = models.PayrollSettings.objects.first().position
+    return settings
+
+
+def default_currency(request):
+    """
+    This method will return the currency
+    """
+    settings = SimpleLazyObject(get_payroll_settings)
     return {
-        "currency": request.session.get("currency", symbol),
-        "position": request.session.get("position", position),
+        "currency": request.session.get(
+            "currency", SimpleLazyObject(lambda: settings.currency_symbol)
+        ),
+        "position": request.session.get(
+            "position", SimpleLazyObject(lambda: settings.position)
+        ),
     }
 
 
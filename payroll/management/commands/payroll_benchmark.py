@@ -0,0 +1,96 @@
+import time
+from datetime import date, timedelta
+
+from dateutil.relativedelta import relativedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from employee.models import Employee
+from payroll.methods.methods import (
+    compute_salary_on_period,
+    compute_salary_on_period_batch,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the per employee and the batch salary computation of a pay "
+        "period by query count and duration"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--start-date",
+            type=date.fromisoformat,
+            help="Start of the pay period (YYYY-MM-DD), defaults to last month",
+        )
+        parser.add_argument(
+            "--end-date",
+            type=date.fromisoformat,
+            help="End of the pay period (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=None,
+            help="Number of employees with an active contract to compute",
+        )
+
+    def handle(self, *args, **kwargs):
+        first_day = date.today().replace(day=1)
+        start_date = kwargs["start_date"] or first_day - relativedelta(months=1)
+        end_date = kwargs["end_date"] or first_day - timedelta(days=1)
+        if end_date < start_date:
+            raise CommandError("The end date must be after the start date")
+
+        employees = Employee.objects.entire().filter(
+            contract_set__contract_status="active"
+        )
+        employees = list(employees.distinct().order_by("id")[: kwargs["limit"]])
+        self.stdout.write(
+            f"{len(employees)} employees, period {start_date} to {end_date}"
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            single = {
+                employee.id: compute_salary_on_period(employee, start_date, end_date)
+                for employee in employees
+            }
+            single_duration = time.perf_counter() - started
+        single_queries = len(queries)
+
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            batch = compute_salary_on_period_batch(employees, start_date, end_date)
+            batch_duration = time.perf_counter() - started
+        batch_queries = len(queries)
+
+        self.stdout.write(
+            f"per employee: {single_queries} queries, {single_duration:.3f}s"
+        )
+        self.stdout.write(f"batch: {batch_queries} queries, {batch_duration:.3f}s")
+
+        mismatches = [
+            employee.id
+            for employee in employees
+            if _comparable(single[employee.id]) != _comparable(batch[employee.id])
+        ]
+        if mismatches:
+            raise CommandError(f"Results differ for employees {mismatches}")
+        self.stdout.write(self.style.SUCCESS("Results are identical."))
+
+
+def _comparable(data):
+    """
+    Salary data with the attendance records replaced by their ids
+    """
+    if data is None:
+        return None
+    data = dict(data)
+    for key, value in data.items():
+        if isinstance(value, list):
+            data[key] = sorted(map(str, value))
+    data["contract"] = getattr(data["contract"], "id", None)
+    return data
@@ -10,16 +10,10 @@ from datetime import date, datetime, timedelta
 from dateutil.relativedelta import relativedelta
 from django.apps import apps
 from django.core.paginator import Paginator
-from django.db.models import F, Q
+from django.db.models import Q
 
 # from attendance.models import Attendance
-from base.methods import (
-    get_company_leave_dates,
-    get_date_range,
-    get_holiday_dates,
-    get_pagination,
-    get_working_days,
-)
+from base.methods import get_pagination, get_working_days
 from base.models import CompanyLeaves, Holidays
 from horilla.methods import get_horilla_model_class
 from payroll.models.models import Contract, Deduction, Payslip
@@ -46,7 +40,130 @@ def get_total_days(start_date, end_date):
     return total_days
 
 
-def get_leaves(employee, start_date, end_date):
+class PayrollPeriodData:
+    """
+    Records of an employee needed to compute the salary of a pay period.
+    Use fetch() for a single employee and fetch_many() to load a set of
+    employees with one query per record type.
+    """
+
+    def __init__(
+        self, employee, contracts=None, approved_leaves=None, attendances=None
+    ):
+        self.employee = employee
+        # active status contracts ordered by id
+        self.contracts = contracts or []
+        self.approved_leaves = approved_leaves if apps.is_installed("leave") else None
+        self.attendances = attendances or []
+
+    @property
+    def contract(self):
+        """
+        The active contract of the employee
+        """
+        return self.contracts[0] if self.contracts else None
+
+    @property
+    def active_contract(self):
+        """
+        The active contract of the employee that is not archived
+        """
+        return next(
+            (contract for contract in self.contracts if contract.is_active), None
+        )
+
+    @classmethod
+    def fetch(cls, employee, start_date, end_date):
+        return cls.fetch_many([employee], start_date, end_date)[employee.id]
+
+    @classmethod
+    def fetch_many(cls, employees, start_date, end_date):
+        """
+        Load the active contracts, the approved leaves overlapping the period and
+        the validated attendances of the period for the employees.
+
+        Returns:
+            dict: employee id -> PayrollPeriodData
+        """
+        employees = list(employees)
+        employee_ids = [employee.id for employee in employees]
+        contracts = {employee_id: [] for employee_id in employee_ids}
+        leaves = {employee_id: [] for employee_id in employee_ids}
+        attendances = {employee_id: [] for employee_id in employee_ids}
+
+        for contract in Contract.objects.filter(
+            employee_id__in=employee_ids, contract_status="active"
+        ).order_by("id"):
+            contracts[contract.employee_id_id].append(contract)
+
+        if apps.is_installed("leave"):
+            LeaveRequest = get_horilla_model_class(
+                app_label="leave", model="leaverequest"
+            )
+            for leave in (
+                LeaveRequest.objects.filter(
+                    employee_id__in=employee_ids,
+                    status="approved",
+                    start_date__lte=end_date,
+                )
+                .exclude(end_date__lt=start_date)
+                .select_related("leave_type_id")
+            ):
+                leaves[leave.employee_id_id].append(leave)
+
+        if apps.is_installed("attendance"):
+            Attendance = get_horilla_model_class(
+                app_label="attendance", model="attendance"
+            )
+            for attendance in Attendance.objects.filter(
+                employee_id__in=employee_ids,
+                attendance_date__range=(start_date, end_date),
+                attendance_validated=True,
+            ):
+                attendances[attendance.employee_id_id].append(attendance)
+
+        return {
+            employee.id: cls(
+                employee,
+                contracts=contracts[employee.id],
+                approved_leaves=leaves[employee.id],
+                attendances=attendances[employee.id],
+            )
+            for employee in employees
+        }
+
+
+def get_unpaid_half_leaves(approved_leaves, start_date, end_date):
+    """
+    This method is used to return the unpaid half day leaves starting or ending
+    on the period
+
+    Args:
+        approved_leaves (list): approved leave requests of the employee
+        start_date (obj): start date of the period
+        end_date (obj): end date of the period
+    """
+    start_date_leaves = 0
+    end_date_leaves = 0
+    for leave in approved_leaves or []:
+        if leave.leave_type_id.payment != "unpaid":
+            continue
+        if (
+            start_date <= leave.start_date <= end_date
+            and leave.start_date_breakdown != "full_day"
+        ):
+            start_date_leaves += 1
+        if (
+            leave.end_date
+            and start_date <= leave.end_date <= end_date
+            and leave.end_date_breakdown != "full_day"
+            and leave.start_date != leave.end_date
+        ):
+            end_date_leaves += 1
+    return (start_date_leaves + end_date_leaves) * 0.5
+
+
+def get_leaves(employee, start_date, end_date, period_data=None):
     """
     This method is used to return all the leaves taken by the employee
     between the period.
@@ -55,11 +172,11 @@ def get_leaves(employee, start_date, end_date):
         employee (obj): Employee model instance
         start_date (obj): the start date from the data needed
         end_date (obj): the end date till the date needed
+        period_data (PayrollPeriodData): prefetched records of the employee
     """
-    if apps.is_installed("leave"):
-        approved_leaves = employee.leaverequest_set.filter(status="approved")
-    else:
-        approved_leaves = None
+    if period_data is None:
+        period_data = PayrollPeriodData.fetch(employee, start_date, end_date)
+    approved_leaves = period_data.approved_leaves
     paid_leave = 0
     unpaid_leave = 0
     paid_half = 0
@@ -68,7 +185,7 @@ def get_leaves(employee, start_date, end_date):
     unpaid_leave_dates = []
     company_leave_dates = get_working_days(start_date, end_date)["company_leave_dates"]
 
-    if approved_leaves and approved_leaves.exists():
+    if approved_leaves:
         for instance in approved_leaves:
             if instance.leave_type_id.payment == "paid":
                 # if the taken leave is paid
@@ -113,7 +230,7 @@ def get_leaves(employee, start_date, end_date):
 
 if apps.is_installed("attendance"):
 
-    def get_attendance(employee, start_date, end_date):
+    def get_attendance(employee, start_date, end_date, period_data=None):
         """
         This method is used to render attendance details between the range
 
@@ -121,36 +238,28 @@ if apps.is_installed("attendance"):
             employee (obj): Employee user instance
             start_date (obj): start date of the period
             end_date (obj): end date of the period
+            period_data (PayrollPeriodData): prefetched records of the employee
         """
-        Attendance = get_horilla_model_class(app_label="attendance", model="attendance")
-        attendances_on_period = Attendance.objects.filter(
-            employee_id=employee,
-            attendance_date__range=(start_date, end_date),
-            attendance_validated=True,
-        )
+        if period_data is None:
+            period_data = PayrollPeriodData.fetch(employee, start_date, end_date)
+        attendances_on_period = period_data.attendances
         present_on = [
             attendance.attendance_date for attendance in attendances_on_period
         ]
-        working_days_between_range = get_working_days(start_date, end_date)[
-            "working_days_on"
-        ]
-        leave_dates = get_leaves(employee, start_date, end_date)["leave_dates"]
+        working_day_data = get_working_days(start_date, end_date)
+        working_days_between_range = working_day_data["working_days_on"]
+        leave_dates = get_leaves(
+            employee, start_date, end_date, period_data=period_data
+        )["leave_dates"]
         conflict_dates = list(
             set(working_days_between_range)
             - set(attendances_on_period)
             - set(leave_dates)
         )
+        # holidays and company leaves within the period
+        off_dates = set(working_day_data["company_leave_dates"])
         conflict_dates = conflict_dates + [
-            date
-            for date in present_on
-            if date in get_holiday_dates(start_date, end_date)
-            or date
-            in list(
-                set(
-                    get_company_leave_dates(start_date.year)
-                    + get_company_leave_dates(end_date.year)
-                )
-            )
+            date for date in present_on if date in off_dates
         ]
 
         return {
@@ -160,7 +269,7 @@ if apps.is_installed("attendance"):
         }
 
 
-def hourly_computation(employee, wage, start_date, end_date):
+def hourly_computation(employee, wage, start_date, end_date, period_data=None):
     """
     Hourly salary computation for period.
 
@@ -169,13 +278,16 @@ def hourly_computation(employee, wage, start_date, end_date):
         wage (float): wage of the employee
         start_date (obj): start of the pay period
         end_date (obj): end date of the period
+        period_data (PayrollPeriodData): prefetched records of the employee
     """
     if not apps.is_installed("attendance"):
         return {
             "basic_pay": 0,
             "loss_of_pay": 0,
         }
-    attendance_data = get_attendance(employee, start_date, end_date)
+    attendance_data = get_attendance(
+        employee, start_date, end_date, period_data=period_data
+    )
     attendances_on_period = attendance_data["attendances_on_period"]
     total_worked_hour_in_second = 0
     for attendance in attendances_on_period:
@@ -223,7 +335,7 @@ def find_half_day_leaves():
     }
 
 
-def daily_computation(employee, wage, start_date, end_date):
+def daily_computation(employee, wage, start_date, end_date, period_data=None):
     """
     Hourly salary computation for period.
 
@@ -232,43 +344,23 @@ def daily_computation(employee, wage, start_date, end_date):
         wage (float): wage of the employee
         start_date (obj): start of the pay period
         end_date (obj): end date of the period
+        period_data (PayrollPeriodData): prefetched records of the employee
     """
+    if period_data is None:
+        period_data = PayrollPeriodData.fetch(employee, start_date, end_date)
     working_day_data = get_working_days(start_date, end_date)
     total_working_days = working_day_data["total_working_days"]
 
-    leave_data = get_leaves(employee, start_date, end_date)
+    leave_data = get_leaves(employee, start_date, end_date, period_data=period_data)
 
-    contract = employee.contract_set.filter(contract_status="active").first()
     basic_pay = wage * total_working_days
     loss_of_pay = 0
 
-    date_range = get_date_range(start_date, end_date)
-    half_day_leaves_between_period_on_start_date = (
-        employee.leaverequest_set.filter(
-            leave_type_id__payment="unpaid",
-            start_date__in=date_range,
-            status="approved",
-        )
-        .exclude(start_date_breakdown="full_day")
-        .count()
+    unpaid_half_leaves = get_unpaid_half_leaves(
+        period_data.approved_leaves, start_date, end_date
     )
 
-    half_day_leaves_between_period_on_end_date = (
-        employee.leaverequest_set.filter(
-            leave_type_id__payment="unpaid", end_date__in=date_range, status="approved"
-        )
-        .exclude(end_date_breakdown="full_day")
-        .exclude(start_date=F("end_date"))
-        .count()
-    )
-    unpaid_half_leaves = (
-        half_day_leaves_between_period_on_start_date
-        + half_day_leaves_between_period_on_end_date
-    ) * 0.5
-
-    contract = employee.contract_set.filter(
-        is_active=True, contract_status="active"
-    ).first()
+    contract = period_data.active_contract
 
     unpaid_leaves = leave_data["unpaid_leaves"] - unpaid_half_leaves
     if contract.calculate_daily_leave_amount:
@@ -416,56 +508,27 @@ def monthly_computation(employee, wage, start_date, end_date, *args, **kwargs):
         wage (float): wage of the employee
         start_date (obj): start of the pay period
         end_date (obj): end date of the period
+        period_data (PayrollPeriodData): prefetched records of the employee
     """
+    period_data = kwargs.get("period_data")
+    if period_data is None:
+        period_data = PayrollPeriodData.fetch(employee, start_date, end_date)
     basic_pay = 0
     month_data = months_between_range(wage, start_date, end_date)
 
-    leave_data = get_leaves(employee, start_date, end_date)
+    leave_data = get_leaves(employee, start_date, end_date, period_data=period_data)
 
     for data in month_data:
         basic_pay = basic_pay + (
             data["working_days_on_period"] * data["per_day_amount"]
         )
 
-    contract = employee.contract_set.filter(contract_status="active").first()
     loss_of_pay = 0
-    date_range = get_date_range(start_date, end_date)
-    if apps.is_installed("leave"):
-        start_date_leaves = (
-            employee.leaverequest_set.filter(
-                leave_type_id__payment="unpaid",
-                start_date__in=date_range,
-                status="approved",
-            )
-            .exclude(start_date_breakdown="full_day")
-            .count()
-        )
-        end_date_leaves = (
-            employee.leaverequest_set.filter(
-                leave_type_id__payment="unpaid",
-                end_date__in=date_range,
-                status="approved",
-            )
-            .exclude(end_date_breakdown="full_day")
-            .exclude(start_date=F("end_date"))
-            .count()
-        )
-    else:
-        start_date_leaves = 0
-        end_date_leaves = 0
-
-    half_day_leaves_between_period_on_start_date = start_date_leaves
-
-    half_day_leaves_between_period_on_end_date = end_date_leaves
-
-    unpaid_half_leaves = (
-        half_day_leaves_between_period_on_start_date
-        + half_day_leaves_between_period_on_end_date
-    ) * 0.5
+    unpaid_half_leaves = get_unpaid_half_leaves(
+        period_data.approved_leaves, start_date, end_date
+    )
 
-    contract = employee.contract_set.filter(
-        is_active=True, contract_status="active"
-    ).first()
+    contract = period_data.active_contract
     unpaid_leaves = abs(leave_data["unpaid_leaves"] - unpaid_half_leaves)
     paid_days = month_data[0]["working_days_on_period"] - unpaid_leaves
     daily_computed_salary = get_daily_salary(wage=wage, wage_date=start_date)[
@@ -489,7 +552,9 @@ def monthly_computation(employee, wage, start_date, end_date, *args, **kwargs):
     }
 
 
-def compute_salary_on_period(employee, start_date, end_date, wage=None):
+def compute_salary_on_period(
+    employee, start_date, end_date, wage=None, period_data=None
+):
     """
     This method is used to compute salary on the start to end date period
 
@@ -497,10 +562,11 @@ def compute_salary_on_period(employee, start_date, end_date, wage=None):
         employee (obj): Employee instance
         start_date (obj): start date of the period
         end_date (obj): end date of the period
+        period_data (PayrollPeriodData): prefetched records of the employee
     """
-    contract = Contract.objects.filter(
-        employee_id=employee, contract_status="active"
-    ).first()
+    if period_data is None:
+        period_data = PayrollPeriodData.fetch(employee, start_date, end_date)
+    contract = period_data.contract
     if contract is None:
         return contract
 
@@ -508,21 +574,52 @@ def compute_salary_on_period(employee, start_date, end_date, wage=None):
     wage_type = contract.wage_type
     data = None
     if wage_type == "hourly":
-        data = hourly_computation(employee, wage, start_date, end_date)
+        data = hourly_computation(
+            employee, wage, start_date, end_date, period_data=period_data
+        )
         month_data = months_between_range(wage, start_date, end_date)
         data["month_data"] = month_data
     elif wage_type == "daily":
-        data = daily_computation(employee, wage, start_date, end_date)
+        data = daily_computation(
+            employee, wage, start_date, end_date, period_data=period_data
+        )
         month_data = months_between_range(wage, start_date, end_date)
         data["month_data"] = month_data
 
     else:
-        data = monthly_computation(employee, wage, start_date, end_date)
+        data = monthly_computation(
+            employee, wage, start_date, end_date, period_data=period_data
+        )
     data["contract_wage"] = wage
     data["contract"] = contract
     return data
 
 
+def compute_salary_on_period_batch(employees, start_date, end_date):
+    """
+    This method is used to compute the salary of a set of employees on the
+    start to end date period. The contracts, approved leaves and validated
+    attendances of all the employees are loaded with one query each, and the
+    working days come from the cached company calendar.
+
+    Args:
+        employees (iterable): Employee instances
+        start_date (obj): start date of the period
+        end_date (obj): end date of the period
+
+    Returns:
+        dict: employee id -> compute_salary_on_period result
+    """
+    employees = list(employees)
+    period_data = PayrollPeriodData.fetch_many(employees, start_date, end_date)
+    return {
+        employee.id: compute_salary_on_period(
+            employee, start_date, end_date, period_data=period_data[employee.id]
+        )
+        for employee in employees
+    }
+
+
 def paginator_qry(qryset, page_number):
     """
     This method is used to paginate queryset
@@ -0,0 +1,374 @@
+"""
+pay_rules.py
+
+This module is used to compile the allowances and deductions of a pay period
+once and apply them to a batch of employees.
+
+A PayRuleSet loads the components active on the period with their specific,
+excluded and condition data in a fixed number of queries. Preparing it for a
+batch of employees reads the employee fields the conditions compare, and the
+attendance counts the attendance based components use, with one query each
+for the whole batch. Every employee gets an EmployeePayRules holding the
+components that apply to them, which the payslip calculators read instead of
+querying the components again, and which keeps the gross pay, the pre-tax
+deductions and the taxable gross pay once computed for the payslip.
+"""
+
+from collections import defaultdict, namedtuple
+
+from django.apps import apps
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Q, Sum
+
+from horilla.methods import get_horilla_model_class
+from payroll.methods.payslip_calc import dynamic_attr, operator_mapping
+from payroll.models.models import Allowance, Contract, Deduction
+
+ATTENDANCE_BASES = ["attendance", "shift_id", "overtime", "work_type_id"]
+CONTRACT_PATH = "contract_set__"
+
+PayRule = namedtuple(
+    "PayRule", ["component", "specific", "excluded", "conditions", "main_condition"]
+)
+
+
+def condition_holds(value, condition, expected):
+    """
+    Compare an employee value with the value of a component condition, the
+    way the payslip calculators always did
+    """
+    if value is None:
+        return False
+    return bool(operator_mapping.get(condition)(value, type(value)(expected)))
+
+
+def _is_column(model, path):
+    """
+    Whether the lookup path reaches a concrete field of the model through
+    single valued relations, so its value can be read with .values()
+    """
+    opts = model._meta
+    parts = path.split("__")
+    for index, part in enumerate(parts):
+        try:
+            field = opts.get_field(part)
+        except FieldDoesNotExist:
+            return False
+        if index == len(parts) - 1:
+            return not field.is_relation and field.concrete
+        if not (field.many_to_one or field.one_to_one):
+            return False
+        opts = field.related_model._meta
+    return False
+
+
+def _members(model, field_name, component_ids):
+    """
+    The employee ids of a many to many field of the components, by component
+    """
+    field = model._meta.get_field(field_name)
+    source = f"{field.m2m_field_name()}_id"
+    target = f"{field.m2m_reverse_field_name()}_id"
+    members = defaultdict(set)
+    for component_id, employee_id in field.remote_field.through.objects.filter(
+        **{f"{source}__in": component_ids}
+    ).values_list(source, target):
+        members[component_id].add(employee_id)
+    return members
+
+
+def _compile(queryset):
+    components = list(queryset.prefetch_related("other_conditions"))
+    ids = [component.id for component in components]
+    model = queryset.model
+    specific = _members(model, "specific_employees", ids)
+    excluded = _members(model, "exclude_employees", ids)
+    rules = []
+    for component in components:
+        conditions = []
+        main_condition = None
+        if component.is_condition_based:
+            conditions = [
+                (condition.field, condition.condition, condition.value)
+                for condition in component.other_conditions.all()
+            ]
+            main_condition = (
+                component.field,
+                component.condition,
+                component.value.lower().replace(" ", "_"),
+            )
+            conditions.append(main_condition)
+        rules.append(
+            PayRule(
+                component,
+                specific[component.id],
+                excluded[component.id],
+                conditions,
+                main_condition,
+            )
+        )
+    return rules
+
+
+def _applies_to(rule, employee_id, condition_based=True):
+    """
+    Whether the component is given to the employee before its conditions:
+    specific employees always, the others unless excluded
+    """
+    component = rule.component
+    if employee_id in rule.specific:
+        return True
+    if employee_id in rule.excluded:
+        return False
+    return component.include_active_employees or (
+        condition_based and component.is_condition_based
+    )
+
+
+class PayRuleSet:
+    """
+    The allowances and deductions active on a pay period, compiled once
+    """
+
+    def __init__(self, start_date, end_date):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.allowances = _compile(
+            Allowance.objects.exclude(one_time_date__lt=start_date).exclude(
+                one_time_date__gt=end_date
+            )
+        )
+        deductions = _compile(
+            Deduction.objects.exclude(one_time_date__lt=start_date).exclude(
+                one_time_date__gt=end_date
+            )
+        )
+        self.deductions = [
+            rule for rule in deductions if rule.component.update_compensation is None
+        ]
+        self.compensation_deductions = [
+            rule
+            for rule in deductions
+            if rule.component.update_compensation is not None
+        ]
+        self.condition_paths = {
+            condition[0]
+            for rule in self.allowances + self.deductions
+            for condition in rule.conditions
+        }
+        self.uses_attendance = apps.is_installed("attendance") and any(
+            rule.component.based_on in ATTENDANCE_BASES
+            for rule in self.allowances + self.deductions
+        )
+
+    def prepare(self, employees):
+        """
+        Apply the rule set to a batch of employees
+
+        Returns:
+            dict: employee id -> EmployeePayRules
+        """
+        employees = list(employees)
+        values = self.condition_values(employees)
+        attendance = self.attendance_stats(employees)
+        return {
+            employee.id: EmployeePayRules(
+                self, employee, values[employee.id], attendance[employee.id]
+            )
+            for employee in employees
+        }
+
+    def condition_values(self, employees):
+        """
+        The values the conditions compare for every employee. The employee
+        fields are read with one query and the fields of the active contract
+        with another; the other paths are followed on each employee.
+        """
+        values = defaultdict(dict)
+        if not employees:
+            return values
+        employee_model = type(employees[0])
+        columns = []
+        contract_columns = []
+        for path in self.condition_paths:
+            if not path:
+                continue
+            if path.startswith(CONTRACT_PATH) and _is_column(
+                Contract, path[len(CONTRACT_PATH) :]
+            ):
+                contract_columns.append(path)
+            elif _is_column(employee_model, path):
+                columns.append(path)
+            else:
+                for employee in employees:
+                    values[employee.id][path] = dynamic_attr(employee, path)
+        ids = [employee.id for employee in employees]
+        if columns:
+            for row in (
+                employee_model.objects.entire()
+                .filter(id__in=ids)
+                .values("id", *columns)
+            ):
+                values[row.pop("id")].update(row)
+        if contract_columns:
+            fields = [path[len(CONTRACT_PATH) :] for path in contract_columns]
+            for row in (
+                Contract.objects.filter(employee_id__in=ids, is_active=True)
+                .order_by("-pk")
+                .values("employee_id", *fields)
+            ):
+                # the lowest pk is read last, as the first() of dynamic_attr
+                values[row["employee_id"]].update(
+                    {path: row[field] for path, field in zip(contract_columns, fields)}
+                )
+        return values
+
+    def attendance_stats(self, employees):
+        """
+        The validated attendance counts by shift and work type, and the
+        approved overtime of every employee, with one query each
+        """
+        stats = defaultdict(
+            lambda: {"validated": defaultdict(int), "overtime": 0, "approved": 0}
+        )
+        if not self.uses_attendance or not employees:
+            return stats
+        Attendance = get_horilla_model_class(app_label="attendance", model="attendance")
+        attendances = Attendance.objects.filter(
+            employee_id__in=[employee.id for employee in employees],
+            attendance_date__range=(self.start_date, self.end_date),
+        )
+        for row in (
+            attendances.filter(attendance_validated=True)
+            .values("employee_id", "shift_id", "work_type_id")
+            .annotate(count=Count("id"))
+        ):
+            key = (row["shift_id"], row["work_type_id"])
+            stats[row["employee_id"]]["validated"][key] += row["count"]
+        for row in (
+            attendances.filter(attendance_overtime_approve=True)
+            .values("employee_id")
+            .annotate(
+                overtime=Sum("overtime_second"),
+                approved=Count("id", filter=Q(attendance_validated=True)),
+            )
+        ):
+            stats[row["employee_id"]]["overtime"] = row["overtime"] or 0
+            stats[row["employee_id"]]["approved"] = row["approved"]
+        return stats
+
+
+class EmployeePayRules:
+    """
+    The components of a pay rule set that apply to one employee, and the
+    payslip amounts already computed from them
+    """
+
+    def __init__(self, rule_set, employee, values, attendance):
+        self.rule_set = rule_set
+        self.employee = employee
+        self.values = values
+        self.attendance = attendance
+        self.computed = {}
+        employee_id = employee.id
+
+        self.allowances = [
+            rule.component
+            for rule in rule_set.allowances
+            if _applies_to(rule, employee_id) and self.allowance_eligible(rule)
+        ]
+        candidates = [
+            rule for rule in rule_set.deductions if _applies_to(rule, employee_id)
+        ]
+        self.pretax_deductions = [
+            rule.component
+            for rule in candidates
+            if rule.component.is_pretax
+            and not rule.component.is_tax
+            and self.conditions_hold(rule.conditions)
+        ]
+        self.post_tax_deductions = [
+            rule.component
+            for rule in candidates
+            if not rule.component.is_pretax and not rule.component.is_tax
+            # the post-tax deductions are checked on their main condition only
+            and self.conditions_hold(
+                [rule.main_condition] if rule.main_condition else []
+            )
+        ]
+        self.tax_deductions = [
+            rule.component
+            for rule in rule_set.deductions
+            if rule.component.is_tax
+            and not rule.component.is_pretax
+            and _applies_to(rule, employee_id, condition_based=False)
+        ]
+        self.installments = [
+            rule.component
+            for rule in candidates
+            if rule.component.is_installment and not rule.component.is_tax
+        ]
+
+    def conditions_hold(self, conditions):
+        return all(
+            condition_holds(self.values.get(field), condition, value)
+            for field, condition, value in conditions
+        )
+
+    def allowance_eligible(self, rule):
+        allowance = rule.component
+        if allowance.is_condition_based:
+            return self.conditions_hold(rule.conditions)
+        if allowance.based_on in ATTENDANCE_BASES:
+            return self.rule_set.uses_attendance and self.attendance_count(allowance)
+        return True
+
+    def attendance_count(self, component):
+        """
+        The attendances the attendance based component counts: the validated
+        ones, on the shift or the work type of the component, or with an
+        approved overtime
+        """
+        if component.based_on == "overtime":
+            return self.attendance["approved"]
+        return sum(
+            count
+            for (shift_id, work_type_id), count in self.attendance["validated"].items()
+            if (component.based_on != "shift_id" or shift_id == component.shift_id_id)
+            and (
+                component.based_on != "work_type_id"
+                or work_type_id == component.work_type_id_id
+            )
+        )
+
+    def overtime_seconds(self):
+        return self.attendance["overtime"]
+
+    def compensation_deductions(self, compensation_type):
+        """
+        The deductions updating the basic, gross or net pay of the employee
+        """
+        return [
+            rule.component
+            for rule in self.rule_set.compensation_deductions
+            if rule.component.update_compensation == compensation_type
+            and self.employee.id in rule.specific
+        ]
+
+    def reuse(self, name, kwargs, compute):
+        """
+        Compute a payslip amount once for the basic pay and total allowance
+        it depends on, returning the computed one on the next calls
+        """
+        key = (name, kwargs["basic_pay"], kwargs.get("total_allowance"))
+        if key not in self.computed:
+            self.computed[key] = compute(**{**kwargs, "pay_rules": self})
+        return self.computed[key]
+
+
+def employee_pay_rules(employee, start_date, end_date):
+    """
+    The pay rules of a single employee, for the calculations made outside of
+    a batch
+    """
+    return PayRuleSet(start_date, end_date).prepare([employee])[employee.id]
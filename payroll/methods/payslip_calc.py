@@ -11,10 +11,8 @@ import operator
 from django.apps import apps
 
 # from attendance.models import Attendance
-from horilla.methods import get_horilla_model_class
 from payroll.methods.deductions import update_compensation_deduction
 from payroll.methods.limits import compute_limit
-from payroll.models import models
 from payroll.models.models import (
     Allowance,
     Contract,
@@ -38,41 +36,6 @@ operator_mapping = {
     "icontains": operator.contains,
     "range": return_none,
 }
-filter_mapping = {
-    "work_type_id": {
-        "filter": lambda employee, allowance, start_date, end_date: {
-            "employee_id": employee,
-            "work_type_id__id": allowance.work_type_id.id,
-            "attendance_date__range": (start_date, end_date),
-            "attendance_validated": True,
-        }
-    },
-    "shift_id": {
-        "filter": lambda employee, allowance, start_date, end_date: {
-            "employee_id": employee,
-            "shift_id__id": allowance.shift_id.id,
-            "attendance_date__range": (start_date, end_date),
-            "attendance_validated": True,
-        }
-    },
-    "overtime": {
-        "filter": lambda employee, allowance, start_date, end_date: {
-            "employee_id": employee,
-            "attendance_date__range": (start_date, end_date),
-            "attendance_overtime_approve": True,
-            "attendance_validated": True,
-        }
-    },
-    "attendance": {
-        "filter": lambda employee, allowance, start_date, end_date: {
-            "employee_id": employee,
-            "attendance_date__range": (start_date, end_date),
-            "attendance_validated": True,
-        }
-    },
-}
-
-
 tets = {
     "net_pay": 35140.905000000006,
     "employee": 1,
@@ -176,6 +139,22 @@ tets = {
 }
 
 
+def _pay_rules(kwargs):
+    """
+    The compiled pay rules of the employee, passed by the payslip computation
+    or compiled for the employee alone
+    """
+    pay_rules = kwargs.get("pay_rules")
+    if pay_rules is None:
+        # pay_rules imports the condition helpers of this module
+        from payroll.methods.pay_rules import employee_pay_rules
+
+        pay_rules = employee_pay_rules(
+            kwargs["employee"], kwargs["start_date"], kwargs["end_date"]
+        )
+    return pay_rules
+
+
 def dynamic_attr(obj, attribute_path):
     """
     Retrieves the value of a nested attribute from a related object dynamically.
@@ -214,6 +193,10 @@ def calculate_gross_pay(*_args, **kwargs):
         A dictionary containing the gross pay as the "gross_pay" key.
 
     """
+    return _pay_rules(kwargs).reuse("gross_pay", kwargs, _gross_pay)
+
+
+def _gross_pay(**kwargs):
     basic_pay = kwargs["basic_pay"]
     total_allowance = kwargs["total_allowance"]
     # basic_pay = compute_salary_on_period(employee, start_date, end_date)["basic_pay"]
@@ -224,7 +207,12 @@ def calculate_gross_pay(*_args, **kwargs):
     )
 
     updated_gross_pay_data = update_compensation_deduction(
-        employee, gross_pay, "gross_pay", start_date, end_date
+        employee,
+        gross_pay,
+        "gross_pay",
+        start_date,
+        end_date,
+        deduction_heads=kwargs["pay_rules"].compensation_deductions("gross_pay"),
     )
     return {
         "gross_pay": updated_gross_pay_data["compensation_amount"],
@@ -246,6 +234,10 @@ def calculate_taxable_gross_pay(*_args, **kwargs):
         A dictionary containing the taxable gross pay as the "taxable_gross_pay" key.
 
     """
+    return _pay_rules(kwargs).reuse("taxable_gross_pay", kwargs, _taxable_gross_pay)
+
+
+def _taxable_gross_pay(**kwargs):
     allowances = kwargs["allowances"]
     gross_pay = calculate_gross_pay(**kwargs)
     gross_pay = gross_pay["gross_pay"]
@@ -274,6 +266,8 @@ def calculate_allowance(**kwargs):
         employee (Employee): The employee object for which to calculate the allowances.
         start_date (datetime.date): The start date of the payroll period.
         end_date (datetime.date): The end date of the payroll period.
+        pay_rules (EmployeePayRules): The compiled pay rules of the employee,
+            compiled for the employee alone when not given.
 
     """
     employee = kwargs["employee"]
@@ -281,69 +275,14 @@ def calculate_allowance(**kwargs):
     end_date = kwargs["end_date"]
     basic_pay = kwargs["basic_pay"]
     day_dict = kwargs["day_dict"]
-    specific_allowances = Allowance.objects.filter(specific_employees=employee)
-    conditional_allowances = Allowance.objects.filter(is_condition_based=True).exclude(
-        exclude_employees=employee
-    )
-    active_employees = Allowance.objects.filter(include_active_employees=True).exclude(
-        exclude_employees=employee
-    )
-
-    allowances = specific_allowances | conditional_allowances | active_employees
+    pay_rules = kwargs["pay_rules"] = _pay_rules(kwargs)
 
-    allowances = (
-        allowances.exclude(one_time_date__lt=start_date)
-        .exclude(one_time_date__gt=end_date)
-        .distinct()
-    )
-
-    employee_allowances = []
     tax_allowances = []
     no_tax_allowances = []
     tax_allowances_amt = []
     no_tax_allowances_amt = []
-    # Append allowances based on condition, or unconditionally to employee
-    for allowance in allowances:
-        if allowance.is_condition_based:
-            conditions = list(
-                allowance.other_conditions.values_list("field", "condition", "value")
-            )
-            condition_field = allowance.field
-            condition_operator = allowance.condition
-            condition_value = allowance.value.lower().replace(" ", "_")
-            conditions.append((condition_field, condition_operator, condition_value))
-            applicable = True
-            for condition in conditions:
-                val = dynamic_attr(employee, condition[0])
-                if val is not None:
-                    operator_func = operator_mapping.get(condition[1])
-                    condition_value = type(val)(condition[2])
-                    if operator_func(val, condition_value):
-                        applicable = applicable * True
-                        continue
-                    else:
-                        applicable = False
-                        break
-                else:
-                    applicable = False
-                    break
-            if applicable:
-                employee_allowances.append(allowance)
-        else:
-            if allowance.based_on in filter_mapping:
-                filter_params = filter_mapping[allowance.based_on]["filter"](
-                    employee, allowance, start_date, end_date
-                )
-                if apps.is_installed("attendance"):
-                    Attendance = get_horilla_model_class(
-                        app_label="attendance", model="attendance"
-                    )
-                    if Attendance.objects.filter(**filter_params):
-                        employee_allowances.append(allowance)
-            else:
-                employee_allowances.append(allowance)
     # Filter and append taxable allowance and not taxable allowance
-    for allowance in employee_allowances:
+    for allowance in pay_rules.allowances:
         if allowance.is_taxable:
             tax_allowances.append(allowance)
         else:
@@ -369,6 +308,7 @@ def calculate_allowance(**kwargs):
                     "total_allowance": None,
                     "basic_pay": basic_pay,
                     "day_dict": day_dict,
+                    "pay_rules": pay_rules,
                 },
             )
             kwargs["amount"] = amount
@@ -394,6 +334,7 @@ def calculate_allowance(**kwargs):
                     "component": allowance,
                     "day_dict": day_dict,
                     "basic_pay": basic_pay,
+                    "pay_rules": pay_rules,
                 }
             )
             kwargs["amount"] = amount
@@ -436,6 +377,7 @@ def calculate_tax_deduction(*_args, **kwargs):
         total_allowance (float): The total amount of allowances.
         basic_pay (float): The basic pay amount.
         day_dict (dict): Dictionary containing working day details.
+        pay_rules (EmployeePayRules): The compiled pay rules of the employee.
 
     Returns:
         dict: A dictionary containing the serialized tax deductions.
@@ -443,18 +385,8 @@ def calculate_tax_deduction(*_args, **kwargs):
     employee = kwargs["employee"]
     start_date = kwargs["start_date"]
     end_date = kwargs["end_date"]
-    specific_deductions = models.Deduction.objects.filter(
-        specific_employees=employee, is_pretax=False, is_tax=True
-    )
-    active_employee_deduction = models.Deduction.objects.filter(
-        include_active_employees=True, is_pretax=False, is_tax=True
-    ).exclude(exclude_employees=employee)
-    deductions = specific_deductions | active_employee_deduction
-    deductions = (
-        deductions.exclude(one_time_date__lt=start_date)
-        .exclude(one_time_date__gt=end_date)
-        .exclude(update_compensation__isnull=False)
-    ).distinct()
+    pay_rules = kwargs["pay_rules"] = _pay_rules(kwargs)
+    deductions = pay_rules.tax_deductions
     deductions_amt = []
     serialized_deductions = []
     for deduction in deductions:
@@ -469,6 +401,7 @@ def calculate_tax_deduction(*_args, **kwargs):
                 "total_allowance": kwargs["total_allowance"],
                 "basic_pay": kwargs["basic_pay"],
                 "day_dict": kwargs["day_dict"],
+                "pay_rules": pay_rules,
             }
         )
         kwargs["amount"] = amount
@@ -501,65 +434,22 @@ def calculate_pre_tax_deduction(*_args, **kwargs):
         A dictionary containing the pre-tax deductions as the "pretax_deductions" key.
 
     """
+    return _pay_rules(kwargs).reuse("pretax_deductions", kwargs, _pre_tax_deduction)
+
+
+def _pre_tax_deduction(**kwargs):
     employee = kwargs["employee"]
     start_date = kwargs["start_date"]
     end_date = kwargs["end_date"]
+    pay_rules = kwargs["pay_rules"]
+    installments = [
+        deduction for deduction in pay_rules.installments if deduction.is_pretax
+    ]
 
-    specific_deductions = models.Deduction.objects.filter(
-        specific_employees=employee, is_pretax=True, is_tax=False
-    )
-    conditional_deduction = models.Deduction.objects.filter(
-        is_condition_based=True, is_pretax=True, is_tax=False
-    ).exclude(exclude_employees=employee)
-    active_employee_deduction = models.Deduction.objects.filter(
-        include_active_employees=True, is_pretax=True, is_tax=False
-    ).exclude(exclude_employees=employee)
-
-    deductions = (
-        specific_deductions | conditional_deduction | active_employee_deduction
-    ).distinct()
-    deductions = (
-        deductions.exclude(one_time_date__lt=start_date)
-        .exclude(one_time_date__gt=end_date)
-        .exclude(update_compensation__isnull=False)
-    )
-    # Installment deductions
-    installments = deductions.filter(is_installment=True).distinct()
-
-    pre_tax_deductions = []
+    pre_tax_deductions = pay_rules.pretax_deductions
     pre_tax_deductions_amt = []
     serialized_deductions = []
 
-    for deduction in deductions:
-        if deduction.is_condition_based:
-            conditions = list(
-                deduction.other_conditions.values_list("field", "condition", "value")
-            )
-            condition_field = deduction.field
-            condition_operator = deduction.condition
-            condition_value = deduction.value.lower().replace(" ", "_")
-            conditions.append((condition_field, condition_operator, condition_value))
-            operator_func = operator_mapping.get(condition_operator)
-            applicable = True
-            for condition in conditions:
-                val = dynamic_attr(employee, condition[0])
-                if val is not None:
-                    operator_func = operator_mapping.get(condition[1])
-                    condition_value = type(val)(condition[2])
-                    if operator_func(val, condition_value):
-                        applicable = applicable * True
-                        continue
-                    else:
-                        applicable = False
-                        break
-                else:
-                    applicable = False
-                    break
-            if applicable:
-                pre_tax_deductions.append(deduction)
-        else:
-            pre_tax_deductions.append(deduction)
-
     for deduction in pre_tax_deductions:
         if deduction.is_fixed:
             kwargs["amount"] = deduction.amount
@@ -577,6 +467,7 @@ def calculate_pre_tax_deduction(*_args, **kwargs):
                     "total_allowance": kwargs["total_allowance"],
                     "basic_pay": kwargs["basic_pay"],
                     "day_dict": kwargs["day_dict"],
+                    "pay_rules": pay_rules,
                 }
             )
             kwargs["amount"] = amount
@@ -615,44 +506,17 @@ def calculate_post_tax_deduction(*_args, **kwargs):
     total_allowance = kwargs["total_allowance"]
     basic_pay = kwargs["basic_pay"]
     day_dict = kwargs["day_dict"]
-    specific_deductions = models.Deduction.objects.filter(
-        specific_employees=employee, is_pretax=False, is_tax=False
-    )
-    conditional_deduction = models.Deduction.objects.filter(
-        is_condition_based=True, is_pretax=False, is_tax=False
-    ).exclude(exclude_employees=employee)
-    active_employee_deduction = models.Deduction.objects.filter(
-        include_active_employees=True, is_pretax=False, is_tax=False
-    ).exclude(exclude_employees=employee)
-    deductions = (
-        specific_deductions | conditional_deduction | active_employee_deduction
-    ).distinct()
-    deductions = (
-        deductions.exclude(one_time_date__lt=start_date)
-        .exclude(one_time_date__gt=end_date)
-        .exclude(update_compensation__isnull=False)
-    )
+    pay_rules = kwargs["pay_rules"] = _pay_rules(kwargs)
     # Installment deductions
-    installments = deductions.filter(is_installment=True).distinct()
+    installments = [
+        deduction for deduction in pay_rules.installments if not deduction.is_pretax
+    ]
 
-    post_tax_deductions = []
+    post_tax_deductions = pay_rules.post_tax_deductions
     post_tax_deductions_amt = []
     serialized_deductions = []
     serialized_net_pay_deductions = []
 
-    for deduction in deductions:
-        if deduction.is_condition_based:
-            condition_field = deduction.field
-            condition_operator = deduction.condition
-            condition_value = deduction.value.lower().replace(" ", "_")
-            employee_value = dynamic_attr(employee, condition_field)
-            operator_func = operator_mapping.get(condition_operator)
-            if employee_value is not None:
-                condition_value = type(employee_value)(condition_value)
-                if operator_func(employee_value, condition_value):
-                    post_tax_deductions.append(deduction)
-        else:
-            post_tax_deductions.append(deduction)
     for deduction in post_tax_deductions:
         if deduction.is_fixed:
             amount = deduction.amount
@@ -673,6 +537,7 @@ def calculate_post_tax_deduction(*_args, **kwargs):
                         "total_allowance": total_allowance,
                         "basic_pay": basic_pay,
                         "day_dict": day_dict,
+                        "pay_rules": pay_rules,
                     }
                 )
                 kwargs["amount"] = amount
@@ -885,18 +750,10 @@ def calculate_based_on_attendance(*_args, **kwargs):
     if not apps.is_installed("attendance"):
         return 0
 
-    Attendance = get_horilla_model_class(app_label="attendance", model="attendance")
-    employee = kwargs["employee"]
-    start_date = kwargs["start_date"]
-    end_date = kwargs["end_date"]
     component = kwargs["component"]
     day_dict = kwargs["day_dict"]
 
-    count = Attendance.objects.filter(
-        employee_id=employee,
-        attendance_date__range=(start_date, end_date),
-        attendance_validated=True,
-    ).count()
+    count = _pay_rules(kwargs).attendance_count(component)
     amount = count * component.per_attendance_fixed_amount
 
     amount = compute_limit(component, amount, day_dict)
@@ -921,20 +778,10 @@ def calculate_based_on_shift(*_args, **kwargs):
     if not apps.is_installed("attendance"):
         return 0
 
-    Attendance = get_horilla_model_class(app_label="attendance", model="attendance")
-    employee = kwargs["employee"]
-    start_date = kwargs["start_date"]
-    end_date = kwargs["end_date"]
     component = kwargs["component"]
     day_dict = kwargs["day_dict"]
 
-    shift_id = component.shift_id.id
-    count = Attendance.objects.filter(
-        employee_id=employee,
-        shift_id=shift_id,
-        attendance_date__range=(start_date, end_date),
-        attendance_validated=True,
-    ).count()
+    count = _pay_rules(kwargs).attendance_count(component)
     amount = count * component.shift_per_attendance_amount
 
     amount = compute_limit(component, amount, day_dict)
@@ -958,19 +805,10 @@ def calculate_based_on_overtime(*_args, **kwargs):
     if not apps.is_installed("attendance"):
         return 0
 
-    Attendance = get_horilla_model_class(app_label="attendance", model="attendance")
-    employee = kwargs["employee"]
-    start_date = kwargs["start_date"]
-    end_date = kwargs["end_date"]
     component = kwargs["component"]
     day_dict = kwargs["day_dict"]
 
-    attendances = Attendance.objects.filter(
-        employee_id=employee,
-        attendance_date__range=(start_date, end_date),
-        attendance_overtime_approve=True,
-    )
-    overtime = sum(attendance.overtime_second for attendance in attendances)
+    overtime = _pay_rules(kwargs).overtime_seconds()
     amount_per_hour = component.amount_per_one_hr
     amount_per_second = amount_per_hour / (60 * 60)
     amount = overtime * amount_per_second
@@ -1000,20 +838,10 @@ def calculate_based_on_work_type(*_args, **kwargs):
     if not apps.is_installed("attendance"):
         return 0
 
-    Attendance = get_horilla_model_class(app_label="attendance", model="attendance")
-    employee = kwargs["employee"]
-    start_date = kwargs["start_date"]
-    end_date = kwargs["end_date"]
     component = kwargs["component"]
     day_dict = kwargs["day_dict"]
 
-    work_type_id = component.work_type_id.id
-    count = Attendance.objects.filter(
-        employee_id=employee,
-        work_type_id=work_type_id,
-        attendance_date__range=(start_date, end_date),
-        attendance_validated=True,
-    ).count()
+    count = _pay_rules(kwargs).attendance_count(component)
     amount = count * component.work_type_per_attendance_amount
 
     amount = compute_limit(component, amount, day_dict)
@@ -0,0 +1,485 @@
+"""
+payslip_distribution.py
+
+This module is used to render the payslip PDFs and mail them to the
+employees in bulk.
+
+The PDFs are rendered by wkhtmltopdf in a pool of worker processes, from
+HTML rendered with one compiled template per layout, and cached on disk in a
+directory per payslip, keyed by its last update and the layout. The PDFs of
+the earlier versions of a payslip are deleted when a new one is rendered.
+Every employee gets one mail with all their payslips, queued on the shared
+mail workers over a single mail backend so the SMTP connection is pooled.
+The progress is recorded on a PayslipDistributionJob, whose payslips not yet
+sent can be sent again by resuming it.
+"""
+
+import hashlib
+import logging
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from itertools import groupby
+from threading import Lock
+
+import pdfkit
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import connections, transaction
+from django.template.loader import get_template, render_to_string
+from django.utils import timezone
+
+from base.backends import ConfiguredEmailBackend
+from base.mail_dispatch import queue_mail
+from base.models import Company
+from employee.models import EmployeeWorkInformation
+from horilla.horilla_settings import HORILLA_DATE_FORMATS
+from payroll.models.models import Payslip, PayslipDistributionJob
+from payroll.models.tax_models import PayrollSettings
+
+logger = logging.getLogger(__name__)
+
+PAYSLIP_TEMPLATE = "payroll/payslip/payslip_pdf.html"
+MAIL_TEMPLATE = "payroll/mail_templates/default.html"
+DEFAULT_DATE_FORMAT = "MMM. D, YYYY"
+PDF_CACHE_DIR = getattr(
+    settings,
+    "PAYSLIP_PDF_CACHE_DIR",
+    os.path.join(settings.MEDIA_ROOT, "payslip_pdf_cache"),
+)
+RENDER_WORKERS = getattr(settings, "PAYSLIP_PDF_WORKERS", min(os.cpu_count() or 1, 4))
+# employees whose PDFs are rendered before their mails are queued
+CHUNK_SIZE = getattr(settings, "PAYSLIP_DISTRIBUTION_CHUNK_SIZE", 50)
+# seconds without progress after which a running job is taken as interrupted
+STALL_TIMEOUT = getattr(settings, "PAYSLIP_DISTRIBUTION_STALL_TIMEOUT", 600)
+PDF_OPTIONS = {
+    "page-size": "A4",
+    "margin-top": "10mm",
+    "margin-bottom": "10mm",
+    "margin-left": "10mm",
+    "margin-right": "10mm",
+    "encoding": "UTF-8",
+    "enable-local-file-access": None,  # Required to load local CSS/images
+}
+
+# the mail workers record the deliveries of the jobs concurrently
+_progress_lock = Lock()
+
+
+def equalize_lists_length(allowances, deductions):
+    """
+    Equalize the lengths of two lists by appending empty dictionaries to the shorter list.
+
+    Args:
+    deductions (list): List of dictionaries representing deductions.
+    allowances (list): List of dictionaries representing allowances.
+
+    Returns:
+    tuple: Tuple containing two lists with equal lengths.
+    """
+    num_deductions = len(deductions)
+    num_allowances = len(allowances)
+
+    while num_deductions < num_allowances:
+        deductions.append({"title": "", "amount": ""})
+        num_deductions += 1
+
+    while num_allowances < num_deductions:
+        allowances.append({"title": "", "amount": ""})
+        num_allowances += 1
+
+    return deductions, allowances
+
+
+def payslip_date_format(employee):
+    """
+    The date format of the company of the employee the payslips are
+    rendered for
+    """
+    info = EmployeeWorkInformation.objects.filter(employee_id=employee).last()
+    if info is None:
+        return DEFAULT_DATE_FORMAT
+    company = Company.objects.filter(company=info.company_id).first()
+    if company and company.date_format:
+        return company.date_format
+    return DEFAULT_DATE_FORMAT
+
+
+def render_pdf(html, path=None):
+    """
+    Render the HTML of a payslip to a PDF with wkhtmltopdf, writing it to
+    the cache path when given. Runs in the render worker processes.
+    """
+    pdf = pdfkit.from_string(html, False, options=PDF_OPTIONS)
+    if path is not None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(pdf)
+        os.replace(temp_path, path)
+    return pdf
+
+
+class PayslipLayout:
+    """
+    What the PDFs rendered for a user share: the compiled template, the
+    company, the currency and the date format
+    """
+
+    def __init__(self, date_format, host, protocol):
+        self.template = get_template(PAYSLIP_TEMPLATE)
+        self.company = Company.objects.filter(hq=True).first()
+        payroll_settings = PayrollSettings.objects.first()
+        self.currency = payroll_settings.currency_symbol if payroll_settings else ""
+        self.date_format = date_format
+        self.host = host
+        self.protocol = protocol
+        self.key = hashlib.sha1(
+            repr(
+                (
+                    PAYSLIP_TEMPLATE,
+                    date_format,
+                    host,
+                    protocol,
+                    getattr(self.company, "pk", None),
+                    self.currency,
+                )
+            ).encode()
+        ).hexdigest()[:12]
+
+    def context(self, payslip):
+        data = dict(payslip.pay_head_data)
+        start_date = datetime.strptime(data["start_date"], "%Y-%m-%d").date()
+        end_date = datetime.strptime(data["end_date"], "%Y-%m-%d").date()
+        date_format = HORILLA_DATE_FORMATS.get(self.date_format)
+        data.update(
+            {
+                "month_start_name": start_date.strftime("%B %d, %Y"),
+                "month_end_name": end_date.strftime("%B %d, %Y"),
+                "formatted_start_date": (
+                    start_date.strftime(date_format) if date_format else None
+                ),
+                "formatted_end_date": (
+                    end_date.strftime(date_format) if date_format else None
+                ),
+                "employee": payslip.employee_id,
+                "payslip": payslip,
+                "json_data": data.copy(),
+                "currency": self.currency,
+                "all_deductions": [],
+                "all_allowances": data["allowances"].copy(),
+                "host": self.host,
+                "protocol": self.protocol,
+                "company": self.company,
+            }
+        )
+
+        # Merge deductions and allowances for display
+        for deduction_list in [
+            data["basic_pay_deductions"],
+            data["gross_pay_deductions"],
+            data["pretax_deductions"],
+            data["post_tax_deductions"],
+            data["tax_deductions"],
+            data["net_deductions"],
+        ]:
+            data["all_deductions"].extend(deduction_list)
+
+        equalize_lists_length(data["allowances"], data["all_deductions"])
+        data["zipped_data"] = zip(data["allowances"], data["all_deductions"])
+        return data
+
+    def render(self, payslip):
+        return self.template.render(self.context(payslip))
+
+    def cache_path(self, payslip):
+        updated = (
+            payslip.updated_at.strftime("%Y%m%d%H%M%S%f") if payslip.updated_at else 0
+        )
+        return os.path.join(PDF_CACHE_DIR, str(payslip.id), f"{updated}-{self.key}.pdf")
+
+    def remove_superseded(self, payslip):
+        """
+        Delete the cached PDFs of the earlier versions of the payslip, for
+        every layout, once its current version is rendered
+        """
+        path = self.cache_path(payslip)
+        directory = os.path.dirname(path)
+        current = os.path.basename(path).split("-")[0]
+        try:
+            names = os.listdir(directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith(".pdf") or name.split("-")[0] == current:
+                continue
+            try:
+                os.remove(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+    def cached_pdf(self, payslip):
+        """
+        The cached PDF of the payslip, None when it is not rendered yet
+        """
+        try:
+            with open(self.cache_path(payslip), "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+
+    def pdf(self, payslip):
+        """
+        The PDF of the payslip, rendered and cached when not cached yet
+        """
+        pdf = self.cached_pdf(payslip)
+        if pdf is None:
+            pdf = render_pdf(self.render(payslip), self.cache_path(payslip))
+            self.remove_superseded(payslip)
+        return pdf
+
+
+def create_distribution_job(request, payslips):
+    """
+    Create the job mailing the payslips, sent from the user of the request
+    """
+    from_email = None
+    try:
+        employee = request.user.employee_get
+        from_email = f"{employee.get_full_name()} <{employee.email}>"
+    except Exception as e:
+        logger.error(e)
+    payslip_ids = list(payslips.values_list("id", flat=True))
+    return PayslipDistributionJob.objects.create(
+        payslip_ids=payslip_ids,
+        total=len(payslip_ids),
+        from_email=from_email,
+        host=request.get_host(),
+        protocol="https" if request.is_secure() else "http",
+        created_by=getattr(request.user, "employee_get", None),
+    )
+
+
+def resumable(job):
+    """
+    Whether the job has payslips left to send and is not running: it failed,
+    completed with failed mails, or stopped making progress, e.g. when the
+    process running it was restarted
+    """
+    if not job.pending_ids():
+        return False
+    if job.status in ["failed", "completed"]:
+        return True
+    idle = (timezone.now() - job.updated_at).total_seconds()
+    return idle > STALL_TIMEOUT
+
+
+def record_delivery(job_id, payslip_ids, _email=None, error=None):
+    """
+    Record the payslips of a mail as sent, or as failed with the error, and
+    complete the job once all its payslips are
+    """
+    with _progress_lock, transaction.atomic():
+        job = PayslipDistributionJob.objects.select_for_update().get(id=job_id)
+        if error is None:
+            job.sent_ids += payslip_ids
+            job.sent += len(payslip_ids)
+            Payslip.objects.entire().filter(id__in=payslip_ids).update(
+                sent_to_employee=True
+            )
+        else:
+            job.failed += len(payslip_ids)
+            job.errors.append({"payslip_ids": payslip_ids, "error": str(error)})
+        if job.status == "sending" and job.sent + job.failed >= job.total:
+            job.status = "completed"
+            job.finished_at = timezone.now()
+        job.save(
+            update_fields=[
+                "sent_ids",
+                "sent",
+                "failed",
+                "errors",
+                "status",
+                "finished_at",
+                "updated_at",
+            ]
+        )
+
+
+def _mark_sending(job_id):
+    with _progress_lock, transaction.atomic():
+        job = PayslipDistributionJob.objects.select_for_update().get(id=job_id)
+        job.status = "sending"
+        if job.sent + job.failed >= job.total:
+            job.status = "completed"
+            job.finished_at = timezone.now()
+        job.save(update_fields=["status", "finished_at", "updated_at"])
+
+
+def _chunks(items, size):
+    for index in range(0, len(items), size):
+        yield items[index : index + size]
+
+
+def distribute_payslips(job, request=None, workers=None, chunk_size=None):
+    """
+    Mail the payslips of the job not sent yet, one mail per employee.
+
+    Args:
+        job (PayslipDistributionJob): job recording the progress
+        request (HttpRequest): request the mail template is rendered with
+        workers (int): number of render processes, 1 renders in this thread
+        chunk_size (int): employees whose PDFs are rendered at once
+
+    Returns:
+        int: the number of payslips queued
+    """
+    workers = workers or RENDER_WORKERS
+    chunk_size = chunk_size or CHUNK_SIZE
+    pending = job.pending_ids()
+    payslips = []
+    job.status = "running"
+    job.failed = 0
+    job.errors = []
+    job.save(update_fields=["status", "failed", "errors", "updated_at"])
+
+    try:
+        payslips = list(
+            Payslip.objects.entire()
+            .filter(id__in=pending)
+            .select_related("employee_id")
+            .order_by("employee_id", "id")
+        )
+        missing = set(pending) - {payslip.id for payslip in payslips}
+        if missing:
+            record_delivery(job.id, sorted(missing), error="Payslip not found")
+        groups = [
+            list(employee_payslips)
+            for _employee_id, employee_payslips in groupby(
+                payslips, key=lambda payslip: payslip.employee_id_id
+            )
+        ]
+        layout = PayslipLayout(
+            payslip_date_format(job.created_by), job.host, job.protocol
+        )
+        backend = ConfiguredEmailBackend()
+        from_email = job.from_email or backend.dynamic_from_email_with_display_name
+
+        def queue_group(employee_payslips, renders):
+            ids = [payslip.id for payslip in employee_payslips]
+            try:
+                attachments = []
+                for payslip in employee_payslips:
+                    if payslip.id in renders:
+                        renders[payslip.id].result()
+                    attachments.append(
+                        (
+                            f"{payslip.get_payslip_title()}.pdf",
+                            layout.cached_pdf(payslip),
+                            "application/pdf",
+                        )
+                    )
+                employee = employee_payslips[0].employee_id
+                html_message = render_to_string(
+                    MAIL_TEMPLATE,
+                    {
+                        "record": {
+                            "employee_id": employee,
+                            "instances": employee_payslips,
+                            "count": len(employee_payslips),
+                        },
+                        "host": job.host,
+                        "protocol": job.protocol,
+                    },
+                    request=request,
+                )
+                email = EmailMessage(
+                    f"Hello, {employee_payslips[0].get_name()} Your Payslips is Ready!",
+                    html_message,
+                    from_email,
+                    [employee.get_mail()],
+                    reply_to=[from_email],
+                    connection=backend,
+                )
+                email.attachments = attachments
+                email.content_subtype = "html"
+            except Exception as e:
+                logger.exception("Payslip mail of %s failed", ids)
+                record_delivery(job.id, ids, error=e)
+                return
+            queue_mail(
+                email,
+                on_sent=partial(record_delivery, job.id, ids),
+                on_failed=partial(record_delivery, job.id, ids, error="Mail not sent"),
+            )
+
+        def submit_chunk(chunk, submit):
+            renders = {}
+            for payslip in (payslip for group in chunk for payslip in group):
+                path = layout.cache_path(payslip)
+                if os.path.exists(path):
+                    job.cached += 1
+                    continue
+                try:
+                    html = layout.render(payslip)
+                except Exception as e:
+                    renders[payslip.id] = _future(error=e)
+                    continue
+                renders[payslip.id] = submit(render_pdf, html, path)
+                layout.remove_superseded(payslip)
+                job.rendered += 1
+            return chunk, renders
+
+        def drain(chunk, renders):
+            for employee_payslips in chunk:
+                queue_group(employee_payslips, renders)
+            job.save(update_fields=["rendered", "cached", "updated_at"])
+
+        chunks = list(_chunks(groups, chunk_size))
+        if workers <= 1 or len(payslips) <= 1:
+            for chunk in chunks:
+                drain(*submit_chunk(chunk, _run_now))
+        else:
+            # the parent connection must not be shared with the forked workers
+            connections.close_all()
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                # the next chunk renders while the mails of the previous one
+                # are built
+                in_flight = deque()
+                for chunk in chunks:
+                    in_flight.append(submit_chunk(chunk, executor.submit))
+                    if len(in_flight) > 1:
+                        drain(*in_flight.popleft())
+                while in_flight:
+                    drain(*in_flight.popleft())
+        _mark_sending(job.id)
+    except Exception as e:
+        logger.exception("Payslip distribution %s failed", job.id)
+        with _progress_lock:
+            job.refresh_from_db()
+            job.status = "failed"
+            job.errors.append({"payslip_ids": None, "error": str(e)})
+            job.finished_at = timezone.now()
+            job.save(update_fields=["status", "errors", "finished_at", "updated_at"])
+    return len(payslips)
+
+
+def _future(result=None, error=None):
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+
+def _run_now(func, *args):
+    """
+    Run a render in this thread, returning its outcome as a future
+    """
+    try:
+        return _future(func(*args))
+    except Exception as e:
+        return _future(error=e)
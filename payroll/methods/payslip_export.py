@@ -0,0 +1,453 @@
+"""
+payslip_export.py
+
+This module is used to write the payslip exports row by row.
+
+The payslips are read with .values() through a server side cursor, so only
+the exported columns, and the pay head data of the detailed report, of one
+chunk of payslips are held at a time. The rows go to an xlsxwriter workbook
+in constant memory mode, which flushes each row to a temporary file once the
+next one is started, or to a CSV stream sent to the client while it is being
+written. The exports of many payslips are prepared by a PayslipExportJob
+outside of the request and downloaded from the disk once written.
+"""
+
+import csv
+import logging
+import os
+from datetime import date, timedelta
+
+import xlsxwriter
+from django.conf import settings
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+from horilla.horilla_settings import HORILLA_DATE_FORMATS
+from payroll.forms.component_forms import excel_columns
+from payroll.models.models import Allowance, Deduction, Payslip, PayslipExportJob
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = getattr(
+    settings,
+    "PAYSLIP_EXPORT_DIR",
+    os.path.join(settings.MEDIA_ROOT, "payslip_exports"),
+)
+# payslips read from the cursor at a time
+CHUNK_SIZE = getattr(settings, "PAYSLIP_EXPORT_CHUNK_SIZE", 2000)
+# exports of more payslips are prepared in the background instead of the request
+ASYNC_THRESHOLD = getattr(settings, "PAYSLIP_EXPORT_ASYNC_THRESHOLD", 20000)
+# hours a prepared export can be downloaded before its file is deleted
+EXPIRY_HOURS = getattr(settings, "PAYSLIP_EXPORT_EXPIRY_HOURS", 24)
+CONTENT_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv",
+}
+STATUS_LABELS = dict(Payslip.status_choices)
+EMPLOYEE_NAME = [
+    "employee_id__employee_first_name",
+    "employee_id__employee_last_name",
+    "employee_id__badge_id",
+]
+DEDUCTION_HEADS = [
+    "basic_pay_deductions",
+    "gross_pay_deductions",
+    "pretax_deductions",
+    "post_tax_deductions",
+    "tax_deductions",
+    "net_deductions",
+]
+ALLOWANCE_TOTALS = ["Other Allowances", "Total Allowances"]
+DEDUCTION_TOTALS = ["Federal Tax", "Other Deductions", "Total Deductions"]
+# the base columns summed in the totals row of the report
+TOTALLED_COLUMNS = ["gross_pay", "net_pay"]
+
+
+def _employee_name(first_name, last_name, badge_id):
+    """
+    The employee as Employee.__str__ shows them
+    """
+    badge_id = f"({badge_id})" if badge_id is not None else ""
+    return f"{first_name} {last_name if last_name is not None else ''} {badge_id}"
+
+
+def _amount(value):
+    return value if value is not None else 0
+
+
+class PayslipExport:
+    """
+    The header and the rows of a payslip export, read from the database one
+    chunk at a time.
+
+    The detailed export adds a column for every allowance and deduction given
+    to all the active employees, the other and total amounts, and a totals
+    row at the end.
+    """
+
+    def __init__(self, payslips, selected_fields, date_format=None, detailed=False):
+        # a queryset, or the ids of the payslips in the order they are written
+        self.payslips = payslips
+        self.detailed = detailed
+        self.date_format = HORILLA_DATE_FORMATS.get(date_format)
+        self.columns = [
+            (field, str(name))
+            for field, name in excel_columns
+            if field in selected_fields
+        ]
+        self.allowances = []
+        self.deductions = []
+        if detailed:
+            self.allowances = list(
+                Allowance.objects.filter(
+                    one_time_date__isnull=True, include_active_employees=True
+                ).values_list("title", flat=True)
+            )
+            self.deductions = list(
+                Deduction.objects.filter(
+                    one_time_date__isnull=True,
+                    include_active_employees=True,
+                    update_compensation__isnull=True,
+                ).values_list("title", flat=True)
+            )
+        self.sections = [
+            (_("Employee Details"), [name for _field, name in self.columns]),
+        ]
+        if detailed:
+            self.sections += [
+                (_("Allowances"), self.allowances + ALLOWANCE_TOTALS),
+                (_("Deductions"), self.deductions + DEDUCTION_TOTALS),
+            ]
+        self.header = [name for _title, names in self.sections for name in names]
+        self.titles = set(self.header)
+        self.totals = [0] * len(self.header)
+        self.totalled = {
+            index
+            for index, (field, _name) in enumerate(self.columns)
+            if field in TOTALLED_COLUMNS
+        }
+
+    def lookups(self):
+        lookups = []
+        for field, _name in self.columns:
+            if field == "employee_id":
+                lookups += EMPLOYEE_NAME
+            else:
+                lookups.append(field)
+        if self.detailed:
+            lookups.append("pay_head_data")
+        return lookups
+
+    def format(self, field, value):
+        if value is None:
+            return ""
+        if field == "employee_id":
+            return _employee_name(*value)
+        if field == "status":
+            return str(STATUS_LABELS.get(value, ""))
+        if isinstance(value, date) and self.date_format:
+            return value.strftime(self.date_format)
+        return str(value)
+
+    def values(self):
+        lookups = self.lookups()
+        if not isinstance(self.payslips, list):
+            yield from self.payslips.values(*lookups).iterator(chunk_size=CHUNK_SIZE)
+            return
+        for start in range(0, len(self.payslips), CHUNK_SIZE):
+            ids = self.payslips[start : start + CHUNK_SIZE]
+            chunk = {
+                payslip.pop("id"): payslip
+                for payslip in Payslip.objects.filter(id__in=ids).values("id", *lookups)
+            }
+            for payslip_id in ids:
+                if payslip_id in chunk:
+                    yield chunk[payslip_id]
+
+    def rows(self):
+        """
+        Yield the row of every payslip, adding its amounts to the totals
+        """
+        for payslip in self.values():
+            row = []
+            for field, _name in self.columns:
+                if field == "employee_id":
+                    value = tuple(payslip[lookup] for lookup in EMPLOYEE_NAME)
+                else:
+                    value = payslip[field]
+                row.append(self.format(field, value))
+            if self.detailed:
+                row = self.detailed_row(row, payslip)
+            yield row
+
+    def detailed_row(self, row, payslip):
+        pay_head = payslip["pay_head_data"]
+        allowances = pay_head.get("allowances") or []
+        deductions = [
+            item
+            for head in DEDUCTION_HEADS
+            for item in pay_head.get(head) or []
+            if "deduction_id" in item
+        ]
+        amounts = {}
+        totals = dict.fromkeys(ALLOWANCE_TOTALS + DEDUCTION_TOTALS, 0)
+        for kind, items in [("Allowances", allowances), ("Deductions", deductions)]:
+            for item in items:
+                title = str(item["title"])
+                if title in self.titles:
+                    amounts[title] = float(_amount(item["amount"]))
+                else:
+                    totals[f"Other {kind}"] += _amount(item["amount"])
+                totals[f"Total {kind}"] += _amount(item["amount"])
+        totals["Federal Tax"] = pay_head["federal_tax"]
+
+        row += [amounts.get(title, "") for title in self.allowances]
+        row += [totals[title] for title in ALLOWANCE_TOTALS]
+        row += [amounts.get(title, "") for title in self.deductions]
+        row += [totals[title] for title in DEDUCTION_TOTALS]
+
+        for index, value in enumerate(row):
+            if index < len(self.columns) and index not in self.totalled:
+                continue
+            try:
+                self.totals[index] += float(value)
+            except (TypeError, ValueError):
+                pass
+        return row
+
+    def totals_row(self):
+        """
+        The totals of the amounts written, after the rows were read
+        """
+        base_columns = len(self.columns)
+        row = []
+        for index, total in enumerate(self.totals):
+            if index < base_columns and index not in self.totalled:
+                total = "Total" if self.columns[index][0] == "employee_id" else "-"
+            row.append(total)
+        return row
+
+
+def write_workbook(export, target, on_progress=None):
+    """
+    Write the export to an xlsx file in constant memory mode, calling
+    on_progress with the count of rows written after every chunk
+    """
+    workbook = xlsxwriter.Workbook(
+        target,
+        {
+            "constant_memory": True,
+            "strings_to_formulas": False,
+            "strings_to_urls": False,
+        },
+    )
+    worksheet = workbook.add_worksheet("Payslips")
+    border = {"border": 1}
+    widths = [len(str(name)) for name in export.header]
+
+    if export.detailed:
+        # in constant memory mode a row can't be written to once the next one
+        # is started, so the section titles are all written before the header
+        colors = ["#0000FF", "#008000", "#FF0000"]
+        sections = []
+        column = 0
+        for (title, names), color in zip(export.sections, colors):
+            cell_format = workbook.add_format(
+                {"bold": True, "font_color": color, "align": "center", **border}
+            )
+            sections.append((column, title, names, cell_format))
+            column += len(names)
+        worksheet.set_row(0, 25)
+        for column, title, names, cell_format in sections:
+            last = column + len(names) - 1
+            if last > column:
+                worksheet.merge_range(0, column, 0, last, str(title), cell_format)
+            elif names:
+                worksheet.write(0, column, str(title), cell_format)
+        worksheet.set_row(1, 20)
+        for column, title, names, cell_format in sections:
+            worksheet.write_row(1, column, names, cell_format)
+        row_number = 2
+        cell_format = workbook.add_format(border)
+        bold_format = workbook.add_format({"bold": True, **border})
+        allowance_total = len(export.columns) + len(export.sections[1][1]) - 1
+        bold_columns = {0, allowance_total, len(export.header) - 1}
+    else:
+        header_format = workbook.add_format({"bold": True, "align": "center"})
+        worksheet.write_row(0, 0, export.header, header_format)
+        row_number = 1
+        cell_format = workbook.add_format({"align": "center"})
+        bold_format = cell_format
+        bold_columns = set()
+
+    written = 0
+    for row in export.rows():
+        for column, value in enumerate(row):
+            worksheet.write(
+                row_number,
+                column,
+                value,
+                bold_format if column in bold_columns else cell_format,
+            )
+            widths[column] = max(widths[column], len(str(value)))
+        row_number += 1
+        written += 1
+        if on_progress and not written % CHUNK_SIZE:
+            on_progress(written)
+
+    if export.detailed:
+        totals_format = workbook.add_format(
+            {"bold": True, "font_color": "#800080", "align": "right", **border}
+        )
+        worksheet.set_row(row_number, 25)
+        worksheet.write_row(row_number, 0, export.totals_row(), totals_format)
+        for column, width in enumerate(widths):
+            worksheet.set_column(column, column, width + 2)
+        worksheet.freeze_panes(2, 1)
+    else:
+        worksheet.set_column(0, len(widths) - 1, 20)
+    workbook.close()
+    if on_progress:
+        on_progress(written)
+    return written
+
+
+class _Echo:
+    """
+    A file-like object returning what is written to it, for csv.writer
+    """
+
+    def write(self, value):
+        return value
+
+
+def csv_rows(export):
+    """
+    Yield the lines of the export as CSV, for a StreamingHttpResponse
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(export.header)
+    for row in export.rows():
+        yield writer.writerow(row)
+    if export.detailed:
+        yield writer.writerow(export.totals_row())
+
+
+def write_csv(export, target, on_progress=None):
+    """
+    Write the export to a CSV file, calling on_progress with the count of
+    rows written after every chunk
+    """
+    written = 0
+    with open(target, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(export.header)
+        for row in export.rows():
+            writer.writerow(row)
+            written += 1
+            if on_progress and not written % CHUNK_SIZE:
+                on_progress(written)
+        if export.detailed:
+            writer.writerow(export.totals_row())
+    if on_progress:
+        on_progress(written)
+    return written
+
+
+WRITERS = {"xlsx": write_workbook, "csv": write_csv}
+
+
+def export_path(job):
+    return os.path.join(EXPORT_DIR, f"{job.id}.{job.file_format}")
+
+
+def can_access_export(job, user):
+    """
+    Whether the user can follow and download the export job: its creator,
+    or a superuser
+    """
+    employee = getattr(user, "employee_get", None)
+    return user.is_superuser or (
+        job.created_by_id is not None
+        and job.created_by_id == getattr(employee, "id", None)
+    )
+
+
+def clear_expired_exports():
+    """
+    Delete the files of the exports finished more than EXPIRY_HOURS ago
+    """
+    expired = list(
+        PayslipExportJob.objects.filter(
+            status="completed",
+            finished_at__lt=timezone.now() - timedelta(hours=EXPIRY_HOURS),
+        )
+    )
+    for job in expired:
+        try:
+            os.remove(export_path(job))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.error(e)
+    PayslipExportJob.objects.filter(id__in=[job.id for job in expired]).update(
+        status="expired"
+    )
+
+
+def create_export_job(
+    request, payslips, selected_fields, file_name, file_format="xlsx", detailed=False
+):
+    """
+    Create the job preparing the export of the payslips for the user of the
+    request
+    """
+    clear_expired_exports()
+    employee = getattr(request.user, "employee_get", None)
+    payslip_ids = list(payslips.values_list("id", flat=True))
+    return PayslipExportJob.objects.create(
+        payslip_ids=payslip_ids,
+        selected_fields=list(selected_fields),
+        detailed=detailed,
+        file_format=file_format,
+        file_name=file_name,
+        date_format=employee.get_date_format() if employee else None,
+        total=len(payslip_ids),
+        created_by=employee,
+    )
+
+
+def prepare_export(job):
+    """
+    Write the export of the job to the export directory
+    """
+    job.status = "running"
+    job.save(update_fields=["status"])
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    export = PayslipExport(
+        job.payslip_ids,
+        job.selected_fields,
+        date_format=job.date_format,
+        detailed=job.detailed,
+    )
+    path = export_path(job)
+    temporary_path = f"{path}.tmp"
+
+    def on_progress(written):
+        PayslipExportJob.objects.filter(id=job.id).update(written=written)
+
+    try:
+        written = WRITERS[job.file_format](export, temporary_path, on_progress)
+        os.replace(temporary_path, path)
+    except Exception as e:
+        logger.error(e)
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        job.status = "failed"
+        job.error = str(e)
+    else:
+        job.status = "completed"
+        job.written = written
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "written", "error", "finished_at"])
+    return job
@@ -0,0 +1,307 @@
+"""
+payslip_generation.py
+
+This module is used to generate the payslips of many employees at once.
+
+The employees are split in chunks that are computed in a pool of worker
+processes, each with its own database connection, and the computed payslips
+are written back with bulk queries. The progress and the timing of each chunk
+are recorded on a PayslipGenerationJob.
+"""
+
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from django.apps import apps
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from base.horilla_company_manager import selected_company_id
+from payroll.methods.methods import (
+    calculate_employer_contribution,
+    compute_salary_on_period_batch,
+)
+from payroll.methods.pay_rules import PayRuleSet
+from payroll.models.models import Contract, Payslip
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = getattr(settings, "PAYSLIP_GENERATION_CHUNK_SIZE", 50)
+WORKERS = getattr(settings, "PAYSLIP_GENERATION_WORKERS", min(os.cpu_count() or 1, 4))
+PAYSLIP_FIELDS = [
+    "group_name",
+    "status",
+    "contract_wage",
+    "basic_pay",
+    "gross_pay",
+    "deduction",
+    "net_pay",
+    "pay_head_data",
+    "modified_by",
+    "updated_at",
+]
+
+
+def _init_worker():
+    """
+    Set up django in the worker process and drop the database connections
+    inherited from the parent, so every worker opens its own
+    """
+    if not apps.ready:
+        import django
+
+        django.setup()
+    connections.close_all()
+
+
+def compute_chunk(employee_ids, start_date, end_date, company_id=None):
+    """
+    Compute the payslips of a chunk of employees.
+
+    Employees whose contract starts within the period are paid from the
+    contract start date. The pay components are compiled once for each of
+    these periods and applied to all its employees.
+
+    Returns:
+        tuple: the computed payslip rows, the (employee id, error) pairs of the
+        employees that failed and the seconds spent
+    """
+    from employee.models import Employee
+    from payroll.views.component_views import payroll_calculation
+
+    started = time.monotonic()
+    token = selected_company_id.set(company_id)
+    rows = []
+    errors = []
+    try:
+        employees = Employee.objects.entire().filter(id__in=employee_ids)
+        contracts = {}
+        for contract in Contract.objects.filter(
+            employee_id__in=employee_ids, contract_status="active"
+        ).order_by("id"):
+            contracts.setdefault(contract.employee_id_id, contract)
+
+        periods = defaultdict(list)
+        for employee in employees:
+            contract = contracts.get(employee.id)
+            if contract is None or end_date < contract.contract_start_date:
+                errors.append((employee.id, "No active contract on the period"))
+                continue
+            periods[max(start_date, contract.contract_start_date)].append(employee)
+
+        for period_start, period_employees in periods.items():
+            salaries = compute_salary_on_period_batch(
+                period_employees, period_start, end_date
+            )
+            pay_rules = PayRuleSet(period_start, end_date).prepare(period_employees)
+            for employee in period_employees:
+                try:
+                    payslip = payroll_calculation(
+                        employee,
+                        period_start,
+                        end_date,
+                        basic_pay_details=salaries[employee.id],
+                        pay_rules=pay_rules[employee.id],
+                    )
+                    data = {
+                        "employee_id": employee.id,
+                        "start_date": payslip["start_date"],
+                        "end_date": payslip["end_date"],
+                        "contract_wage": payslip["contract_wage"],
+                        "basic_pay": payslip["basic_pay"],
+                        "gross_pay": payslip["gross_pay"],
+                        "deduction": payslip["total_deductions"],
+                        "net_pay": payslip["net_pay"],
+                        "pay_data": json.loads(payslip["json_data"]),
+                        "installments": [
+                            installment.id for installment in payslip["installments"]
+                        ],
+                    }
+                    calculate_employer_contribution(data)
+                    rows.append(data)
+                except Exception as e:
+                    logger.exception("Payslip computation failed for %s", employee)
+                    errors.append((employee.id, str(e)))
+    finally:
+        selected_company_id.reset(token)
+        close_old_connections()
+    return rows, errors, time.monotonic() - started
+
+
+def write_payslips(rows, group_name=None, status="draft", user=None):
+    """
+    Save the computed payslip rows. Payslips already generated for the
+    employee and period are updated, the others are created, with one query
+    per operation.
+
+    Returns:
+        list: the saved Payslip instances
+    """
+    if not rows:
+        return []
+    existing = {
+        (payslip.employee_id_id, payslip.start_date, payslip.end_date): payslip
+        for payslip in Payslip.objects.entire().filter(
+            employee_id__in=[row["employee_id"] for row in rows],
+            start_date__in={row["start_date"] for row in rows},
+            end_date__in={row["end_date"] for row in rows},
+        )
+    }
+    to_create = []
+    to_update = []
+    instances = []
+    for row in rows:
+        key = (row["employee_id"], row["start_date"], row["end_date"])
+        instance = existing.get(key)
+        if instance is None:
+            instance = Payslip(
+                employee_id_id=row["employee_id"],
+                start_date=row["start_date"],
+                end_date=row["end_date"],
+                created_by=user,
+            )
+            to_create.append(instance)
+        else:
+            to_update.append(instance)
+        instance.group_name = group_name
+        instance.status = status
+        instance.contract_wage = round(row["contract_wage"], 2)
+        instance.basic_pay = round(row["basic_pay"], 2)
+        instance.gross_pay = round(row["gross_pay"], 2)
+        instance.deduction = round(row["deduction"], 2)
+        instance.net_pay = round(row["net_pay"], 2)
+        instance.pay_head_data = row["pay_data"]
+        instance.modified_by = user
+        # bulk_update does not set the auto_now fields
+        instance.updated_at = timezone.now()
+        instances.append((instance, row["installments"]))
+
+    Installment = Payslip.installment_ids.through
+    with transaction.atomic():
+        Payslip.objects.bulk_create(to_create)
+        Payslip.objects.bulk_update(to_update, PAYSLIP_FIELDS)
+        Installment.objects.filter(payslip_id__in=[p.id for p in to_update]).delete()
+        Installment.objects.bulk_create(
+            [
+                Installment(payslip_id=instance.id, deduction_id=deduction_id)
+                for instance, installments in instances
+                for deduction_id in installments
+            ],
+            ignore_conflicts=True,
+        )
+    return [instance for instance, _installments in instances]
+
+
+def _chunks(items, size):
+    for index in range(0, len(items), size):
+        yield items[index : index + size]
+
+
+def generate_payslips(
+    job,
+    employee_ids,
+    company_id=None,
+    skip_existing=False,
+    on_saved=None,
+    workers=None,
+    chunk_size=None,
+):
+    """
+    Generate the payslips of the employees for the period of the job.
+
+    Args:
+        job (PayslipGenerationJob): job recording the progress
+        employee_ids (list): ids of the employees
+        company_id (int): selected company the computations are scoped to
+        skip_existing (bool): leave the employees that already have a payslip
+            for the period out
+        on_saved (callable): called with the saved Payslip instances of every
+            chunk
+        workers (int): number of worker processes, 1 computes in this process
+
+    Returns:
+        int: the number of saved payslips
+    """
+    workers = workers or WORKERS
+    chunk_size = chunk_size or CHUNK_SIZE
+    employee_ids = list(dict.fromkeys(employee_ids))
+    if skip_existing:
+        generated = set(
+            Payslip.objects.entire()
+            .filter(
+                employee_id__in=employee_ids,
+                start_date=job.start_date,
+                end_date=job.end_date,
+            )
+            .values_list("employee_id", flat=True)
+        )
+        employee_ids = [
+            employee_id for employee_id in employee_ids if employee_id not in generated
+        ]
+    chunks = list(_chunks(employee_ids, chunk_size))
+    job.total = len(employee_ids)
+    job.status = "running"
+    job.save()
+
+    saved = 0
+    user = getattr(job.created_by, "employee_user_id", None)
+
+    def save_chunk(result, chunk_started):
+        nonlocal saved
+        rows, errors, compute_seconds = result
+        write_started = time.monotonic()
+        instances = write_payslips(rows, job.group_name, user=user)
+        if on_saved is not None:
+            on_saved(instances)
+        saved += len(instances)
+        job.processed += len(instances)
+        job.failed += len(errors)
+        job.errors += [
+            {"employee_id": employee_id, "error": error}
+            for employee_id, error in errors
+        ]
+        job.chunk_timings.append(
+            {
+                "employees": len(rows) + len(errors),
+                "compute": round(compute_seconds, 3),
+                "write": round(time.monotonic() - write_started, 3),
+                "elapsed": round(time.monotonic() - chunk_started, 3),
+            }
+        )
+        job.save(update_fields=["processed", "failed", "errors", "chunk_timings"])
+
+    started = time.monotonic()
+    try:
+        if workers <= 1 or len(chunks) <= 1:
+            for chunk in chunks:
+                save_chunk(
+                    compute_chunk(chunk, job.start_date, job.end_date, company_id),
+                    started,
+                )
+        else:
+            # the parent connection must not be shared with the forked workers
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=min(workers, len(chunks)), initializer=_init_worker
+            ) as executor:
+                futures = [
+                    executor.submit(
+                        compute_chunk, chunk, job.start_date, job.end_date, company_id
+                    )
+                    for chunk in chunks
+                ]
+                for future in as_completed(futures):
+                    save_chunk(future.result(), started)
+        job.status = "completed"
+    except Exception as e:
+        logger.exception("Payslip generation %s failed", job.id)
+        job.status = "failed"
+        job.errors.append({"employee_id": None, "error": str(e)})
+    job.finished_at = timezone.now()
+    job.save(update_fields=["status", "errors", "finished_at"])
+    return saved
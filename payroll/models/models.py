@@ -1370,6 +1370,8 @@ class Payslip(HorillaModel):
         max_length=20, null=True, default="draft", choices=status_choices
     )
     sent_to_employee = models.BooleanField(null=True, default=False)
+    # keys the rendered PDFs cached on disk
+    updated_at = models.DateTimeField(auto_now=True, null=True, blank=True)
     objects = HorillaCompanyManager("employee_id__employee_work_info__company_id")
     installment_ids = models.ManyToManyField(Deduction, editable=False)
     history = HorillaAuditLog(
@@ -1922,3 +1924,184 @@ class PayslipAutoGenerate(models.Model):
 
     def __str__(self) -> str:
         return f"{self.generate_day} | {self.company_id} "
+
+
+class PayslipGenerationJob(models.Model):
+    """
+    Progress of a bulk payslip generation run
+    """
+
+    status_choices = [
+        ("queued", _("Queued")),
+        ("running", _("Running")),
+        ("completed", _("Completed")),
+        ("failed", _("Failed")),
+    ]
+    group_name = models.CharField(
+        max_length=50, null=True, blank=True, verbose_name=_("Batch name")
+    )
+    start_date = models.DateField()
+    end_date = models.DateField()
+    status = models.CharField(max_length=20, default="queued", choices=status_choices)
+    total = models.IntegerField(default=0)
+    processed = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    # seconds spent computing and saving each chunk of employees
+    chunk_timings = models.JSONField(default=list)
+    errors = models.JSONField(default=list)
+    created_by = models.ForeignKey(
+        Employee, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def progress(self):
+        """
+        Percentage of the employees processed
+        """
+        if not self.total:
+            return 100 if self.status == "completed" else 0
+        return round((self.processed + self.failed) * 100 / self.total)
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "group_name": self.group_name,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "failed": self.failed,
+            "progress": self.progress(),
+            "chunk_timings": self.chunk_timings,
+            "errors": self.errors,
+            "finished_at": self.finished_at,
+        }
+
+    def __str__(self) -> str:
+        return f"{self.group_name or self.id} | {self.start_date} - {self.end_date}"
+
+
+class PayslipDistributionJob(models.Model):
+    """
+    Progress of a bulk payslip mailing run. The payslips not sent yet can be
+    sent again by resuming the job.
+    """
+
+    status_choices = [
+        ("queued", _("Queued")),
+        ("running", _("Rendering")),
+        ("sending", _("Sending")),
+        ("completed", _("Completed")),
+        ("failed", _("Failed")),
+    ]
+    payslip_ids = models.JSONField(default=list)
+    sent_ids = models.JSONField(default=list)
+    status = models.CharField(max_length=20, default="queued", choices=status_choices)
+    total = models.IntegerField(default=0)
+    rendered = models.IntegerField(default=0)
+    # PDFs taken from the disk cache instead of being rendered
+    cached = models.IntegerField(default=0)
+    sent = models.IntegerField(default=0)
+    failed = models.IntegerField(default=0)
+    errors = models.JSONField(default=list)
+    from_email = models.CharField(max_length=255, null=True, blank=True)
+    host = models.CharField(max_length=255, null=True, blank=True)
+    protocol = models.CharField(max_length=10, default="http")
+    created_by = models.ForeignKey(
+        Employee, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def progress(self):
+        """
+        Percentage of the payslips sent or failed
+        """
+        if not self.total:
+            return 100 if self.status == "completed" else 0
+        return round((self.sent + self.failed) * 100 / self.total)
+
+    def pending_ids(self):
+        """
+        The payslips of the job not sent yet
+        """
+        sent = set(self.sent_ids)
+        return [payslip_id for payslip_id in self.payslip_ids if payslip_id not in sent]
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "total": self.total,
+            "rendered": self.rendered,
+            "cached": self.cached,
+            "sent": self.sent,
+            "failed": self.failed,
+            "progress": self.progress(),
+            "errors": self.errors,
+            "finished_at": self.finished_at,
+        }
+
+    def __str__(self) -> str:
+        return f"{self.id} | {self.sent} / {self.total}"
+
+
+class PayslipExportJob(models.Model):
+    """
+    Progress of a payslip export prepared outside of the request, downloaded
+    once written
+    """
+
+    status_choices = [
+        ("queued", _("Queued")),
+        ("running", _("Running")),
+        ("completed", _("Completed")),
+        ("failed", _("Failed")),
+        ("expired", _("Expired")),
+    ]
+    format_choices = [
+        ("xlsx", _("Excel")),
+        ("csv", _("CSV")),
+    ]
+    payslip_ids = models.JSONField(default=list)
+    selected_fields = models.JSONField(default=list)
+    # with the allowance and deduction columns and the totals of the report
+    detailed = models.BooleanField(default=False)
+    file_format = models.CharField(
+        max_length=10, default="xlsx", choices=format_choices
+    )
+    file_name = models.CharField(max_length=255)
+    date_format = models.CharField(max_length=50, null=True, blank=True)
+    status = models.CharField(max_length=20, default="queued", choices=status_choices)
+    total = models.IntegerField(default=0)
+    written = models.IntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        Employee, on_delete=models.SET_NULL, null=True, blank=True
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def progress(self):
+        """
+        Percentage of the payslips written
+        """
+        if not self.total:
+            return 100 if self.status == "completed" else 0
+        return round(self.written * 100 / self.total)
+
+    def as_dict(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "file_name": self.file_name,
+            "total": self.total,
+            "written": self.written,
+            "progress": self.progress(),
+            "error": self.error,
+            "finished_at": self.finished_at,
+        }
+
+    def __str__(self) -> str:
+        return f"{self.file_name} | {self.written} / {self.total}"
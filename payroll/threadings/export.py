@@ -0,0 +1,33 @@
+"""
+export.py
+
+This module is used to prepare the payslip exports in a thread
+"""
+
+import logging
+from threading import Thread
+
+from django.db import close_old_connections
+
+from payroll.methods.payslip_export import prepare_export
+
+logger = logging.getLogger(__name__)
+
+
+class PayslipExportThread(Thread):
+    """
+    Writes the file of a payslip export job outside of the request
+    """
+
+    def __init__(self, job):
+        Thread.__init__(self)
+        self.job = job
+
+    def run(self) -> None:
+        super().run()
+        try:
+            prepare_export(self.job)
+        except Exception as e:
+            logger.error(e)
+        finally:
+            close_old_connections()
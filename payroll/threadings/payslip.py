@@ -0,0 +1,41 @@
+"""
+payslip.py
+
+This module is used to generate payslips in a thread
+"""
+
+import logging
+from threading import Thread
+
+from django.db import close_old_connections
+
+from payroll.methods.payslip_generation import generate_payslips
+
+logger = logging.getLogger(__name__)
+
+
+class PayslipGenerationThread(Thread):
+    """
+    Runs a bulk payslip generation job outside of the request
+    """
+
+    def __init__(self, job, employee_ids, company_id=None, on_saved=None):
+        Thread.__init__(self)
+        self.job = job
+        self.employee_ids = employee_ids
+        self.company_id = company_id
+        self.on_saved = on_saved
+
+    def run(self) -> None:
+        super().run()
+        try:
+            generate_payslips(
+                self.job,
+                self.employee_ids,
+                company_id=self.company_id,
+                on_saved=self.on_saved,
+            )
+        except Exception as e:
+            logger.error(e)
+        finally:
+            close_old_connections()
@@ -70,6 +70,26 @@ urlpatterns = [
         name="check-contract-start-date",
     ),
     path("generate-payslip", component_views.generate_payslip, name="generate-payslip"),
+    path(
+        "payslip-generation-status/<int:job_id>",
+        component_views.payslip_generation_status,
+        name="payslip-generation-status",
+    ),
+    path(
+        "payslip-distribution/<int:job_id>",
+        component_views.payslip_distribution_progress,
+        name="payslip-distribution-progress",
+    ),
+    path(
+        "payslip-distribution-status/<int:job_id>",
+        component_views.payslip_distribution_status,
+        name="payslip-distribution-status",
+    ),
+    path(
+        "payslip-distribution-resume/<int:job_id>",
+        component_views.payslip_distribution_resume,
+        name="payslip-distribution-resume",
+    ),
     path(
         "validate-start-date",
         component_views.validate_start_date,
@@ -81,6 +101,21 @@ urlpatterns = [
         component_views.payslip_export,
         name="payslip-info-export",
     ),
+    path(
+        "payslip-export/<int:job_id>",
+        component_views.payslip_export_progress,
+        name="payslip-export-progress",
+    ),
+    path(
+        "payslip-export-status/<int:job_id>",
+        component_views.payslip_export_status,
+        name="payslip-export-status",
+    ),
+    path(
+        "payslip-export-download/<int:job_id>",
+        component_views.payslip_export_download,
+        name="payslip-export-download",
+    ),
     path(
         "view-individual-payslip/<int:employee_id>/<str:start_date>/<str:end_date>/",
         component_views.view_individual_payslip,
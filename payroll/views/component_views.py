@@ -6,26 +6,31 @@ This module is used to write methods to the component_urls patterns respectively
 
 import json
 import operator
-from collections import defaultdict
+import os
+import tempfile
 from datetime import date, datetime, timedelta
 from itertools import groupby
 from urllib.parse import parse_qs
 
-import pandas as pd
 from django.apps import apps
 from django.contrib import messages
 from django.db.models import Sum
-from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, QueryDict
+from django.http import (
+    FileResponse,
+    HttpResponse,
+    HttpResponseRedirect,
+    JsonResponse,
+    QueryDict,
+    StreamingHttpResponse,
+)
 from django.shortcuts import redirect, render
 from django.urls import reverse
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 from django.views.decorators.cache import never_cache
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Border, Font, Side
-from openpyxl.utils import get_column_letter
 
 from base.backends import ConfiguredEmailBackend
+from base.horilla_company_manager import selected_company_id
 from base.methods import (
     closest_numbers,
     eval_validate,
@@ -43,7 +48,6 @@ from horilla.decorators import (
     permission_required,
 )
 from horilla.group_by import group_by_queryset
-from horilla.horilla_settings import HORILLA_DATE_FORMATS
 from horilla.methods import dynamic_attr, get_horilla_model_class, get_urlencode
 
 # from leave.models import AvailableLeave
@@ -65,6 +69,7 @@ from payroll.methods.methods import (
     paginator_qry,
     save_payslip,
 )
+from payroll.methods.pay_rules import employee_pay_rules
 from payroll.methods.payslip_calc import (
     calculate_allowance,
     calculate_gross_pay,
@@ -74,6 +79,17 @@ from payroll.methods.payslip_calc import (
     calculate_tax_deduction,
     calculate_taxable_gross_pay,
 )
+from payroll.methods.payslip_distribution import create_distribution_job, resumable
+from payroll.methods.payslip_export import (
+    ASYNC_THRESHOLD,
+    CONTENT_TYPES,
+    PayslipExport,
+    can_access_export,
+    create_export_job,
+    csv_rows,
+    export_path,
+    write_workbook,
+)
 from payroll.methods.tax_calc import calculate_taxable_amount
 from payroll.models.models import (
     Allowance,
@@ -81,10 +97,15 @@ from payroll.models.models import (
     Deduction,
     LoanAccount,
     Payslip,
+    PayslipDistributionJob,
+    PayslipExportJob,
+    PayslipGenerationJob,
     Reimbursement,
     ReimbursementMultipleAttachment,
 )
+from payroll.threadings.export import PayslipExportThread
 from payroll.threadings.mail import MailSendThread
+from payroll.threadings.payslip import PayslipGenerationThread
 
 
 def return_none(a, b):
@@ -103,7 +124,9 @@ operator_mapping = {
 }
 
 
-def payroll_calculation(employee, start_date, end_date):
+def payroll_calculation(
+    employee, start_date, end_date, basic_pay_details=None, pay_rules=None
+):
     """
     Calculate payroll components for the specified employee within the given date range.
 
@@ -112,13 +135,20 @@ def payroll_calculation(employee, start_date, end_date):
         employee (Employee): The employee for whom the payroll is calculated.
         start_date (date): The start date of the payroll period.
         end_date (date): The end date of the payroll period.
+        basic_pay_details (dict): Precomputed compute_salary_on_period result,
+            e.g. from compute_salary_on_period_batch.
+        pay_rules (EmployeePayRules): The employee pay rules of a PayRuleSet
+            prepared for a batch, compiled for the employee alone when not given.
 
 
     Returns:
         dict: A dictionary containing the calculated payroll components:
     """
 
-    basic_pay_details = compute_salary_on_period(employee, start_date, end_date)
+    if basic_pay_details is None:
+        basic_pay_details = compute_salary_on_period(employee, start_date, end_date)
+    if pay_rules is None:
+        pay_rules = employee_pay_rules(employee, start_date, end_date)
     contract = basic_pay_details["contract"]
     contract_wage = basic_pay_details["contract_wage"]
     basic_pay = basic_pay_details["basic_pay"]
@@ -129,7 +159,12 @@ def payroll_calculation(employee, start_date, end_date):
     working_days_details = basic_pay_details["month_data"]
 
     updated_basic_pay_data = update_compensation_deduction(
-        employee, basic_pay, "basic_pay", start_date, end_date
+        employee,
+        basic_pay,
+        "basic_pay",
+        start_date,
+        end_date,
+        deduction_heads=pay_rules.compensation_deductions("basic_pay"),
     )
     basic_pay = updated_basic_pay_data["compensation_amount"]
     basic_pay_deductions = updated_basic_pay_data["deductions"]
@@ -146,6 +181,7 @@ def payroll_calculation(employee, start_date, end_date):
         "end_date": end_date,
         "basic_pay": basic_pay,
         "day_dict": working_days_details,
+        "pay_rules": pay_rules,
     }
     # basic pay will be basic_pay = basic_pay - update_compensation_amount
     allowances = calculate_allowance(**kwargs)
@@ -164,7 +200,7 @@ def payroll_calculation(employee, start_date, end_date):
     post_tax_deductions = calculate_post_tax_deduction(**kwargs)
 
     installments = (
-        pretax_deductions["installments"] | post_tax_deductions["installments"]
+        pretax_deductions["installments"] + post_tax_deductions["installments"]
     )
 
     taxable_gross_pay = calculate_taxable_gross_pay(**kwargs)
@@ -205,7 +241,12 @@ def payroll_calculation(employee, start_date, end_date):
         loss_of_pay=loss_of_pay,
     )
     updated_net_pay_data = update_compensation_deduction(
-        employee, net_pay, "net_pay", start_date, end_date
+        employee,
+        net_pay,
+        "net_pay",
+        start_date,
+        end_date,
+        deduction_heads=pay_rules.compensation_deductions("net_pay"),
     )
     net_pay = updated_net_pay_data["compensation_amount"]
     update_net_pay_deductions = updated_net_pay_data["deductions"]
@@ -741,66 +782,124 @@ def generate_payslip(request):
             "payroll/payslip/bulk_create_payslip.html",
             {"bulk_form": bulk_form},
         )
-    payslips = []
-    json_data = []
     form = forms.GeneratePayslipForm()
     if request.method == "POST":
         form = forms.GeneratePayslipForm(request.POST)
         if form.is_valid():
-            instances = []
             employees = form.cleaned_data["employee_id"]
-            start_date = form.cleaned_data["start_date"]
-            end_date = form.cleaned_data["end_date"]
+            sender = request.user.employee_get
+            job = PayslipGenerationJob.objects.create(
+                group_name=form.cleaned_data["group_name"],
+                start_date=form.cleaned_data["start_date"],
+                end_date=form.cleaned_data["end_date"],
+                created_by=sender,
+            )
 
-            group_name = form.cleaned_data["group_name"]
-            for employee in employees:
-                contract = Contract.objects.filter(
-                    employee_id=employee, contract_status="active"
-                ).first()
-                if start_date < contract.contract_start_date:
-                    start_date = contract.contract_start_date
-                payslip = payroll_calculation(employee, start_date, end_date)
-                payslips.append(payslip)
-                json_data.append(payslip["json_data"])
-
-                payslip["payslip"] = payslip
-                data = {}
-                data["employee"] = employee
-                data["group_name"] = group_name
-                data["start_date"] = payslip["start_date"]
-                data["end_date"] = payslip["end_date"]
-                data["status"] = "draft"
-                data["contract_wage"] = payslip["contract_wage"]
-                data["basic_pay"] = payslip["basic_pay"]
-                data["gross_pay"] = payslip["gross_pay"]
-                data["deduction"] = payslip["total_deductions"]
-                data["net_pay"] = payslip["net_pay"]
-                data["pay_data"] = json.loads(payslip["json_data"])
-                calculate_employer_contribution(data)
-                data["installments"] = payslip["installments"]
-                instance = save_payslip(**data)
-                instances.append(instance)
-                notify.send(
-                    request.user.employee_get,
-                    recipient=employee.employee_user_id,
-                    verb="Payslip has been generated for you.",
-                    verb_ar="تم إصدار كشف راتب لك.",
-                    verb_de="Gehaltsabrechnung wurde für Sie erstellt.",
-                    verb_es="Se ha generado la nómina para usted.",
-                    verb_fr="La fiche de paie a été générée pour vous.",
-                    redirect=reverse(
-                        "view-created-payslip", kwargs={"payslip_id": instance.id}
-                    ),
-                    icon="close",
-                )
-            messages.success(request, f"{employees.count()} payslip saved as draft")
-            return redirect(
-                f"/payroll/view-payslip?group_by=group_name&active_group={group_name}"
+            def notify_employees(instances):
+                for instance in instances:
+                    notify.send(
+                        sender,
+                        recipient=instance.employee_id.employee_user_id,
+                        verb="Payslip has been generated for you.",
+                        verb_ar="تم إصدار كشف راتب لك.",
+                        verb_de="Gehaltsabrechnung wurde für Sie erstellt.",
+                        verb_es="Se ha generado la nómina para usted.",
+                        verb_fr="La fiche de paie a été générée pour vous.",
+                        redirect=reverse(
+                            "view-created-payslip", kwargs={"payslip_id": instance.id}
+                        ),
+                        icon="close",
+                    )
+
+            PayslipGenerationThread(
+                job,
+                list(employees.values_list("id", flat=True)),
+                company_id=selected_company_id.get(),
+                on_saved=notify_employees,
+            ).start()
+            messages.info(
+                request,
+                _("Generating %(count)s payslips in the background")
+                % {"count": employees.count()},
+            )
+            return render(
+                request, "payroll/payslip/generation_progress.html", {"job": job}
             )
 
     return render(request, "payroll/common/form.html", {"form": form})
 
 
+@login_required
+@permission_required("payroll.add_payslip")
+def payslip_generation_status(request, job_id):
+    """
+    Progress and chunk timings of a bulk payslip generation job, as a partial
+    for htmx polling or as json
+    """
+    job = PayslipGenerationJob.objects.filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({"error": "Payslip generation job not found"}, status=404)
+    if request.META.get("HTTP_HX_REQUEST"):
+        return render(request, "payroll/payslip/generation_status.html", {"job": job})
+    return JsonResponse(job.as_dict())
+
+
+@login_required
+@permission_required("payroll.add_payslip")
+def payslip_distribution_progress(request, job_id):
+    """
+    Progress page of a payslip mailing job
+    """
+    job = PayslipDistributionJob.objects.filter(id=job_id).first()
+    if job is None:
+        return render(request, "405.html")
+    return render(
+        request,
+        "payroll/payslip/distribution_progress.html",
+        {"job": job, "resumable": resumable(job)},
+    )
+
+
+@login_required
+@permission_required("payroll.add_payslip")
+def payslip_distribution_status(request, job_id):
+    """
+    Progress of a payslip mailing job, as a partial for htmx polling or as
+    json
+    """
+    job = PayslipDistributionJob.objects.filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({"error": "Payslip distribution job not found"}, status=404)
+    if request.META.get("HTTP_HX_REQUEST"):
+        return render(
+            request,
+            "payroll/payslip/distribution_status.html",
+            {"job": job, "resumable": resumable(job)},
+        )
+    return JsonResponse({**job.as_dict(), "resumable": resumable(job)})
+
+
+@login_required
+@permission_required("payroll.add_payslip")
+def payslip_distribution_resume(request, job_id):
+    """
+    Send the payslips of a mailing job that were not sent yet, reusing the
+    PDFs already rendered
+    """
+    job = PayslipDistributionJob.objects.filter(id=job_id).first()
+    if job is None:
+        return JsonResponse({"error": "Payslip distribution job not found"}, status=404)
+    if request.method == "POST" and resumable(job):
+        job.status = "queued"
+        job.save(update_fields=["status", "updated_at"])
+        MailSendThread(request, job).start()
+    return render(
+        request,
+        "payroll/payslip/distribution_status.html",
+        {"job": job, "resumable": resumable(job)},
+    )
+
+
 @login_required
 @hx_request_required
 def check_contract_start_date(request):
@@ -1095,17 +1194,8 @@ def payslip_export(request):
             },
         )
 
-    choices_mapping = {
-        "draft": _("Draft"),
-        "review_ongoing": _("Review Ongoing"),
-        "confirmed": _("Confirmed"),
-        "paid": _("Paid"),
-    }
-    selected_columns = []
-    payslips_data = {}
     payslips = PayslipFilter(request.GET).qs
     today_date = date.today().strftime("%Y-%m-%d")
-    file_name = f"Payslip_excel_{today_date}.xlsx"
     selected_fields = request.GET.getlist("selected_fields")
     form = forms.PayslipExportColumnForm()
 
@@ -1115,50 +1205,101 @@ def payslip_export(request):
         id_list = json.loads(ids)
         payslips = Payslip.objects.filter(id__in=id_list)
 
-    for field in forms.excel_columns:
-        value = field[0]
-        key = field[1]
-        if value in selected_fields:
-            selected_columns.append((value, key))
-
-    for column_value, column_name in selected_columns:
-        nested_attributes = column_value.split("__")
-        payslips_data[column_name] = []
-        for payslip in payslips:
-            value = payslip
-            for attr in nested_attributes:
-                value = getattr(value, attr, None)
-                if value is None:
-                    break
-            data = str(value) if value is not None else ""
-            if column_name == "Status":
-                data = choices_mapping.get(value, "")
-
-            if type(value) == date:
-                date_format = request.user.employee_get.get_date_format()
-                start_date = datetime.strptime(str(value), "%Y-%m-%d").date()
-
-                for format_name, format_string in HORILLA_DATE_FORMATS.items():
-                    if format_name == date_format:
-                        data = start_date.strftime(format_string)
-            else:
-                data = str(value) if value is not None else ""
-            payslips_data[column_name].append(data)
+    return payslip_export_response(
+        request, payslips, selected_fields, f"Payslip_excel_{today_date}"
+    )
+
+
+def payslip_export_response(
+    request, payslips, selected_fields, file_name, detailed=False
+):
+    """
+    Stream the export of the payslips, or prepare it in the background when
+    asked to or when the payslips are too many to write in the request
+    """
+    file_format = request.GET.get("file_format")
+    if file_format not in CONTENT_TYPES:
+        file_format = "xlsx"
+    file_name = f"{file_name}.{file_format}"
 
-    data_frame = pd.DataFrame(data=payslips_data)
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    if request.GET.get("prepare") or payslips.count() > ASYNC_THRESHOLD:
+        job = create_export_job(
+            request,
+            payslips,
+            selected_fields,
+            file_name,
+            file_format=file_format,
+            detailed=detailed,
+        )
+        PayslipExportThread(job).start()
+        return redirect(reverse("payslip-export-progress", kwargs={"job_id": job.id}))
+
+    export = PayslipExport(
+        payslips,
+        selected_fields,
+        date_format=request.user.employee_get.get_date_format(),
+        detailed=detailed,
     )
+    if file_format == "csv":
+        response = StreamingHttpResponse(
+            csv_rows(export), content_type=CONTENT_TYPES["csv"]
+        )
+    else:
+        # the rows are flushed to disk while written, and the workbook is
+        # sent from a temporary file
+        workbook = tempfile.TemporaryFile()
+        write_workbook(export, workbook)
+        workbook.seek(0)
+        response = FileResponse(workbook, content_type=CONTENT_TYPES["xlsx"])
     response["Content-Disposition"] = f'attachment; filename="{file_name}"'
+    return response
+
+
+@login_required
+@permission_required("payroll.change_payslip")
+def payslip_export_progress(request, job_id):
+    """
+    Progress page of a payslip export prepared in the background
+    """
+    job = PayslipExportJob.objects.filter(id=job_id).first()
+    if job is None or not can_access_export(job, request.user):
+        return render(request, "405.html")
+    return render(request, "payroll/payslip/export_progress.html", {"job": job})
+
+
+@login_required
+@permission_required("payroll.change_payslip")
+def payslip_export_status(request, job_id):
+    """
+    Progress of a payslip export job, as a partial for htmx polling or as
+    json
+    """
+    job = PayslipExportJob.objects.filter(id=job_id).first()
+    if job is None or not can_access_export(job, request.user):
+        return JsonResponse({"error": "Payslip export job not found"}, status=404)
+    if request.META.get("HTTP_HX_REQUEST"):
+        return render(request, "payroll/payslip/export_status.html", {"job": job})
+    return JsonResponse(job.as_dict())
+
 
-    writer = pd.ExcelWriter(response, engine="xlsxwriter")
-    data_frame.style.applymap(lambda x: "text-align: center").to_excel(
-        writer, index=False, sheet_name="Sheet1"
+@login_required
+@permission_required("payroll.change_payslip")
+def payslip_export_download(request, job_id):
+    """
+    Download the file of a completed payslip export job
+    """
+    job = PayslipExportJob.objects.filter(id=job_id).first()
+    if job is None or not can_access_export(job, request.user):
+        return render(request, "405.html")
+    if job.status != "completed" or not os.path.exists(export_path(job)):
+        messages.error(request, _("The export is not ready"))
+        return redirect(reverse("payslip-export-progress", kwargs={"job_id": job_id}))
+    return FileResponse(
+        open(export_path(job), "rb"),
+        as_attachment=True,
+        filename=job.file_name,
+        content_type=CONTENT_TYPES[job.file_format],
     )
-    worksheet = writer.sheets["Sheet1"]
-    worksheet.set_column("A:Z", 20)
-    writer.close()
-    return response
 
 
 @login_required
@@ -1190,17 +1331,17 @@ def send_slip(request):
         else:
             return redirect(filter_payslip)
 
-    result_dict = defaultdict(
-        lambda: {"employee_id": None, "instances": [], "count": 0}
+    job = create_distribution_job(request, payslips)
+    MailSendThread(request, job).start()
+    messages.info(
+        request,
+        format_html(
+            "{} <a href='{}'>{}</a>",
+            _("Mail processing"),
+            reverse("payslip-distribution-progress", kwargs={"job_id": job.id}),
+            _("View progress"),
+        ),
     )
-    for payslip in payslips:
-        employee_id = payslip.employee_id
-        result_dict[employee_id]["employee_id"] = employee_id
-        result_dict[employee_id]["instances"].append(payslip)
-        result_dict[employee_id]["count"] += 1
-    mail_thread = MailSendThread(request, result_dict=result_dict, ids=payslip_ids)
-    mail_thread.start()
-    messages.info(request, "Mail processing")
     if view:
         return HttpResponse("<script>window.location.reload()</script>")
     else:
@@ -1889,244 +2030,6 @@ def get_contribution_report(request):
     )
 
 
-def all_deductions(pay_head):
-
-    extracted_items = []
-
-    potential_lists = [
-        "basic_pay_deductions",
-        "gross_pay_deductions",
-        "pretax_deductions",
-        "post_tax_deductions",
-        "tax_deductions",
-        "net_deductions",
-    ]
-
-    for list_name in potential_lists:
-        if list_name in pay_head.keys():
-            for item in pay_head[list_name]:
-                if "deduction_id" in item:
-                    extracted_items.append(item)
-
-    return extracted_items
-
-
-@login_required
-def payslip_detailed_export_data(request):
-    """
-    This view create the data for exporting payslip data based on selected fields and filters,
-    """
-    choices_mapping = {
-        "draft": _("Draft"),
-        "review_ongoing": _("Review Ongoing"),
-        "confirmed": _("Confirmed"),
-        "paid": _("Paid"),
-    }
-    selected_columns = []
-    payslips_data = []
-    totals = {}
-    payslips = PayslipFilter(request.GET).qs
-    selected_fields = request.GET.getlist("selected_fields")
-    form = forms.PayslipExportColumnForm()
-
-    allowances = Allowance.objects.all()
-    deductions = Deduction.objects.all()
-
-    if not selected_fields:
-        selected_fields = form.fields["selected_fields"].initial
-
-    for field in forms.excel_columns:
-        value, key = field
-
-        if value in selected_fields:
-            selected_columns.append((value, key))
-
-    selected_columns += [
-        (value.title, value.title)
-        for value in allowances.filter(
-            one_time_date__isnull=True, include_active_employees=True
-        )
-    ]
-    selected_columns += [
-        ("other_allowances", "Other Allowances"),
-        ("total_allowances", "Total Allowances"),
-    ]
-
-    selected_columns += [
-        (value.title, value.title)
-        for value in deductions.filter(
-            one_time_date__isnull=True,
-            include_active_employees=True,
-            update_compensation__isnull=True,
-        )
-    ]
-    selected_columns += [
-        ("federal_tax", "Federal Tax"),
-        ("other_deductions", "Other Deductions"),
-        ("total_deductions", "Total Deductions"),
-    ]
-
-    allowance_totals = {
-        column_name.title: 0
-        for column_name in allowances.filter(
-            one_time_date__isnull=True,
-            include_active_employees=True,
-        )
-    }
-
-    deduction_totals = {
-        column_name.title: 0
-        for column_name in deductions.filter(
-            one_time_date__isnull=True,
-            include_active_employees=True,
-            update_compensation__isnull=True,
-        )
-    }
-
-    other_totals = {
-        "Other Allowances": 0,
-        "Other Deductions": 0,
-        "Total Allowances": 0,
-        "Total Deductions": 0,
-        "Net Pay": 0,
-        "Gross Pay": 0,
-        "Federal Tax": 0,
-    }
-
-    totals.update(allowance_totals)
-    totals.update(deduction_totals)
-    totals.update(other_totals)
-    for payslip in payslips:
-        payslip_data = {}
-        other_allowances_sum = 0
-        other_deductions_sum = 0
-        total_allowance = 0
-        total_deduction = 0
-        total_federal_tax = 0
-
-        federal_tax = payslip.pay_head_data["federal_tax"]
-        total_federal_tax += federal_tax
-
-        allos = payslip.pay_head_data["allowances"]
-        deducts = all_deductions(payslip.pay_head_data)
-
-        if allos:
-            for allowance in allos:
-                if not any(
-                    str(allowance["title"]) == str(column_name)
-                    for item, column_name in selected_columns
-                ):
-                    other_allowances_sum += (
-                        allowance["amount"] if allowance["amount"] is not None else 0
-                    )
-                total_allowance += allowance["amount"]
-
-        if deducts:
-            for deduction in deducts:
-                if not any(
-                    str(deduction["title"]) == str(column_name)
-                    for item, column_name in selected_columns
-                ):
-                    other_deductions_sum += (
-                        deduction["amount"] if deduction["amount"] is not None else 0
-                    )
-                total_deduction += deduction["amount"]
-
-        for column_value, column_name in selected_columns:
-            nested_attributes = column_value.split("__")
-            value = payslip
-            for attr in nested_attributes:
-                value = getattr(value, attr, None)
-                if value is None:
-                    break
-            data = str(value) if value is not None else ""
-            if column_name == "Status":
-                data = choices_mapping.get(value, "")
-
-            if isinstance(value, date):
-                date_format = request.user.employee_get.get_date_format()
-                start_date = datetime.strptime(str(value), "%Y-%m-%d").date()
-
-                for format_name, format_string in HORILLA_DATE_FORMATS.items():
-                    if format_name == date_format:
-                        data = start_date.strftime(format_string)
-            else:
-                data = str(value) if value is not None else ""
-
-            if allos:
-                for allowance in allos:
-                    if str(allowance["title"]) == str(column_name):
-                        data = (
-                            float(allowance["amount"])
-                            if allowance["title"] is not None
-                            else 0
-                        )
-
-            if deducts:
-                for deduction in deducts:
-                    if str(deduction["title"]) == str(column_name):
-                        data = (
-                            float(deduction["amount"])
-                            if deduction["title"] is not None
-                            else 0
-                        )
-
-            payslip_data[column_name] = data
-            if column_name in totals:
-                try:
-                    totals[column_name] += float(data)
-                except ValueError:
-                    pass
-
-        payslip_data["Other Allowances"] = other_allowances_sum
-        payslip_data["Other Deductions"] = other_deductions_sum
-        payslip_data["Total Allowances"] = total_allowance
-        payslip_data["Total Deductions"] = total_deduction
-        payslip_data["Federal Tax"] = federal_tax
-
-        totals["Other Allowances"] += other_allowances_sum
-        totals["Other Deductions"] += other_deductions_sum
-        totals["Total Allowances"] += total_allowance
-        totals["Total Deductions"] += total_deduction
-        totals["Federal Tax"] += federal_tax
-
-        payslips_data.append(payslip_data)
-
-    totals_row = {}
-
-    for item, column_name in selected_columns:
-        if column_name in totals:
-            totals_row[column_name] = totals[column_name]
-        else:
-            totals_row[column_name] = "-"
-
-    totals_row["Other Allowances"] = totals["Other Allowances"]
-    totals_row["Other Deductions"] = totals["Other Deductions"]
-    totals_row["Total Allowances"] = totals["Total Allowances"]
-    totals_row["Total Deductions"] = totals["Total Deductions"]
-    totals_row["Employee"] = "Total"
-
-    payslips_data.append(totals_row)
-
-    return {
-        "payslips_data": payslips_data,
-        "selected_columns": selected_columns,
-        "allowances": list(
-            allowances.filter(
-                one_time_date__isnull=True,
-                include_active_employees=True,
-            ).values_list("title", flat=True)
-        ),
-        "deductions": list(
-            deductions.filter(
-                one_time_date__isnull=True,
-                include_active_employees=True,
-                update_compensation__isnull=True,
-            ).values_list("title", flat=True)
-        ),
-    }
-
-
 @login_required
 @permission_required("payroll.change_payslip")
 def payslip_detailed_export(request):
@@ -2152,112 +2055,16 @@ def payslip_detailed_export(request):
             },
         )
 
-    export_data = payslip_detailed_export_data(request)
-    payslips_data = export_data["payslips_data"]
-    selected_columns = export_data["selected_columns"]
-    allowances = export_data["allowances"]
-    deductions = export_data["deductions"]
-    today_date = date.today().strftime("%Y-%m-%d")
-    file_name = f"Payslip_excel_{today_date}.xlsx"
-
-    thin_border = Border(
-        left=Side(style="thin"),
-        right=Side(style="thin"),
-        top=Side(style="thin"),
-        bottom=Side(style="thin"),
-    )
-    right_border = Border(right=Side(style="thin"))
-
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "Payslips"
-
-    header_row = [col_name for _, col_name in selected_columns]
-    allowances_header = allowances + ["Other Allowances", "Total Allowances"]
-    deductions_header = deductions + [
-        "Federal Tax",
-        "Other Deductions",
-        "Total Deductions",
-    ]
-
-    basic_cols = len(header_row) - len(allowances_header) - len(deductions_header)
-    allowance_cols = len(allowances_header)
-    deduction_cols = len(deductions_header)
-
-    merged_sections = [
-        (1, basic_cols, "Employee Details", "0000FF"),
-        (basic_cols + 1, basic_cols + allowance_cols, "Allowances", "008000"),
-        (
-            basic_cols + allowance_cols + 1,
-            basic_cols + allowance_cols + deduction_cols,
-            "Deductions",
-            "FF0000",
-        ),
-    ]
-
-    bold_cols = [
-        1,
-        basic_cols + allowance_cols,
-        basic_cols + allowance_cols + deduction_cols,
-    ]
-
-    for start_col, end_col, title, color in merged_sections:
-        ws.merge_cells(
-            start_row=1, start_column=start_col, end_row=1, end_column=end_col
-        )
-        cell = ws.cell(row=1, column=start_col, value=title)
-        cell.font = Font(color=color, bold=True)
-        cell.alignment = Alignment(horizontal="center")
-        cell.border = thin_border
-
-        if end_col <= len(header_row):
-            ws.cell(row=1, column=end_col).border = thin_border + right_border
-    last_row = len(payslips_data) + 2
-    ws.row_dimensions[1].height = 25
-    ws.row_dimensions[2].height = 20
-    ws.row_dimensions[last_row].height = 25
-
-    subheaders = [
-        (header_row[:basic_cols], Font(bold=True, color="0000FF")),
-        (allowances_header, Font(bold=True, color="008000")),
-        (deductions_header, Font(bold=True, color="FF0000")),
-    ]
-
-    col_num = 1
-    for subheader, font in subheaders:
-        for header in subheader:
-            cell = ws.cell(row=2, column=col_num, value=str(header))
-            cell.font = font
-            cell.alignment = Alignment(horizontal="center")
-            cell.border = thin_border
-            col_num += 1
-
-    for row_num, payslip_data in enumerate(payslips_data, 3):
-        for col_num, header in enumerate(header_row, 1):
-            cell = ws.cell(
-                row=row_num, column=col_num, value=payslip_data.get(header, "")
-            )
-            if row_num == last_row:
-                cell.font = Font(bold=True, color="800080")
-                cell.alignment = Alignment(horizontal="right")
-            elif col_num in bold_cols:
-                cell.font = Font(bold=True)
-            cell.border = thin_border
-
-    for col_num, _ in enumerate(header_row, 1):
-        max_length = max(
-            len(str(cell.value))
-            for cell in ws[get_column_letter(col_num)]
-            if cell.value is not None
+    selected_fields = request.GET.getlist("selected_fields")
+    if not selected_fields:
+        selected_fields = (
+            forms.PayslipExportColumnForm().fields["selected_fields"].initial
         )
-        ws.column_dimensions[get_column_letter(col_num)].width = max_length + 2
-
-    ws.freeze_panes = ws["B3"]
-
-    response = HttpResponse(
-        content_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    today_date = date.today().strftime("%Y-%m-%d")
+    return payslip_export_response(
+        request,
+        PayslipFilter(request.GET).qs,
+        selected_fields,
+        f"Payslip_excel_{today_date}",
+        detailed=True,
     )
-    response["Content-Disposition"] = f"attachment; filename={file_name}.xlsx"
-    wb.save(response)
-
-    return response
@@ -11,12 +11,10 @@ from itertools import groupby
 from urllib.parse import parse_qs
 
 import pandas as pd
-import pdfkit
 from django.contrib import messages
 from django.db.models import ProtectedError, Q
 from django.http import HttpResponse, HttpResponseRedirect, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.template.loader import render_to_string
 from django.urls import reverse
 from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
@@ -49,6 +47,11 @@ from payroll.forms.component_forms import (
     PayslipAutoGenerateForm,
 )
 from payroll.methods.methods import paginator_qry, save_payslip
+from payroll.methods.payslip_distribution import (
+    PayslipLayout,
+    equalize_lists_length,
+    payslip_date_format,
+)
 from payroll.models.models import (
     Contract,
     FilingStatus,
@@ -1413,74 +1416,6 @@ def contract_bulk_delete(request):
     return JsonResponse({"message": "Success"})
 
 
-def equalize_lists_length(allowances, deductions):
-    """
-    Equalize the lengths of two lists by appending empty dictionaries to the shorter list.
-
-    Args:
-    deductions (list): List of dictionaries representing deductions.
-    allowances (list): List of dictionaries representing allowances.
-
-    Returns:
-    tuple: Tuple containing two lists with equal lengths.
-    """
-    num_deductions = len(deductions)
-    num_allowances = len(allowances)
-
-    while num_deductions < num_allowances:
-        deductions.append({"title": "", "amount": ""})
-        num_deductions += 1
-
-    while num_allowances < num_deductions:
-        allowances.append({"title": "", "amount": ""})
-        num_allowances += 1
-
-    return deductions, allowances
-
-
-def generate_payslip_pdf(template_path, context, html=False):
-    """
-    Generate a PDF file from an HTML template and context data.
-
-    Args:
-        template_path (str): The path to the HTML template.
-        context (dict): The context data to render the template.
-        html (bool): If True, return raw HTML instead of a PDF.
-
-    Returns:
-        HttpResponse: A response with the generated PDF file or raw HTML.
-    """
-    try:
-        # Render the HTML content from the template and context
-        html_content = render_to_string(template_path, context)
-
-        # Return raw HTML if requested
-        if html:
-            return HttpResponse(html_content, content_type="text/html")
-
-        # PDF options for pdfkit
-        pdf_options = {
-            "page-size": "A4",
-            "margin-top": "10mm",
-            "margin-bottom": "10mm",
-            "margin-left": "10mm",
-            "margin-right": "10mm",
-            "encoding": "UTF-8",
-            "enable-local-file-access": None,  # Required to load local CSS/images
-        }
-
-        # Generate the PDF as binary content
-        pdf = pdfkit.from_string(html_content, False, options=pdf_options)
-
-        # Return an HttpResponse containing the PDF content
-        response = HttpResponse(pdf, content_type="application/pdf")
-        response["Content-Disposition"] = "inline; filename=payslip.pdf"
-        return response
-    except Exception as e:
-        # Handle errors gracefully
-        return HttpResponse(f"Error generating PDF: {str(e)}", status=500)
-
-
 def payslip_pdf(request, id):
     """
     Generate the payslip as a PDF and return it in an HttpResponse.
@@ -1497,78 +1432,24 @@ def payslip_pdf(request, id):
 
     if Payslip.objects.filter(id=id).exists():
         payslip = Payslip.objects.get(id=id)
-        company = Company.objects.filter(hq=True).first()
         if (
             request.user.has_perm("payroll.view_payslip")
             or payslip.employee_id.employee_user_id == request.user
         ):
-            user = request.user
-            employee = user.employee_get
-
-            # Taking the company_name of the user
-            info = EmployeeWorkInformation.objects.filter(employee_id=employee)
-            if info.exists():
-                for data in info:
-                    employee_company = data.company_id
-                company_name = Company.objects.filter(company=employee_company)
-                emp_company = company_name.first()
-
-                # Access the date_format attribute directly
-                date_format = (
-                    emp_company.date_format
-                    if emp_company and emp_company.date_format
-                    else "MMM. D, YYYY"
-                )
-
-            data = payslip.pay_head_data
-            start_date_str = data["start_date"]
-            end_date_str = data["end_date"]
-
-            # Convert the string to a datetime.date object
-            start_date = datetime.strptime(start_date_str, "%Y-%m-%d").date()
-            end_date = datetime.strptime(end_date_str, "%Y-%m-%d").date()
-
-            # Format the start and end dates
-            for format_name, format_string in HORILLA_DATE_FORMATS.items():
-                if format_name == date_format:
-                    formatted_start_date = start_date.strftime(format_string)
-                    formatted_end_date = end_date.strftime(format_string)
-
-            # Prepare context for the template
-            data.update(
-                {
-                    "month_start_name": start_date.strftime("%B %d, %Y"),
-                    "month_end_name": end_date.strftime("%B %d, %Y"),
-                    "formatted_start_date": formatted_start_date,
-                    "formatted_end_date": formatted_end_date,
-                    "employee": payslip.employee_id,
-                    "payslip": payslip,
-                    "json_data": data.copy(),
-                    "currency": PayrollSettings.objects.first().currency_symbol,
-                    "all_deductions": [],
-                    "all_allowances": data["allowances"].copy(),
-                    "host": request.get_host(),
-                    "protocol": "https" if request.is_secure() else "http",
-                    "company": company,
-                }
+            layout = PayslipLayout(
+                payslip_date_format(request.user.employee_get),
+                request.get_host(),
+                "https" if request.is_secure() else "http",
             )
-
-            # Merge deductions and allowances for display
-            for deduction_list in [
-                data["basic_pay_deductions"],
-                data["gross_pay_deductions"],
-                data["pretax_deductions"],
-                data["post_tax_deductions"],
-                data["tax_deductions"],
-                data["net_deductions"],
-            ]:
-                data["all_deductions"].extend(deduction_list)
-
-            equalize_lists_length(data["allowances"], data["all_deductions"])
-            data["zipped_data"] = zip(data["allowances"], data["all_deductions"])
-            template_path = "payroll/payslip/payslip_pdf.html"
-
-            return generate_payslip_pdf(template_path, context=data, html=False)
+            try:
+                pdf = layout.pdf(payslip)
+            except Exception as e:
+                # Handle errors gracefully
+                return HttpResponse(f"Error generating PDF: {str(e)}", status=500)
+
+            response = HttpResponse(pdf, content_type="application/pdf")
+            response["Content-Disposition"] = "inline; filename=payslip.pdf"
+            return response
         return redirect(filter_payslip)
     return render(request, "405.html")
 
@@ -11,6 +11,7 @@ import django_filters
 from django import forms
 
 from base.filters import FilterSet
+from horilla.search import rank_requested, search_text
 from recruitment.models import (
     Candidate,
     InterviewSchedule,
@@ -33,7 +34,7 @@ class CandidateFilter(FilterSet):
         FilterSet (class): custom filter set class to apply styling
     """
 
-    name = django_filters.CharFilter(field_name="name", lookup_expr="icontains")
+    name = django_filters.CharFilter(method="search_name")
 
     candidate = django_filters.ModelMultipleChoiceFilter(
         queryset=Candidate.objects.all(),
@@ -98,6 +99,12 @@ class CandidateFilter(FilterSet):
         widget=django_filters.widgets.BooleanWidget(),
     )
 
+    def search_name(self, queryset, _, value):
+        """
+        This method is used to search the candidates by name
+        """
+        return search_text(queryset, "name", value, rank=rank_requested(self.data))
+
     def pipeline_search(self, queryset, _, value):
         """
         This method is used to include the candidates when they in the recruitment/stages
@@ -26,7 +26,7 @@ from base.horilla_company_manager import HorillaCompanyManager
 from base.models import Company, JobPosition
 from employee.models import Employee
 from horilla.models import HorillaModel
-from horilla_audit.methods import get_diff
+from horilla_audit.methods import HistoryTimeline
 from horilla_audit.models import HorillaAuditInfo, HorillaAuditLog
 
 # Create your models here.
@@ -500,7 +500,7 @@ class Candidate(HorillaModel):
         """
         This method is used to return the tracked history of the instance
         """
-        return get_diff(self)
+        return HistoryTimeline(self).requested_page()
 
     def get_last_sent_mail(self):
         """
@@ -1,11 +1,11 @@
 import calendar
 import datetime as dt
-import sys
 from datetime import datetime, timedelta
 
-from apscheduler.schedulers.background import BackgroundScheduler
 from dateutil.relativedelta import relativedelta
 
+from horilla.horilla_scheduler import register_job
+
 today = datetime.now()
 
 
@@ -20,12 +20,15 @@ def recruitment_close():
 
     recruitments = Recruitment.objects.filter(closed=False)
 
+    closed = 0
     for rec in recruitments:
         if rec.end_date:
             if rec.end_date == today_date:
                 rec.closed = True
                 rec.is_published = False
                 rec.save()
+                closed += 1
+    return closed
 
 
 def candidate_convert():
@@ -41,21 +44,14 @@ def candidate_convert():
     existing_emails = list(
         User.objects.filter(username__in=mails).values_list("email", flat=True)
     )
+    converted = 0
     for cand in candidates:
         if cand.email in existing_emails:
             cand.converted = True
             cand.save()
+            converted += 1
+    return converted
 
 
-if not any(
-    cmd in sys.argv
-    for cmd in ["makemigrations", "migrate", "compilemessages", "flush", "shell"]
-):
-    """
-    Initializes and starts background tasks using APScheduler when the server is running.
-    """
-    scheduler = BackgroundScheduler()
-    scheduler.add_job(candidate_convert, "interval", seconds=10)
-    scheduler.add_job(recruitment_close, "interval", hours=1)
-
-    scheduler.start()
+register_job(candidate_convert, "interval", seconds=10)
+register_job(recruitment_close, "interval", hours=1)
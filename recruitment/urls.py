@@ -244,6 +244,11 @@ urlpatterns = [
         name="candidate-view-individual",
         kwargs={"model": Candidate},
     ),
+    path(
+        "candidate-history-tab/<int:cand_id>/",
+        views.candidate_history_tab,
+        name="candidate-history-tab",
+    ),
     path(
         "candidate-update/<int:cand_id>/",
         views.candidate_update,
@@ -20,6 +20,7 @@ from horilla.decorators import (
 )
 from horilla.group_by import group_by_queryset
 from horilla.group_by import group_by_queryset as general_group_by
+from horilla.search import rank_requested, search_text
 from recruitment.filters import (
     CandidateFilter,
     RecruitmentFilter,
@@ -106,7 +107,9 @@ def candidate_search(request):
     search = request.GET.get("search")
     if search is None:
         search = ""
-    candidates = Candidate.objects.filter(name__icontains=search)
+    candidates = search_text(
+        Candidate.objects.all(), "name", search, rank=rank_requested(request.GET)
+    )
     candidates = CandidateFilter(request.GET, queryset=candidates).qs
     data_dict = []
     if not request.GET.get("dashboard"):
@@ -40,7 +40,7 @@ from django.utils.translation import gettext_lazy as _
 from django.views.decorators.http import require_http_methods
 
 from base.backends import ConfiguredEmailBackend
-from base.context_processors import check_candidate_self_tracking
+from base.context_processors import is_candidate_self_tracking_enabled
 from base.countries import country_arr, s_a, states
 from base.forms import MailTemplateForm
 from base.methods import (
@@ -1613,6 +1613,17 @@ def candidate_view_individual(request, cand_id, **kwargs):
     )
 
 
+@login_required
+@hx_request_required
+@manager_can_enter(perm="recruitment.view_candidate")
+def candidate_history_tab(request, cand_id):
+    """
+    This method is used to view a page of the history tab of a candidate.
+    """
+    candidate_obj = get_object_or_404(Candidate, id=cand_id)
+    return render(request, "candidate/history.html", {"candidate": candidate_obj})
+
+
 @login_required
 @manager_can_enter(perm="recruitment.change_candidate")
 def candidate_update(request, cand_id, **kwargs):
@@ -2686,9 +2697,7 @@ def candidate_self_status_tracking(request):
     """
     This method is accessed by the candidates
     """
-    self_tracking_feature = check_candidate_self_tracking(request)[
-        "check_candidate_self_tracking"
-    ]
+    self_tracking_feature = is_candidate_self_tracking_enabled()
     if self_tracking_feature:
         candidate_id = request.session.get("candidate_id")
 
@@ -2717,9 +2726,7 @@ def candidate_self_status_tracking_managers_view(request, cand_id):
     """
     This method is accessed by the candidates
     """
-    self_tracking_feature = check_candidate_self_tracking(request)[
-        "check_candidate_self_tracking"
-    ]
+    self_tracking_feature = is_candidate_self_tracking_enabled()
     if self_tracking_feature:
         candidate_id = request.session.get("candidate_id")
         if (